@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do GroqHandler contra o servidor mock (ou outro endpoint)
+Envia N pedidos com C clientes em simultâneo e mede throughput, taxa de
+sucesso e percentis de latência (e do primeiro token, em streaming)
+
+Exemplos:
+    python benchmark_carga.py --pedidos 500 --clientes 50 --latencia lognormal:0.4,0.5
+    python benchmark_carga.py --stream --tokens-por-segundo 200 --tokens-resposta 300
+    python benchmark_carga.py --erros 0.1 --rpm 300 --clientes 20
+    python benchmark_carga.py --url http://127.0.0.1:8765   # mock noutro processo
+"""
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+
+from mock_groq_server import MockGroqServer
+
+# Credenciais fictícias: o teste nunca contacta a API real por omissão
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+# Mede-se o handler, não o plano da conta nem as proteções do bot (os
+# limites do "servidor" configuram-se no mock com --rpm/--tpm)
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+os.environ.setdefault("LLM_DAILY_TOKEN_QUOTA", "0")
+os.environ.setdefault("LLM_SHED_QUEUE_DEPTH", "0")
+os.environ.setdefault("LLM_SHED_LATENCY", "0")
+
+logging.basicConfig(
+    level=logging.ERROR,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Teste de carga do GroqHandler")
+    parser.add_argument("--pedidos", type=int, default=200, help="total de pedidos")
+    parser.add_argument("--clientes", type=int, default=20, help="pedidos em simultâneo")
+    parser.add_argument(
+        "--max-concorrencia",
+        type=int,
+        default=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        help="chamadas simultâneas à API permitidas pelo handler",
+    )
+    parser.add_argument("--stream", action="store_true", help="usar generate_response_stream")
+    parser.add_argument("--perfil", default="chat", help="perfil de MODEL_PROFILES")
+    parser.add_argument("--url", help="endpoint existente (por omissão arranca um mock)")
+    # Comportamento do mock (ignorado com --url)
+    parser.add_argument(
+        "--latencia",
+        default="lognormal:0.3,0.5",
+        help="tempo até ao primeiro token: 0.5, uniform:0.2,1, normal:0.5,0.1, "
+        "lognormal:0.5,0.6 ou exp:0.5",
+    )
+    parser.add_argument("--tokens-por-segundo", type=float, default=500.0)
+    parser.add_argument("--tokens-resposta", type=int, default=150)
+    parser.add_argument("--erros", type=float, default=0.0, help="fração de erros 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fração de 429 aleatórios")
+    parser.add_argument("--desconexoes", type=float, default=0.0, help="fração de ligações cortadas")
+    parser.add_argument("--rpm", type=int, default=0, help="limite de pedidos/minuto do mock")
+    parser.add_argument("--tpm", type=int, default=0, help="limite de tokens/minuto do mock")
+    return parser.parse_args(argv)
+
+
+async def executar_carga(args: argparse.Namespace, base_url: str) -> dict:
+    """Corre os pedidos e devolve as métricas do lado do cliente"""
+    from llm_handler.groq_handler import GroqHandler
+    from llm_handler.hedging import LatencyTracker
+    from llm_handler.http_pool import HTTPPool
+    from llm_handler.load_shedding import LLMOverloadedError
+    from llm_handler.resilience import LLMUnavailableError
+    from llm_handler.scheduler import PRIORITY_CHAT
+    from prompts import ERROR_MESSAGES
+
+    handler = GroqHandler(
+        max_concurrency=args.max_concorrencia, base_url=base_url, http_pool=HTTPPool()
+    )
+    latencias = LatencyTracker(window=args.pedidos)
+    primeiro_token = LatencyTracker(window=args.pedidos)
+    resultados = {"ok": 0, "falha": 0, "fila_cheia": 0, "sobrecarga": 0}
+    proximo = iter(range(args.pedidos))
+
+    async def pedido(i: int):
+        # Perguntas diferentes: sem cache nem pedidos agrupados
+        pergunta = f"Pergunta de carga {i}: posso deduzir as despesas de saúde?"
+        inicio = time.perf_counter()
+        if args.stream:
+            texto = ""
+            async for fragmento in handler.generate_response_stream(
+                pergunta, priority=PRIORITY_CHAT, user_id=i, profile=args.perfil
+            ):
+                if not texto:
+                    primeiro_token.record(time.perf_counter() - inicio)
+                texto += fragmento
+        else:
+            texto = await handler.generate_response(
+                pergunta, user_id=i, profile=args.perfil
+            )
+        latencias.record(time.perf_counter() - inicio)
+        if texto == ERROR_MESSAGES["fila_cheia"]:
+            resultados["fila_cheia"] += 1
+        else:
+            resultados["ok"] += 1
+
+    async def cliente():
+        for i in proximo:
+            try:
+                await pedido(i)
+            except LLMOverloadedError:
+                resultados["sobrecarga"] += 1
+            except LLMUnavailableError:
+                resultados["falha"] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(max(1, args.clientes))))
+    duracao = time.perf_counter() - inicio
+
+    stats = handler.get_performance_stats()
+    await handler.http_pool.aclose()
+    perfil = stats["profiles"].get(args.perfil, {})
+    gerados = perfil.get("avg_completion_tokens", 0) * perfil.get("requests", 0)
+    return {
+        "duracao": duracao,
+        "resultados": resultados,
+        "latencia": latencias.get_stats(),
+        "latencia_max_ms": round((latencias.percentile(100) or 0) * 1000),
+        "primeiro_token": primeiro_token.get_stats(),
+        "tokens_por_segundo": gerados / duracao if duracao else 0.0,
+        "handler": stats,
+    }
+
+
+def imprimir(args: argparse.Namespace, metricas: dict, mock: dict | None):
+    resultados = metricas["resultados"]
+    duracao = metricas["duracao"]
+    latencia = metricas["latencia"]
+
+    print("=" * 70)
+    print(
+        f"🧪 TESTE DE CARGA - {args.pedidos} pedidos, {args.clientes} clientes, "
+        f"{args.max_concorrencia} chamadas simultâneas{' (streaming)' if args.stream else ''}"
+    )
+    print("=" * 70)
+    if mock:
+        print(
+            f"🎛️ Mock: latência {mock['latency']}, "
+            f"{1 / mock['token_interval'] if mock['token_interval'] else 0:.0f} tokens/s, "
+            f"{args.tokens_resposta} tokens por resposta"
+        )
+    print(f"\n⏱️ Duração: {duracao:.2f}s")
+    print(f"🚀 Throughput: {resultados['ok'] / duracao:.1f} respostas/s")
+    print(f"🔤 Geração: {metricas['tokens_por_segundo']:.0f} tokens/s de resposta")
+    print(
+        f"✅ Sucesso: {resultados['ok']}/{args.pedidos} "
+        f"({resultados['ok'] * 100.0 / args.pedidos:.1f}%) | "
+        f"Falhas: {resultados['falha']} | Fila cheia: {resultados['fila_cheia']} | "
+        f"Sobrecarga: {resultados['sobrecarga']}"
+    )
+    print(
+        f"\n📊 Latência: p50 {latencia['p50_ms']}ms | p90 {latencia['p90_ms']}ms | "
+        f"p99 {latencia['p99_ms']}ms | máx. {metricas['latencia_max_ms']}ms"
+    )
+    if args.stream:
+        primeiro = metricas["primeiro_token"]
+        print(
+            f"📊 Primeiro token: p50 {primeiro['p50_ms']}ms | p90 {primeiro['p90_ms']}ms | "
+            f"p99 {primeiro['p99_ms']}ms"
+        )
+
+    handler = metricas["handler"]
+    fila = handler["scheduler"]
+    print(
+        f"\n🚦 Fila: máx. {fila['max_queue_depth']} pedidos, espera média {fila['avg_wait']}s"
+    )
+    print(
+        f"🛡️ Repetições: {handler['resilience']['retries']} | "
+        f"Failovers: {handler['resilience']['failovers']}"
+    )
+    conexoes = handler["http_pool"]
+    print(
+        f"🔌 Conexões: {conexoes['new_connections']} novas para {conexoes['requests']} "
+        f"pedidos (reutilização {conexoes['reuse_rate']}%)"
+    )
+    if mock:
+        print(
+            f"💥 Mock: {mock['requests_served']} servidos, {mock['errors_injected']} erros 500, "
+            f"{mock['rate_limited']} respostas 429, {mock['disconnects']} ligações cortadas"
+        )
+
+
+def main():
+    args = parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        server = MockGroqServer(
+            latency=args.latencia,
+            tokens_per_second=args.tokens_por_segundo,
+            completion_tokens=args.tokens_resposta,
+            reply_text="token",
+            error_rate=args.erros,
+            rate_limit_rate=args.rate_limit,
+            retry_after=0.2,
+            disconnect_rate=args.desconexoes,
+            rpm_limit=args.rpm,
+            tpm_limit=args.tpm,
+        ).start()
+        base_url = server.base_url
+
+    try:
+        metricas = asyncio.run(executar_carga(args, base_url))
+    finally:
+        if server is not None:
+            server.stop()
+
+    imprimir(args, metricas, server.get_stats() if server else None)
+
+
+if __name__ == "__main__":
+    main()
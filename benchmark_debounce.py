@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark do debounce de mensagens: pedidos ao LLM com e sem agrupamento
+Reproduz tráfego gravado (mensagens livres da base de monitoramento, ou uma
+amostra incluída) com o tempo comprimido, e conta as chamadas ao modelo
+"""
+
+import sys
+import time
+import random
+import asyncio
+import sqlite3
+from datetime import datetime
+
+from message_debouncer import MessageDebouncer
+
+# Amostra: (utilizador, segundos desde o início, texto). Perguntas escritas
+# em várias mensagens seguidas, como acontece no Telegram
+AMOSTRA = [
+    (1, 0.0, "olá"),
+    (1, 1.2, "tenho uma dúvida"),
+    (1, 2.0, "posso deduzir o ginásio no IRS?"),
+    (2, 3.0, "Boa tarde"),
+    (2, 4.1, "sou casado e a minha mulher não trabalha"),
+    (2, 5.5, "compensa a tributação conjunta?"),
+    (3, 6.0, "quanto é o mínimo de existência em 2025?"),
+    (1, 30.0, "e os óculos?"),
+    (1, 31.0, "entram em saúde?"),
+    (4, 32.0, "recebi uma carta das finanças"),
+    (4, 33.5, "diz que tenho de pagar 300€"),
+    (4, 34.2, "o que faço?"),
+    (3, 40.0, "obrigado"),
+    (2, 45.0, "e se ela tiver rendimentos de 5000€?"),
+    (5, 50.0, "IRS jovem"),
+    (5, 50.8, "tenho 27 anos"),
+    (5, 51.5, "ainda posso?"),
+    (5, 52.0, "comecei a trabalhar em 2022"),
+]
+
+
+def carregar_trafego(db_path: str) -> list[tuple[int, float, str]]:
+    """Mensagens livres gravadas no monitoramento (resolução de 1 segundo)"""
+    with sqlite3.connect(db_path) as conn:
+        linhas = conn.execute(
+            """
+            SELECT user_id, timestamp, content FROM user_activities
+            WHERE activity_type = 'message' ORDER BY timestamp
+            """
+        ).fetchall()
+    if not linhas:
+        return []
+    inicio = datetime.fromisoformat(linhas[0][1])
+    return [
+        (user_id, (datetime.fromisoformat(ts) - inicio).total_seconds(), texto)
+        for user_id, ts, texto in linhas
+    ]
+
+
+async def reproduzir(
+    trafego, escala: float, latencia: float, concorrencia: int, debounce: bool
+) -> dict:
+    """
+    Reproduz o tráfego como o mensagem_livre: cada mensagem nova cancela a
+    resposta anterior do mesmo utilizador ainda em curso
+    """
+    chamadas = 0
+    respostas = 0
+    em_curso: dict[int, asyncio.Task] = {}
+    ativas = 0
+
+    debouncer = MessageDebouncer(
+        min_window=0.8 * escala,
+        max_window=3.0 * escala,
+        load=lambda: ativas / concorrencia,
+    )
+
+    async def tratar(user_id: int, texto: str):
+        nonlocal chamadas, respostas, ativas
+        rajada = None
+        if debounce:
+            rajada = await debouncer.submit(user_id, texto)
+            if rajada is None:
+                return
+        chamadas += 1
+        ativas += 1
+        try:
+            await asyncio.sleep(latencia * escala * random.uniform(0.8, 1.2))
+        finally:
+            ativas -= 1
+        respostas += 1
+        if rajada is not None:
+            debouncer.done(user_id, rajada)
+
+    inicio = time.monotonic()
+    tarefas = []
+    for user_id, instante, texto in trafego:
+        atraso = instante * escala - (time.monotonic() - inicio)
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        anterior = em_curso.get(user_id)
+        if anterior is not None and not anterior.done():
+            anterior.cancel()
+        em_curso[user_id] = asyncio.ensure_future(tratar(user_id, texto))
+        tarefas.append(em_curso[user_id])
+    await asyncio.gather(*tarefas, return_exceptions=True)
+
+    return {"mensagens": len(trafego), "chamadas": chamadas, "respostas": respostas}
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else None
+    escala = 0.05  # 1 segundo do tráfego = 50ms no benchmark
+    latencia = 2.0  # segundos por resposta do modelo (antes da escala)
+
+    trafego = carregar_trafego(db_path) if db_path else AMOSTRA
+    origem = db_path if db_path else "amostra incluída"
+    if not trafego:
+        print(f"Sem mensagens gravadas em {db_path}")
+        return
+
+    random.seed(42)
+    print("=" * 70)
+    print(f"🧪 BENCHMARK DEBOUNCE - {len(trafego)} mensagens ({origem})")
+    print("=" * 70)
+
+    for concorrencia in (8, 1):
+        sem = asyncio.run(reproduzir(trafego, escala, latencia, concorrencia, False))
+        com = asyncio.run(reproduzir(trafego, escala, latencia, concorrencia, True))
+        reducao = 1 - com["chamadas"] / sem["chamadas"]
+        carga = "fila livre" if concorrencia > 1 else "fila cheia (janela máxima)"
+        print(f"\n📨 {carga}:")
+        print(f"   Sem debounce: {sem['chamadas']} chamadas, {sem['respostas']} respostas")
+        print(f"   Com debounce: {com['chamadas']} chamadas, {com['respostas']} respostas")
+        print(f"   📉 Menos {reducao * 100:.0f}% chamadas ao LLM")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Benchmark do GroqHandler contra o servidor mock local
+Mede throughput de chamadas LLM sequenciais (bloqueantes) vs concorrentes
+e a taxa de sucesso com falhas injetadas (retry + circuit breaker)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+
+from mock_groq_server import MockGroqServer
+
+# Credenciais fictícias: o benchmark nunca contacta a API real
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+# Sem limites RPM/TPM da conta: mede-se o caminho até à API, não o plano
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+
+def _criar_handler(base_url: str, max_concurrency: int):
+    """Cria GroqHandler apontado para o mock"""
+    from llm_handler.groq_handler import GroqHandler
+    from llm_handler.http_pool import HTTPPool
+
+    # Um pool por handler: as conexões ficam ligadas ao event loop onde abriram
+    return GroqHandler(
+        max_concurrency=max_concurrency, base_url=base_url, http_pool=HTTPPool()
+    )
+
+
+def benchmark_sequencial(handler, total: int) -> float:
+    """Chamadas uma a uma (comportamento antigo: bloqueia o event loop)"""
+    inicio = time.perf_counter()
+    for i in range(total):
+        handler.generate_response_sync(f"Pergunta {i}")
+    return time.perf_counter() - inicio
+
+
+async def benchmark_concorrente(handler, total: int) -> float:
+    """Chamadas sobrepostas via cliente assíncrono"""
+    inicio = time.perf_counter()
+    await asyncio.gather(
+        *(handler.generate_response(f"Pergunta {i}") for i in range(total))
+    )
+    return time.perf_counter() - inicio
+
+
+async def benchmark_primeiro_texto(handler) -> tuple[float, float]:
+    """Tempo até ao primeiro texto visível: resposta completa vs streaming"""
+    inicio = time.perf_counter()
+    await handler.generate_response("Pergunta completa")
+    completa = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    primeiro_token = None
+    async for _ in handler.generate_response_stream("Pergunta em streaming"):
+        if primeiro_token is None:
+            primeiro_token = time.perf_counter() - inicio
+    return completa, primeiro_token
+
+
+async def benchmark_falhas(handler, total: int) -> tuple[int, float]:
+    """Chamadas contra um mock que falha: quantas acabam por ter resposta"""
+    from llm_handler.resilience import LLMUnavailableError
+
+    async def chamar(i: int) -> bool:
+        try:
+            await handler.generate_response(f"Pergunta com falhas {i}")
+            return True
+        except LLMUnavailableError:
+            return False
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(chamar(i) for i in range(total)))
+    return sum(resultados), time.perf_counter() - inicio
+
+
+async def benchmark_hedging(handler, total: int, concorrencia: int) -> dict:
+    """Latências efetivas (p50/p99) de total pedidos, concorrencia de cada vez"""
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def chamar(i: int):
+        async with semaforo:
+            await handler.generate_response(f"Pergunta cauda {i}")
+
+    await asyncio.gather(*(chamar(i) for i in range(total)))
+    return handler.hedging.get_stats()
+
+
+async def benchmark_router(servidores: dict, total: int, concorrencia: int):
+    """Pedidos através do router, com um backend por servidor mock"""
+    from llm_handler.groq_handler import GroqHandler
+    from llm_handler.http_pool import HTTPPool
+    from llm_handler.providers import GroqBackend, OpenAICompatibleBackend
+
+    pool = HTTPPool()
+    # Metade Groq SDK, metade cliente compatível com OpenAI (ambos no mock)
+    backends = [
+        GroqBackend(nome, "mock", base_url=servidor.base_url, http_pool=pool)
+        if i % 2 == 0
+        else OpenAICompatibleBackend(
+            nome, "mock", base_url=f"{servidor.base_url}/v1", http_pool=pool
+        )
+        for i, (nome, servidor) in enumerate(servidores.items())
+    ]
+    handler = GroqHandler(max_concurrency=concorrencia, backends=backends, http_pool=pool)
+    sucesso, duracao = await benchmark_falhas(handler, total)
+    return sucesso, duracao, handler.get_performance_stats()["providers"]
+
+
+async def benchmark_aquecimento(base_url: str, aquecer: bool) -> float:
+    """Latência do primeiro pedido, com ou sem aquecimento das conexões"""
+    handler = _criar_handler(base_url, 1)
+    if aquecer:
+        await handler.http_pool.warm_up()
+    inicio = time.perf_counter()
+    await handler.generate_response("Primeira pergunta", use_cache=False)
+    duracao = time.perf_counter() - inicio
+    await handler.http_pool.aclose()
+    return duracao
+
+
+async def _benchmarks_assincronos(handler, total: int):
+    return (
+        await benchmark_concorrente(handler, total),
+        await benchmark_primeiro_texto(handler),
+    )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latencia = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    concorrencia = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    server = MockGroqServer(
+        latency=latencia,
+        token_interval=0.005,
+        reply_text=" ".join(["token"] * 100),
+    ).start()
+    try:
+        handler = _criar_handler(server.base_url, concorrencia)
+
+        print("=" * 70)
+        print(f"🧪 BENCHMARK LLM - {total} chamadas, latência mock {latencia}s")
+        print("=" * 70)
+
+        duracao_seq = benchmark_sequencial(handler, total)
+        print(
+            f"🐢 Sequencial:  {duracao_seq:6.2f}s  "
+            f"({total / duracao_seq:6.2f} chamadas/s)"
+        )
+
+        # Um único event loop: o cliente assíncrono fica ligado ao loop onde
+        # abriu as conexões
+        duracao_conc, (completa, primeiro) = asyncio.run(
+            _benchmarks_assincronos(handler, total)
+        )
+        print(
+            f"🚀 Concorrente: {duracao_conc:6.2f}s  "
+            f"({total / duracao_conc:6.2f} chamadas/s, máx. {concorrencia} em paralelo)"
+        )
+
+        print(f"\n📈 Ganho: {duracao_seq / duracao_conc:.1f}x")
+
+        print(f"\n⏱️ Primeiro texto visível (resposta completa): {completa:.2f}s")
+        print(f"⏱️ Primeiro texto visível (streaming):         {primeiro:.2f}s")
+
+        conexoes = handler.http_pool.get_stats()
+        print(
+            f"\n🔌 Conexões: {conexoes['new_connections']} novas para "
+            f"{conexoes['requests']} pedidos (reutilização {conexoes['reuse_rate']}%)"
+        )
+        frio = asyncio.run(benchmark_aquecimento(server.base_url, False))
+        quente = asyncio.run(benchmark_aquecimento(server.base_url, True))
+        print(f"🧊 Primeiro pedido sem aquecimento: {frio * 1000:.0f}ms")
+        print(f"🔥 Primeiro pedido com aquecimento: {quente * 1000:.0f}ms")
+    finally:
+        server.stop()
+
+    # Cauda de latência: 5% dos pedidos demoram 10x mais
+    server = MockGroqServer(
+        latency=latencia, slow_rate=0.05, slow_latency=latencia * 10
+    ).start()
+    try:
+        print(f"\n🐌 Cauda de latência (5% dos pedidos com {latencia * 10:.1f}s):")
+        for ativo in (False, True):
+            handler = _criar_handler(server.base_url, concorrencia)
+            handler.hedging.enabled = ativo
+            stats = asyncio.run(benchmark_hedging(handler, total * 20, concorrencia))
+            efetiva = stats["with_hedging"]
+            print(
+                f"   {'Com hedging' if ativo else 'Sem hedging'}: "
+                f"p50 {efetiva['p50_ms']}ms, p99 {efetiva['p99_ms']}ms "
+                f"(duplicados: {stats['hedges']}, ganhos: {stats['hedge_wins']})"
+            )
+    finally:
+        server.stop()
+
+    # Vários backends: um em falha, um lento e um rápido
+    servidores = {
+        "em-falha": MockGroqServer(latency=latencia, error_rate=1.0),
+        "lento": MockGroqServer(latency=latencia * 4),
+        "rapido": MockGroqServer(latency=latencia),
+    }
+    try:
+        for servidor in servidores.values():
+            servidor.start()
+        sucesso, duracao, backends = asyncio.run(
+            benchmark_router(servidores, total * 5, concorrencia)
+        )
+        print("\n🔀 Router com 3 backends (em falha, lento, rápido):")
+        print(f"   Sucesso: {sucesso}/{total * 5} em {duracao:.2f}s")
+        for backend in backends:
+            print(
+                f"   {backend['name']:<10} {backend['state']:<10} "
+                f"{backend['requests']:4d} pedidos, EWMA {backend['ewma_latency_ms'] or '-'}ms"
+            )
+    finally:
+        for servidor in servidores.values():
+            servidor.stop()
+
+    # Injeção de falhas: 30% de erros 500 e 10% de 429 com Retry-After
+    server = MockGroqServer(
+        latency=latencia, error_rate=0.3, rate_limit_rate=0.1, retry_after=0.2
+    ).start()
+    try:
+        handler = _criar_handler(server.base_url, concorrencia)
+        sucesso, duracao = asyncio.run(benchmark_falhas(handler, total))
+        stats = handler.get_performance_stats()
+        backend = stats["providers"][0]
+
+        print("\n💥 Com falhas injetadas (30% erro 500, 10% 429):")
+        print(
+            f"   Sucesso: {sucesso}/{total} ({sucesso * 100.0 / total:.0f}%) "
+            f"em {duracao:.2f}s"
+        )
+        print(
+            f"   Repetições: {stats['resilience']['retries']}, "
+            f"erros 500: {server.errors_injected}, respostas 429: {server.rate_limited}, "
+            f"circuit breaker: {backend['state']} "
+            f"(aberto {backend['times_opened']}x)"
+        )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
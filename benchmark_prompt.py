@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark do prompt da análise (/simular): completo vs compacto
+Compara tokens do prompt e latência ponta a ponta (até ao fim do stream)
+num conjunto de respostas gravadas, contra o servidor mock local
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import statistics
+
+from mock_groq_server import MockGroqServer
+
+# Credenciais fictícias: o benchmark nunca contacta a API real
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+os.environ.setdefault("LLM_DAILY_TOKEN_QUOTA", "0")
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+# Respostas gravadas de simulações reais (dados anonimizados)
+RESPOSTAS_GRAVADAS = [
+    {
+        "estado_civil": "Solteiro(a)",
+        "tipo_trabalho": "Trabalho dependente (ordenado)",
+        "ano_fiscal": "2024 (declaração 2025)",
+        "num_dependentes": "0",
+        "idade": "24",
+        "reside_portugal": "Sim, continente",
+        "rendimento_bruto": "18.500",
+        "tem_outras_rendas": "Não",
+        "valor_outras_rendas": "0",
+        "retencoes_fonte": "1.200€",
+        "seguranca_social": "2035",
+        "despesas_saude": "150",
+        "despesas_educacao": "0",
+        "despesas_habitacao": "0",
+        "despesas_lares": "0",
+        "tem_beneficios": "Sim, IRS Jovem",
+        "detalhes_beneficios": "primeiro ano",
+        "paga_pensao": "Não",
+        "valor_pensao": "0",
+        "tributacao_conjunta": "Não aplicável (solteiro)",
+    },
+    {
+        "estado_civil": "Casado(a)",
+        "tipo_trabalho": "Trabalho dependente (ordenado)",
+        "ano_fiscal": "2024 (declaração 2025)",
+        "num_dependentes": "2",
+        "idade": "41",
+        "reside_portugal": "Sim, continente",
+        "rendimento_bruto": "42000 euros",
+        "tem_outras_rendas": "Sim, rendas de imóveis",
+        "valor_outras_rendas": "6000",
+        "retencoes_fonte": "7.800",
+        "seguranca_social": "4620",
+        "despesas_saude": "900",
+        "despesas_educacao": "2.400",
+        "despesas_habitacao": "1500",
+        "despesas_lares": "0",
+        "tem_beneficios": "Sim, PPR",
+        "detalhes_beneficios": "PPR 2.000€",
+        "paga_pensao": "Não",
+        "valor_pensao": "",
+        "tributacao_conjunta": "Sim, tributação conjunta",
+    },
+    {
+        "estado_civil": "Divorciado(a)",
+        "tipo_trabalho": "Trabalho dependente (ordenado)",
+        "ano_fiscal": "2024 (declaração 2025)",
+        "num_dependentes": "1",
+        "idade": "37",
+        "reside_portugal": "Sim, Madeira",
+        "rendimento_bruto": "27.300€",
+        "tem_outras_rendas": "Não",
+        "retencoes_fonte": "3100",
+        "seguranca_social": "3003",
+        "despesas_saude": "420",
+        "despesas_educacao": "650",
+        "tem_beneficios": "Não",
+        "paga_pensao": "Sim",
+        "valor_pensao": "3.600",
+        "tributacao_conjunta": "Não, tributação separada",
+    },
+    {
+        "estado_civil": "Viúvo(a)",
+        "tipo_trabalho": "Pensionista",
+        "ano_fiscal": "2024 (declaração 2025)",
+        "num_dependentes": "0",
+        "idade": "71",
+        "reside_portugal": "Sim, continente",
+        "rendimento_bruto": "14.200",
+        "tem_outras_rendas": "Sim, juros/dividendos",
+        "valor_outras_rendas": "350",
+        "retencoes_fonte": "600",
+        "seguranca_social": "0",
+        "despesas_saude": "1.800",
+        "despesas_lares": "4.000",
+        "tem_beneficios": "Não",
+        "paga_pensao": "Não",
+        "tributacao_conjunta": "Não aplicável (solteiro)",
+    },
+]
+
+
+async def medir_stream(handler, prompt: str, system_prompt: str) -> float:
+    """Latência ponta a ponta de uma análise em streaming"""
+    inicio = time.perf_counter()
+    async for _ in handler.generate_response_stream(prompt, system_prompt=system_prompt):
+        pass
+    return time.perf_counter() - inicio
+
+
+async def benchmark(base_url: str, variantes: dict, repeticoes: int) -> dict:
+    from llm_handler.groq_handler import GroqHandler
+    from llm_handler.http_pool import HTTPPool
+
+    handler = GroqHandler(base_url=base_url, http_pool=HTTPPool())
+    latencias = {nome: [] for nome in variantes}
+    for _ in range(repeticoes):
+        for respostas in RESPOSTAS_GRAVADAS:
+            for nome, (criar_prompt, system_prompt) in variantes.items():
+                latencias[nome].append(
+                    await medir_stream(handler, criar_prompt(respostas), system_prompt)
+                )
+    await handler.http_pool.aclose()
+    return latencias
+
+
+def main():
+    from llm_handler.groq_handler import estimate_tokens
+    from prompt_builder import criar_prompt_analise, criar_prompt_analise_completo
+    from prompts import SYSTEM_PROMPT, SYSTEM_PROMPT_ANALISE
+
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    # Tempo de leitura por token do prompt (prefill) e por token gerado
+    prefill = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0005
+
+    variantes = {
+        "completo": (criar_prompt_analise_completo, SYSTEM_PROMPT),
+        "compacto": (criar_prompt_analise, SYSTEM_PROMPT_ANALISE),
+    }
+
+    print("=" * 70)
+    print(f"🧪 BENCHMARK PROMPT DA ANÁLISE - {len(RESPOSTAS_GRAVADAS)} simulações gravadas")
+    print("=" * 70)
+
+    tokens = {nome: [] for nome in variantes}
+    for respostas in RESPOSTAS_GRAVADAS:
+        for nome, (criar_prompt, system_prompt) in variantes.items():
+            mensagens = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": criar_prompt(respostas)},
+            ]
+            tokens[nome].append(estimate_tokens(mensagens))
+
+    server = MockGroqServer(
+        latency=0.2,
+        token_interval=0.002,
+        prompt_token_interval=prefill,
+        reply_text=" ".join(["token"] * 300),
+    ).start()
+    try:
+        latencias = asyncio.run(benchmark(server.base_url, variantes, repeticoes))
+    finally:
+        server.stop()
+
+    for nome in variantes:
+        print(
+            f"{'📄' if nome == 'completo' else '✂️'} {nome:<9} "
+            f"tokens do prompt: média {statistics.mean(tokens[nome]):6.0f} "
+            f"(máx. {max(tokens[nome])}) | "
+            f"latência: mediana {statistics.median(latencias[nome]) * 1000:5.0f}ms"
+        )
+
+    reducao = 1 - sum(tokens["compacto"]) / sum(tokens["completo"])
+    ganho = statistics.median(latencias["completo"]) - statistics.median(
+        latencias["compacto"]
+    )
+    print(f"\n📉 Menos {reducao * 100:.0f}% tokens de prompt, {ganho * 1000:.0f}ms mais rápido")
+    print(f"   (prefill simulado: {prefill * 1000:.2f}ms por token)")
+
+
+if __name__ == "__main__":
+    main()
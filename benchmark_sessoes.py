@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark da memória das sessões (SessionSweeper)
+Vagas de utilizadores novos fazem /simular, respondem a algumas perguntas e
+abandonam o questionário, com os handlers reais de conversation_handler.py
+e o Telegram mock. Sem limpeza, user_data e o estado das conversas crescem
+a cada vaga; com limpeza (inatividade + limite de utilizadores) ficam
+planos.
+
+Uso: python benchmark_sessoes.py [utilizadores_por_vaga] [vagas]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import tracemalloc
+
+from mock_telegram_server import MockTelegramServer, message_update
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+
+logging.basicConfig(level=logging.ERROR)
+
+RESPOSTAS = 5  # abandonam o questionário na pergunta 6
+
+
+def _resposta(numero: int) -> str:
+    from prompts import PERGUNTAS_IRS
+
+    pergunta = PERGUNTAS_IRS[numero - 1]
+    if pergunta.get("opcoes"):
+        return pergunta["opcoes"][0]
+    return "35000" if pergunta["chave"] == "rendimento_bruto" else "500"
+
+
+def _sessoes(app):
+    """SessionSweeper da aplicação (dono do handler do grupo -1)"""
+    from session_sweeper import SessionSweeper
+
+    for handler in app.handlers[-1]:
+        sweeper = getattr(handler.callback, "__self__", None)
+        if isinstance(sweeper, SessionSweeper):
+            return sweeper
+    raise RuntimeError("Aplicação sem SessionSweeper")
+
+
+async def medir(mock, utilizadores: int, vagas: int, limpar: bool) -> list[dict]:
+    """Uma linha por vaga: utilizadores, conversas e memória depois dela"""
+    from telegram import Update
+    from conversation_handler import create_application
+
+    app = create_application()
+    sessoes = _sessoes(app)
+    sessoes.max_users = utilizadores * 2 if limpar else 10**9
+    sessoes.interval = 0  # limpeza chamada no fim de cada vaga
+
+    linhas = []
+    update_id = 0
+    tracemalloc.start()
+    async with app:
+        await app.start()
+        for vaga in range(vagas):
+            primeiro = vaga * utilizadores + 1
+            ids = range(primeiro, primeiro + utilizadores)
+            inicio_vaga = time.monotonic()
+            mensagens = [(u, "/simular") for u in ids] + [
+                (u, _resposta(n)) for n in range(1, RESPOSTAS + 1) for u in ids
+            ]
+            for user_id, texto in mensagens:
+                update_id += 1
+                await app.update_queue.put(
+                    Update.de_json(message_update(update_id, user_id, texto), app.bot)
+                )
+            await app.update_queue.join()
+            if limpar:
+                # As vagas anteriores já passaram do tempo de inatividade
+                sessoes.idle_ttl = time.monotonic() - inicio_vaga
+                sessoes.sweep()
+            # Mensagens guardadas pelo Telegram mock (mesmo processo) não contam
+            mock.sent_messages.clear()
+            inicio = time.perf_counter()
+            stats = sessoes.get_stats()
+            linhas.append(
+                {
+                    "vaga": vaga + 1,
+                    "user_data": stats["structures"]["user_data"],
+                    "conversations": stats["structures"]["conversations"],
+                    "sessions": stats["structures"]["sessions"],
+                    "stats_ms": (time.perf_counter() - inicio) * 1000,
+                    "tracemalloc": tracemalloc.get_traced_memory()[0],
+                    "evicted": stats["evicted_idle"] + stats["evicted_lru"],
+                }
+            )
+        await app.stop()
+    tracemalloc.stop()
+    return linhas
+
+
+def main():
+    utilizadores = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    vagas = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    os.chdir(tempfile.mkdtemp())  # estatísticas e log do benchmark, não os do bot
+    mock = MockTelegramServer().start()
+    os.environ["TELEGRAM_BASE_URL"] = mock.base_url
+
+    print("=" * 70)
+    print(
+        f"🧪 BENCHMARK SESSÕES - {vagas} vagas de {utilizadores} utilizadores que "
+        f"abandonam o /simular na pergunta {RESPOSTAS + 1}"
+    )
+    print("=" * 70)
+
+    try:
+        for nome, limpar in (("Sem limpeza", False), ("Com limpeza", True)):
+            print(f"\n{nome}:")
+            print(
+                f"  {'Vaga':>4} | {'user_data':>17} | {'conversas':>17} | "
+                f"{'sessões':>17} | {'Memória':>8} | {'Esquecidos':>10}"
+            )
+            for linha in asyncio.run(medir(mock, utilizadores, vagas, limpar)):
+                colunas = " | ".join(
+                    f"{linha[e]['entries']:>6} ({linha[e]['bytes'] / 1024:>6.0f}KB)"
+                    for e in ("user_data", "conversations", "sessions")
+                )
+                print(
+                    f"  {linha['vaga']:>4} | {colunas} | "
+                    f"{linha['tracemalloc'] / 1024 / 1024:>6.1f}MB | {linha['evicted']:>10}"
+                )
+            print(f"  (medição das estruturas para o /stats: {linha['stats_ms']:.1f}ms)")
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
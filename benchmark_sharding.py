@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Benchmark do modo sharded: updates/s com 1, 2, 4... processos worker
+Cada utilizador simulado faz comparações de IRS (/comparar, motor de
+cálculo e tabelas) e o questionário completo de /simular, respondendo a
+cada pergunta quando a recebe. Os updates passam pela frente (ShardRouter)
+e são tratados pelos handlers reais de conversation_handler.py.
+Verifica também que um worker reiniciado (SIGTERM ou SIGKILL) a meio do
+questionário retoma o utilizador na pergunta certa.
+
+Cada worker tem o seu Telegram e Groq mock no próprio processo, para o
+custo dos mocks crescer com os workers e não limitar a medição.
+
+Uso: python benchmark_sharding.py [utilizadores] [comparações por utilizador]
+"""
+
+import os
+import re
+import sys
+import time
+import socket
+import random
+import asyncio
+import logging
+import tempfile
+
+from mock_telegram_server import MockTelegramServer
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+# Mede-se o bot, não o plano da conta nem as proteções do LLM
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+os.environ.setdefault("LLM_DAILY_TOKEN_QUOTA", "0")
+os.environ.setdefault("LLM_SHED_QUEUE_DEPTH", "0")
+os.environ.setdefault("LLM_SHED_LATENCY", "0")
+
+from sharding import ShardRouter, WorkerPool, shard_for  # noqa: E402
+
+logging.basicConfig(level=logging.ERROR)
+
+SEGREDO = "segredo-benchmark"
+PERGUNTA = re.compile(r"\*\*Pergunta (\d+)/")
+FIM = "O que desejas fazer agora"
+
+
+def _worker(argv: list[str]):
+    """Worker do benchmark: mocks no próprio processo e o run_worker real"""
+    from mock_groq_server import MockGroqServer
+
+    shard, shards, port, path, db_path = int(argv[0]), int(argv[1]), int(argv[2]), argv[3], argv[4]
+    # Base de estatísticas e log do benchmark, não os do bot
+    os.chdir(os.path.dirname(db_path))
+
+    sinal = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destino = ("127.0.0.1", int(os.environ["BENCH_SINAL_PORTA"]))
+
+    def avisar(params: dict):
+        # Só as mensagens que o utilizador simulado espera: pergunta e fim
+        texto = str(params.get("text", ""))
+        if FIM in texto or PERGUNTA.match(texto):
+            sinal.sendto(f"{params.get('chat_id')}\t{texto}".encode(), destino)
+
+    telegram = MockTelegramServer(on_message=avisar).start()
+    groq = MockGroqServer(latency=0.0, completion_tokens=150).start()
+    os.environ["TELEGRAM_BASE_URL"] = telegram.base_url
+    os.environ["GROQ_BASE_URL"] = groq.base_url
+
+    from sharding import run_worker
+
+    run_worker(shard, shards, port, path, db_path)
+
+
+class _Sinais(asyncio.DatagramProtocol):
+    """Mensagens do bot a cada utilizador, recebidas dos workers"""
+
+    def __init__(self):
+        self.filas: dict[int, asyncio.Queue] = {}
+
+    def fila(self, user_id: int) -> asyncio.Queue:
+        return self.filas.setdefault(user_id, asyncio.Queue())
+
+    def datagram_received(self, data: bytes, addr):
+        chat_id, texto = data.decode().split("\t", 1)
+        self.fila(int(chat_id)).put_nowait(texto)
+
+
+def _resposta(numero: int) -> str:
+    """Resposta à pergunta número (1-20): primeira opção ou um valor"""
+    from prompts import PERGUNTAS_IRS
+
+    pergunta = PERGUNTAS_IRS[numero - 1]
+    if pergunta.get("opcoes"):
+        return pergunta["opcoes"][0]
+    return "35000" if pergunta["chave"] == "rendimento_bruto" else "500"
+
+
+def _porta_base(workers: int) -> int:
+    """Primeira de workers portas seguidas livres"""
+    while True:
+        base = random.randint(20000, 50000)
+        try:
+            for porta in range(base, base + workers):
+                with socket.socket() as s:
+                    s.bind(("127.0.0.1", porta))
+            return base
+        except OSError:
+            continue
+
+
+class Cenario:
+    """Frente, workers, Telegram mock (do lado dos utilizadores) e sinais"""
+
+    def __init__(self, workers: int, pasta: str):
+        self.pool = WorkerPool(
+            workers,
+            _porta_base(workers),
+            db_path=os.path.join(pasta, "bot_state.db"),
+            script=os.path.abspath(__file__),
+            restart_delay=0.1,
+        )
+        self.router = ShardRouter(self.pool.urls, "/telegram", SEGREDO, "127.0.0.1", 0, self.pool.secret_token)
+        self.telegram = MockTelegramServer()
+        self.sinais = _Sinais()
+        self.parar = asyncio.Event()
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        transporte, _ = await loop.create_datagram_endpoint(
+            lambda: self.sinais, local_addr=("127.0.0.1", 0)
+        )
+        self._transporte = transporte
+        os.environ["BENCH_SINAL_PORTA"] = str(transporte.get_extra_info("sockname")[1])
+
+        await self.router.start()
+        self.telegram.start()
+        self.telegram.set_webhook(f"http://127.0.0.1:{self.router.port}/telegram", SEGREDO, 8)
+        self.pool.start()
+        await self.pool.wait_ready()
+        self._vigilancia = asyncio.create_task(self.pool.supervise(self.parar, interval=0.1))
+        return self
+
+    async def __aexit__(self, *exc):
+        self.parar.set()
+        await self._vigilancia
+        await self.router.stop()
+        await asyncio.to_thread(self.pool.stop)
+        self.telegram.stop()
+        self._transporte.close()
+
+    async def responder_ate(self, user_id: int, ultima: int = 20) -> int:
+        """Responde a cada pergunta recebida até à pergunta ultima; devolve
+        o número da próxima pergunta enviada pelo bot (21 = fim)"""
+        fila = self.sinais.fila(user_id)
+        while True:
+            texto = await asyncio.wait_for(fila.get(), timeout=60)
+            if FIM in texto:
+                return 21
+            numero = int(PERGUNTA.match(texto).group(1))
+            if numero > ultima:
+                return numero
+            self.telegram.push_message(user_id, _resposta(numero))
+
+    async def utilizador(self, user_id: int, comparacoes: int):
+        for i in range(comparacoes):
+            self.telegram.push_message(user_id, f"/comparar {1000 + i} 200000 400")
+        self.telegram.push_message(user_id, "/simular")
+        await self.responder_ate(user_id)
+
+
+async def medir(workers: int, utilizadores: int, comparacoes: int) -> dict:
+    with tempfile.TemporaryDirectory() as pasta:
+        async with Cenario(workers, pasta) as cenario:
+            inicio = time.perf_counter()
+            cpu_inicio = time.process_time()
+            await asyncio.gather(
+                *(cenario.utilizador(u, comparacoes) for u in range(1, utilizadores + 1))
+            )
+            duracao = time.perf_counter() - inicio
+            cpu_frente = time.process_time() - cpu_inicio
+            falhas = cenario.telegram.webhook_failures
+    updates = utilizadores * (comparacoes + 1 + 20)
+    return {
+        "updates_s": updates / duracao,
+        "duracao": duracao,
+        "cpu_frente": cpu_frente / duracao,
+        "falhas": falhas,
+    }
+
+
+async def medir_reinicio() -> list[tuple[str, bool, float]]:
+    """Reinicia o worker de um utilizador duas vezes a meio do questionário"""
+    resultados = []
+    user_id = 7
+    with tempfile.TemporaryDirectory() as pasta:
+        async with Cenario(2, pasta) as cenario:
+            shard = shard_for(user_id, 2)
+            cenario.telegram.push_message(user_id, "/simular")
+            seguinte = await cenario.responder_ate(user_id, ultima=6)
+
+            for nome, sinal in (("SIGTERM (deploy)", "terminate"), ("SIGKILL (crash)", "kill")):
+                processo = cenario.pool.processes[shard]
+                if sinal == "kill":
+                    # Sem aviso: só fica o que já foi escrito (PERSISTENCE_INTERVAL)
+                    await asyncio.sleep(float(os.getenv("PERSISTENCE_INTERVAL", "1.0")) + 0.5)
+                inicio = time.perf_counter()
+                getattr(processo, sinal)()
+                await asyncio.to_thread(processo.wait)
+                while cenario.pool.processes[shard] is processo:
+                    await asyncio.sleep(0.05)
+                await cenario.pool.wait_ready()
+                recuperacao = time.perf_counter() - inicio
+
+                # Responder à pergunta pendente: o bot deve seguir para a
+                # próxima (com o estado perdido, a pergunta repete-se ou o
+                # questionário deixa de responder)
+                cenario.telegram.push_message(user_id, _resposta(seguinte))
+                esperado = seguinte + 6
+                try:
+                    seguinte = await cenario.responder_ate(user_id, ultima=seguinte + 5)
+                except asyncio.TimeoutError:
+                    seguinte = None
+                resultados.append((nome, seguinte == esperado, recuperacao))
+                if seguinte is None:
+                    return resultados
+
+            cenario.telegram.push_message(user_id, _resposta(seguinte))
+            fim = await cenario.responder_ate(user_id)
+            resultados.append(("Questionário concluído", fim == 21, 0.0))
+    return resultados
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        _worker(sys.argv[2:])
+        return
+
+    utilizadores = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    comparacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    nucleos = os.cpu_count() or 1
+
+    print("=" * 70)
+    print(
+        f"🧪 BENCHMARK SHARDING - {utilizadores} utilizadores, {comparacoes} /comparar "
+        f"+ /simular (20 perguntas) cada"
+    )
+    print("=" * 70)
+    print(f"Núcleos disponíveis: {nucleos}\n")
+    print(f"{'Workers':>8} | {'Updates/s':>10} | {'Ganho':>6} | {'Ideal':>6} | {'CPU da frente':>13}")
+
+    base = None
+    for workers in (1, 2, 4, 8, 16):
+        if workers > max(2, nucleos):
+            break
+        r = asyncio.run(medir(workers, utilizadores, comparacoes))
+        base = base or r["updates_s"]
+        print(
+            f"{workers:>8} | {r['updates_s']:>10.1f} | {r['updates_s'] / base:>5.2f}x | "
+            f"{min(workers, nucleos):>5}x | {r['cpu_frente']:>12.0%}"
+        )
+        if r["falhas"]:
+            print(f"{'':>8}   ⚠️ {r['falhas']} entregas falhadas à frente")
+    print(
+        f"\n📈 A frente (com o Telegram mock) gasta um núcleo inteiro a "
+        f"~{r['updates_s'] / r['cpu_frente']:.0f} updates/s"
+    )
+    if nucleos < 2:
+        print("\n⚠️ Só um núcleo: os workers dividem o mesmo CPU, não há ganho a medir")
+
+    print("\nWorker reiniciado a meio do questionário:")
+    for nome, ok, recuperacao in asyncio.run(medir_reinicio()):
+        extra = f" (worker de volta em {recuperacao:.1f}s)" if recuperacao else ""
+        print(f"  {'✅' if ok else '❌'} {nome}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do processamento de updates: sequencial vs paralelo por utilizador
+Cada utilizador simulado faz um questionário curto (ConversationHandler) e
+os updates de todos chegam intercalados. Mede updates/s com cada vez mais
+utilizadores e verifica que as respostas de cada um ficam pela ordem certa.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+
+from mock_telegram_server import MockTelegramServer, message_update
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import (  # noqa: E402
+    Application,
+    CommandHandler,
+    ConversationHandler,
+    MessageHandler,
+    SimpleUpdateProcessor,
+    filters,
+)
+
+from update_processor import PerUserUpdateProcessor  # noqa: E402
+
+logging.basicConfig(level=logging.ERROR)
+
+TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
+PERGUNTAS = 5
+
+
+def _criar_app(mock: MockTelegramServer, processador, trabalho: float) -> Application:
+    """Questionário de PERGUNTAS passos; cada resposta espera 'trabalho' segundos"""
+
+    async def iniciar(update, context):
+        context.user_data["respostas"] = []
+        await update.message.reply_text("Pergunta 1")
+        return 0
+
+    def responder(estado: int):
+        async def handler(update, context):
+            # I/O simulado (base de dados, LLM...), com variação para baralhar
+            await asyncio.sleep(trabalho * random.uniform(0.5, 1.5))
+            context.user_data["respostas"].append(update.message.text)
+            await update.message.reply_text(f"Pergunta {estado + 2}")
+            return estado + 1 if estado + 1 < PERGUNTAS else ConversationHandler.END
+
+        return handler
+
+    builder = Application.builder().token(TOKEN).base_url(mock.base_url)
+    app = builder.concurrent_updates(processador).build()
+    app.add_handler(
+        ConversationHandler(
+            entry_points=[CommandHandler("simular", iniciar)],
+            states={
+                i: [MessageHandler(filters.TEXT & ~filters.COMMAND, responder(i))]
+                for i in range(PERGUNTAS)
+            },
+            fallbacks=[],
+        )
+    )
+    return app
+
+
+async def medir(mock: MockTelegramServer, processador, utilizadores: int, trabalho: float):
+    """Devolve (updates/s, utilizadores com respostas fora de ordem ou perdidas)"""
+    app = _criar_app(mock, processador, trabalho)
+    # Updates intercalados: /simular de todos, depois a resposta 1 de todos...
+    mensagens = [(u, "/simular") for u in range(1, utilizadores + 1)] + [
+        (u, f"r{i}") for i in range(PERGUNTAS) for u in range(1, utilizadores + 1)
+    ]
+    async with app:
+        await app.start()
+        inicio = time.perf_counter()
+        for update_id, (user_id, texto) in enumerate(mensagens, 1):
+            await app.update_queue.put(
+                Update.de_json(message_update(update_id, user_id, texto), app.bot)
+            )
+        await app.update_queue.join()
+        duracao = time.perf_counter() - inicio
+        await app.stop()
+
+    esperado = [f"r{i}" for i in range(PERGUNTAS)]
+    fora_de_ordem = sum(
+        1
+        for u in range(1, utilizadores + 1)
+        if app.user_data.get(u, {}).get("respostas") != esperado
+    )
+    return len(mensagens) / duracao, fora_de_ordem
+
+
+def main():
+    trabalho = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    concorrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    random.seed(42)
+    print("=" * 70)
+    print(
+        f"🧪 BENCHMARK UPDATES - questionário de {PERGUNTAS} respostas, "
+        f"~{trabalho * 1000:.0f}ms por resposta"
+    )
+    print("=" * 70)
+    print(f"{'Utilizadores':>12} | {'Sequencial':>12} | {'Por utilizador':>15} | {'Sem ordem':>15}")
+
+    mock = MockTelegramServer().start()
+    try:
+        for utilizadores in (1, 5, 20, 50, 100):
+            sequencial, erros_seq = asyncio.run(medir(mock, False, utilizadores, trabalho))
+            por_utilizador, erros_pu = asyncio.run(
+                medir(mock, PerUserUpdateProcessor(concorrencia), utilizadores, trabalho)
+            )
+            # Paralelo sem ordem (SimpleUpdateProcessor do PTB), para comparação
+            sem_ordem, erros_so = asyncio.run(
+                medir(mock, SimpleUpdateProcessor(concorrencia), utilizadores, trabalho)
+            )
+            print(
+                f"{utilizadores:>12} | {sequencial:>7.1f} up/s | "
+                f"{por_utilizador:>10.1f} up/s | {sem_ordem:>10.1f} up/s"
+            )
+            if erros_seq or erros_pu or erros_so:
+                print(
+                    f"{'':>12}   ⚠️ questionários errados: sequencial {erros_seq}, "
+                    f"por utilizador {erros_pu}, sem ordem {erros_so}"
+                )
+    finally:
+        mock.stop()
+
+    print(
+        f"\n✅ Paralelo por utilizador: até {concorrencia} updates em simultâneo, "
+        "respostas de cada utilizador sempre por ordem"
+    )
+
+
+if __name__ == "__main__":
+    main()
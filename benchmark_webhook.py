@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark da receção de updates: polling (getUpdates) vs webhook
+Envia mensagens sintéticas pela Bot API mock e mede o tempo desde o envio
+até o handler do bot as receber, nos dois modos de main.py
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import logging
+
+from mock_telegram_server import MockTelegramServer
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+
+from telegram.ext import Application, MessageHandler, filters  # noqa: E402
+
+from llm_handler.hedging import LatencyTracker  # noqa: E402
+from webhook_server import serve_webhook  # noqa: E402
+
+logging.basicConfig(level=logging.WARNING)
+
+TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
+
+
+def _criar_app(mock: MockTelegramServer, latencias: LatencyTracker, recebidos: asyncio.Event, total: int):
+    """Aplicação com um só handler que regista a latência de cada update"""
+    contagem = 0
+
+    async def registar(update, context):
+        nonlocal contagem
+        latencias.record(time.perf_counter() - mock.pushed_at[update.update_id])
+        contagem += 1
+        if contagem >= total:
+            recebidos.set()
+
+    app = Application.builder().token(TOKEN).base_url(mock.base_url).build()
+    app.add_handler(MessageHandler(filters.TEXT, registar))
+    return app
+
+
+async def _enviar(mock: MockTelegramServer, total: int, intervalo: float):
+    """Mensagens de 20 utilizadores com chegadas de Poisson (média intervalo)"""
+    for i in range(total):
+        mock.push_message(random.randint(1, 20), f"Mensagem {i}")
+        await asyncio.sleep(random.expovariate(1.0 / intervalo))
+
+
+async def medir_polling(total: int, intervalo: float) -> tuple[LatencyTracker, dict]:
+    """Como main.py em polling: poll_interval=1.0, timeout=10"""
+    mock = MockTelegramServer().start()
+    latencias = LatencyTracker(window=total)
+    recebidos = asyncio.Event()
+    app = _criar_app(mock, latencias, recebidos, total)
+    try:
+        async with app:
+            await app.updater.start_polling(poll_interval=1.0, timeout=10)
+            await app.start()
+            inicio = time.perf_counter()
+            await _enviar(mock, total, intervalo)
+            await asyncio.wait_for(recebidos.wait(), timeout=60)
+            duracao = time.perf_counter() - inicio
+            await app.updater.stop()
+            await app.stop()
+    finally:
+        mock.stop()
+    return latencias, {"duracao": duracao, "chamadas": dict(mock.calls)}
+
+
+async def medir_webhook(total: int, intervalo: float) -> tuple[LatencyTracker, dict]:
+    """Como main.py em webhook: servidor embutido com segredo"""
+    mock = MockTelegramServer().start()
+    latencias = LatencyTracker(window=total)
+    recebidos = asyncio.Event()
+    app = _criar_app(mock, latencias, recebidos, total)
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+
+    parar = asyncio.Event()
+    servidor = asyncio.create_task(
+        serve_webhook(
+            app,
+            webhook_url=f"http://127.0.0.1:{porta}",
+            path="/telegram",
+            host="127.0.0.1",
+            port=porta,
+            stop_event=parar,
+        )
+    )
+    try:
+        while not mock.webhook_url:
+            await asyncio.sleep(0.01)
+        inicio = time.perf_counter()
+        await _enviar(mock, total, intervalo)
+        await asyncio.wait_for(recebidos.wait(), timeout=60)
+        duracao = time.perf_counter() - inicio
+    finally:
+        parar.set()
+        await servidor
+        mock.stop()
+    return latencias, {
+        "duracao": duracao,
+        "chamadas": dict(mock.calls),
+        "falhas": mock.webhook_failures,
+    }
+
+
+async def medir_segredo() -> tuple[int, int]:
+    """Pedidos com segredo errado são recusados (403) sem chegar aos handlers"""
+    import http.client
+    from webhook_server import WebhookServer
+
+    app = Application.builder().token(TOKEN).build()
+    servidor = WebhookServer(app, secret_token="certo", host="127.0.0.1", port=0)
+    await servidor.start()
+    estados = []
+    for segredo in ("errado", "certo"):
+        conn = http.client.HTTPConnection("127.0.0.1", servidor.port)
+        corpo = '{"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "x"}}'
+        await asyncio.to_thread(
+            conn.request,
+            "POST",
+            "/telegram",
+            corpo,
+            {"X-Telegram-Bot-Api-Secret-Token": segredo},
+        )
+        estados.append((await asyncio.to_thread(conn.getresponse)).status)
+        conn.close()
+    await servidor.stop()
+    return estados[0], estados[1]
+
+
+def _linha(nome: str, latencias: LatencyTracker, info: dict):
+    stats = latencias.get_stats()
+    por_minuto = info["chamadas"].get("getUpdates", 0) / info["duracao"] * 60
+    print(
+        f"{nome:<9} p50 {stats['p50_ms']:>5}ms | p90 {stats['p90_ms']:>5}ms | "
+        f"p99 {stats['p99_ms']:>5}ms | máx. {round(latencias.percentile(100) * 1000):>5}ms | "
+        f"getUpdates/min: {por_minuto:.0f}"
+    )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    intervalo = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    random.seed(42)
+    print("=" * 70)
+    print(f"🧪 BENCHMARK WEBHOOK - {total} mensagens, uma a cada ~{intervalo}s")
+    print("=" * 70)
+    print("Latência do envio pelo Telegram até ao handler do bot:\n")
+
+    polling, info_polling = asyncio.run(medir_polling(total, intervalo))
+    _linha("Polling", polling, info_polling)
+    webhook, info_webhook = asyncio.run(medir_webhook(total, intervalo))
+    _linha("Webhook", webhook, info_webhook)
+
+    ganho = polling.percentile(50) / webhook.percentile(50)
+    print(f"\n📈 Mediana {ganho:.0f}x mais rápida com webhook")
+    print(f"💥 Entregas falhadas ao webhook: {info_webhook['falhas']}")
+
+    errado, certo = asyncio.run(medir_segredo())
+    print(f"🔐 Segredo errado: HTTP {errado} | Segredo certo: HTTP {certo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,10 +26,141 @@ if not GROQ_API_KEY:
 BOT_NAME = "IRS Portugal Assistant - Marinete"
 BOT_VERSION = "2.0.0"
 MAX_MESSAGE_LENGTH = 4000
+# Intervalo mínimo (segundos) entre edições de uma mensagem em streaming
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# Receção de updates: "polling" (getUpdates), "webhook" (servidor HTTP
+# embutido, o Telegram envia cada update assim que chega) ou "sharded"
+# (webhook à frente de vários processos worker, ver sharding.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# URL pública (HTTPS) onde o Telegram chega ao bot, ex: https://bot.exemplo.pt
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT") or os.getenv("PORT") or "8443")
+# Segredo enviado pelo Telegram em cada pedido (vazio = gerado no arranque)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Ligações simultâneas do Telegram ao webhook (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Updates tratados em paralelo (utilizadores diferentes; os de cada
+# utilizador são sempre tratados por ordem, um de cada vez); não deve passar
+# de TELEGRAM_POOL_SIZE, para as respostas não esperarem por uma conexão
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+# Modo sharded: número de processos worker (por omissão um por núcleo) e
+# primeira porta local dos workers (um por porta, só em 127.0.0.1)
+BOT_SHARDS = int(os.getenv("BOT_SHARDS") or os.cpu_count() or 1)
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT") or WEBHOOK_PORT + 1)
+# Estado das conversas (respostas e pergunta atual), para um deploy não
+# obrigar a recomeçar o questionário; partilhado pelos workers no modo
+# sharded (vazio = só em memória)
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "bot_state.db")
+# Segundos entre cópias do estado alterado para a persistência (em memória)
+# e entre gravações em disco, numa só transação; um processo morto sem
+# aviso perde no máximo a soma dos dois
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "1.0"))
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "5.0"))
 
 # Configurações LLM
-LLM_PROVIDER = "groq"
+# Backend principal: "groq" ou "openai" (endpoint compatível com OpenAI)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
 MODEL_NAME = os.getenv("MODEL_NAME", "moonshotai/kimi-k2-instruct-0905")
+# Modelos Groq alternativos para failover, separados por vírgulas
+LLM_FALLBACK_MODELS = [
+    m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()
+]
+# Modelo pequeno e rápido para tarefas curtas (explicações, classificação)
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+
+# Perfis por tarefa: modelo, limite de tokens e temperatura
+# model None = modelo de cada backend (MODEL_NAME e modelos de failover);
+# um modelo explícito só se aplica a backends Groq
+MODEL_PROFILES = {
+    # Relatório completo da simulação (/simular)
+    "analise": {"model": None, "max_tokens": 2048, "temperature": 0.7},
+    # Conversa livre
+    "chat": {"model": None, "max_tokens": 1024, "temperature": 0.7},
+    # Explicação curta de um cálculo já feito (/calcular)
+    "explicacao": {"model": LLM_FAST_MODEL, "max_tokens": 300, "temperature": 0.3},
+    # Classificação / respostas de uma linha
+    "classificacao": {"model": LLM_FAST_MODEL, "max_tokens": 20, "temperature": 0.0},
+    # Resumo das mensagens antigas da conversa livre
+    "resumo": {"model": LLM_FAST_MODEL, "max_tokens": 300, "temperature": 0.2},
+}
+
+# Memória da conversa livre: orçamento de tokens do histórico por utilizador,
+# mensagens guardadas na íntegra (as anteriores vão para um resumo), tempo
+# sem uso até o histórico ser esquecido e máximo de utilizadores em memória
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500"))
+CHAT_HISTORY_RECENT_TURNS = int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "6"))
+CHAT_HISTORY_TTL = float(os.getenv("CHAT_HISTORY_TTL", "1800"))  # segundos
+CHAT_HISTORY_MAX_USERS = int(os.getenv("CHAT_HISTORY_MAX_USERS", "5000"))
+# Sessões (user_data e estado do questionário): segundos sem updates até
+# serem esquecidas (um /simular abandonado a meio), máximo de utilizadores
+# em memória (sai o menos recente) e segundos entre limpezas
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "7200"))
+SESSION_MAX_USERS = int(os.getenv("SESSION_MAX_USERS", "20000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Mensagens seguidas do mesmo utilizador com menos de N segundos entre si
+# vão juntas num só pedido; a janela cresce do mínimo ao máximo com a carga
+CHAT_DEBOUNCE_MIN = float(os.getenv("CHAT_DEBOUNCE_MIN", "0.8"))
+CHAT_DEBOUNCE_MAX = float(os.getenv("CHAT_DEBOUNCE_MAX", "3.0"))
+
+# Endpoint compatível com OpenAI (opcional), ex: https://api.openai.com/v1
+OPENAI_COMPAT_BASE_URL = os.getenv("OPENAI_COMPAT_BASE_URL") or None
+OPENAI_COMPAT_MODEL = os.getenv("OPENAI_COMPAT_MODEL", "gpt-4o-mini")
+OPENAI_COMPAT_API_KEY = os.getenv("OPENAI_COMPAT_API_KEY")
+
+# Concorrência LLM
+# Número máximo de chamadas simultâneas à API (as restantes aguardam vez)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Limites da conta Groq (ajustar ao plano; 0 desativa o limite)
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "60"))  # pedidos por minuto
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "60000"))  # tokens por minuto
+# Tamanho máximo da fila de pedidos à espera do modelo
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "200"))
+# Repetições e prazos (segundos) das chamadas à API
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "30"))  # por tentativa
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))  # total, com repetições
+# Circuit breaker: falhas seguidas até abrir e tempo até novo teste
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "30"))
+# Hedging: pedido duplicado se a resposta passar do percentil das latências
+# recentes, com no máximo LLM_HEDGE_BUDGET pedidos extra por pedido
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+# Load shedding: com N ou mais pedidos na fila, ou p90 da latência acima de
+# N segundos, o chat livre e as explicações do /calcular passam a respostas
+# locais (cache, FAQ, aviso de ocupado); a simulação nunca é recusada.
+# 0 desativa o critério
+LLM_SHED_QUEUE_DEPTH = int(os.getenv("LLM_SHED_QUEUE_DEPTH", "50"))
+LLM_SHED_LATENCY = float(os.getenv("LLM_SHED_LATENCY", "10"))
+# Limite diário de tokens por utilizador (0 = sem limite) e preço por
+# milhão de tokens (USD) para o custo no /stats
+LLM_DAILY_TOKEN_QUOTA = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "100000"))
+LLM_PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "1.0"))
+LLM_PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "3.0"))
+# Pool HTTP partilhado pelos backends LLM (conexões keep-alive)
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"  # se h2 instalado
+# Intervalo (segundos) dos pings que mantêm as conexões abertas (0 desliga)
+LLM_KEEPALIVE_INTERVAL = float(os.getenv("LLM_KEEPALIVE_INTERVAL", "45"))
+# Conexões simultâneas à API do Telegram
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "32"))
+# URL base alternativa da Bot API (ex: servidor mock local), terminada em /bot
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL") or None
+# URL base alternativa (ex: servidor mock local para testes de carga)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+# Cache de respostas para perguntas livres repetidas
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))  # segundos
+# Cache semântica: reutiliza respostas de perguntas parecidas com as mesmas
+# palavras (0 desativa; desligada por omissão, uma resposta fiscal errada
+# sai sem aviso). Ver a precisão por limiar com python -m llm_handler.semantic_cache
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0"))
 
 # Configurações IRS Portugal 2025
 IRS_YEAR = 2025
@@ -46,9 +177,16 @@ TAX_BRACKETS = {
 
 # Deduções principais
 DEDUCTIONS = {
-    "minimo_existencia": 4104,
+    "minimo_existencia": 10640,
+    "deducao_especifica": 4104,
     "despesas_saude": {"max": 1000, "rate": 0.15},
     "despesas_educacao": {"max": 800, "rate": 0.30},
     "encargos_habitacao": {"max": 296, "rate": 0.15},
     "lares": {"max": 403.75, "rate": 0.25},
 }
+
+# Taxa de contribuição do trabalhador para a Segurança Social (categoria A)
+SOCIAL_SECURITY_RATE = 0.11
+
+# Cálculo rápido: pedir ao LLM uma explicação em texto dos valores calculados
+CALCULO_EXPLICACAO_LLM = os.getenv("CALCULO_EXPLICACAO_LLM", "false").lower() == "true"
@@ -3,9 +3,20 @@ Conversation Handler - Bot IRS Portugal com Marinete
 Sistema de simulação de IRS com 20 perguntas interativas
 """
 
+import time
+import asyncio
 import logging
-from typing import Dict, Any
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from typing import AsyncIterator, Dict, Any
+
+import numpy as np
+from telegram import (
+    Message,
+    Update,
+    ReplyKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardRemove,
+)
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -16,9 +27,46 @@ from telegram.ext import (
 )
 
 # Importar handler LLM
+from llm_handler.conversation_memory import ConversationMemory
 from llm_handler.groq_handler import GroqHandler
+from llm_handler.load_shedding import LLMOverloadedError
+from llm_handler.quota import LLMQuotaExceededError
+from llm_handler.resilience import LLMUnavailableError
+from llm_handler.scheduler import (
+    PRIORITY_CALCULATION,
+    PRIORITY_CHAT,
+    PRIORITY_SIMULATION,
+)
+from config import (
+    CALCULO_EXPLICACAO_LLM,
+    CHAT_DEBOUNCE_MAX,
+    CHAT_DEBOUNCE_MIN,
+    CHAT_HISTORY_MAX_TOKENS,
+    CHAT_HISTORY_MAX_USERS,
+    CHAT_HISTORY_RECENT_TURNS,
+    CHAT_HISTORY_TTL,
+    MAX_MESSAGE_LENGTH,
+    MODEL_PROFILES,
+    SESSION_IDLE_TTL,
+    SESSION_MAX_USERS,
+    SESSION_SWEEP_INTERVAL,
+    STREAM_EDIT_INTERVAL,
+)
+
+# Motor de cálculo local de IRS
+from irs_calculator import (
+    argumentos_de_respostas,
+    calcular_irs,
+    calcular_irs_lote,
+    formatar_calculo,
+    formatar_comparacao,
+    parse_calculo_args,
+)
 
 # Importar sistemas de monitoramento e sugestões
+from message_debouncer import MessageDebouncer
+from session_sweeper import SessionSweeper
+from update_processor import PerUserUpdateProcessor
 from monitoring import monitoring
 from suggestions import suggestion_manager
 
@@ -30,8 +78,15 @@ from prompts import (
     HELP_MESSAGE,
     PERGUNTAS_IRS,
     SYSTEM_PROMPT,
+    SYSTEM_PROMPT_ANALISE,
+    SUMMARY_PROMPT,
+    ERROR_MESSAGES,
+    RESPOSTAS_LOCAIS,
 )
 
+# Prompt compacto da análise (cálculo feito localmente)
+from prompt_builder import criar_prompt_analise
+
 # Estados da conversação (20 perguntas + estados auxiliares)
 (
     MENU_PRINCIPAL,
@@ -69,13 +124,282 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class InFlightTasks:
+    """
+    Tarefas à espera do LLM por (chat, utilizador, tipo)
+
+    Cada tipo (análise da simulação, conversa livre) tem a sua tarefa: uma
+    nova substitui (e cancela) a anterior do mesmo tipo, sem tocar nas
+    outras; cancel() cancela todas as do utilizador. O cancelamento chega à
+    chamada à API e aborta o pedido HTTP. Só conta como chamada LLM
+    cancelada a tarefa que já chamava o modelo (não a que esperava, ex:
+    pela janela do debounce).
+    """
+
+    SIMULACAO = "simular"
+    CHAT = "chat"
+    KINDS = (SIMULACAO, CHAT)
+
+    def __init__(self):
+        self._tasks: dict[tuple[int, int, str], asyncio.Task] = {}
+        self._calling: set[asyncio.Task] = set()  # já à espera do LLM
+        self.cancelled: dict[str, int] = {}  # motivo -> tarefas canceladas
+
+    @staticmethod
+    def key(update: Update, kind: str = None) -> tuple:
+        """(chat, utilizador), ou (chat, utilizador, tipo) de uma tarefa"""
+        key = (update.effective_chat.id, update.effective_user.id)
+        return key if kind is None else key + (kind,)
+
+    def track(
+        self, key: tuple[int, int, str], task: asyncio.Task = None, calling: bool = True
+    ) -> asyncio.Task:
+        """
+        Regista a tarefa (por omissão a atual), cancelando a anterior do tipo
+
+        Args:
+            calling: A tarefa já chama o LLM (False se ainda espera; ver started)
+        """
+        task = task or asyncio.current_task()
+        previous = self._tasks.get(key)
+        if previous is not None and previous is not task:
+            self._cancel(previous, "substituída")
+        self._tasks[key] = task
+        if calling:
+            self._calling.add(task)
+        task.add_done_callback(self._calling.discard)
+        task.add_done_callback(
+            lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None
+        )
+        return task
+
+    def started(self, key: tuple[int, int, str]):
+        """A tarefa registada em key passou a chamar o LLM"""
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            self._calling.add(task)
+
+    def cancel(self, key: tuple[int, int], reason: str) -> bool:
+        """Cancela as tarefas em curso do utilizador (de todos os tipos)"""
+        cancelled = False
+        for kind in self.KINDS:
+            task = self._tasks.pop(key + (kind,), None)
+            if task is not None and task is not asyncio.current_task():
+                cancelled = self._cancel(task, reason) or cancelled
+        return cancelled
+
+    def _cancel(self, task: asyncio.Task, reason: str) -> bool:
+        if task.done():
+            return False
+        task.cancel()
+        if task not in self._calling:
+            return False
+        self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+        logger.info(f"Tarefa LLM cancelada ({reason})")
+        return True
+
+    def busy(self, key: tuple[int, int]) -> bool:
+        """O utilizador tem uma tarefa (de qualquer tipo) ainda a correr"""
+        return any(
+            (task := self._tasks.get(key + (kind,))) is not None and not task.done()
+            for kind in self.KINDS
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"in_flight": len(self._tasks), "cancelled": dict(self.cancelled)}
+
+
+class StreamingMessageRenderer:
+    """
+    Mostra uma resposta em streaming numa mensagem Telegram
+
+    Edita a mesma mensagem no máximo uma vez por edit_interval segundos
+    (limite de edições do Telegram) e continua numa nova mensagem quando o
+    texto se aproxima de max_length. As edições intermédias vão em texto
+    simples, porque o Markdown pode estar incompleto a meio da geração.
+    """
+
+    def __init__(
+        self,
+        reply_to: Message,
+        edit_interval: float = STREAM_EDIT_INTERVAL,
+        max_length: int = MAX_MESSAGE_LENGTH,
+        finalize_timeout: float = 30.0,
+    ):
+        self.reply_to = reply_to
+        self.edit_interval = edit_interval
+        self.max_length = max_length
+        self.finalize_timeout = finalize_timeout
+
+        self._message = None  # Mensagem Telegram a ser editada
+        self._text = ""  # Texto completo da mensagem atual
+        self._sent_text = ""  # Último texto efetivamente mostrado
+        self._last_edit = 0.0
+
+    async def render(self, chunks: AsyncIterator[str]) -> str:
+        """Consome o stream de tokens e devolve o texto completo"""
+        full_text = ""
+        try:
+            async for chunk in chunks:
+                full_text += chunk
+                await self.feed(chunk)
+        finally:
+            # Mostrar o texto já recebido mesmo que o stream falhe a meio
+            await self.finish()
+        return full_text
+
+    async def feed(self, chunk: str):
+        """Acrescenta um fragmento de texto e atualiza a mensagem se for altura"""
+        self._text += chunk
+
+        # Mudar para nova mensagem perto do limite de tamanho
+        while len(self._text) > self.max_length:
+            corte = self._text.rfind("\n", 0, self.max_length)
+            if corte <= 0:
+                corte = self.max_length
+            restante = self._text[corte:].lstrip("\n")
+            self._text = self._text[:corte]
+            await self._finalize_message()
+            self._message = None
+            self._text = restante
+            self._sent_text = ""
+
+        if not self._text.strip():
+            return
+
+        if self._message is None:
+            # Primeiro texto visível: enviar logo, sem esperar pelo intervalo
+            self._message = await self.reply_to.reply_text(self._text)
+            self._sent_text = self._text
+            self._last_edit = time.monotonic()
+            return
+
+        if time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._edit(self._text)
+
+    async def finish(self):
+        """Mostra o texto final da mensagem atual já formatado em Markdown"""
+        if self._text.strip():
+            await self._finalize_message()
+
+    async def _finalize_message(self):
+        # A versão final tem de ser mostrada: repetir enquanto o Telegram
+        # pedir para esperar, até finalize_timeout segundos
+        deadline = time.monotonic() + self.finalize_timeout
+        while True:
+            try:
+                if self._message is None:
+                    self._message = await self.reply_to.reply_text(
+                        self._text, parse_mode="Markdown"
+                    )
+                else:
+                    await self._message.edit_text(self._text, parse_mode="Markdown")
+                return
+            except RetryAfter as e:
+                if time.monotonic() + e.retry_after > deadline:
+                    break
+                await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                if "not modified" in str(e):
+                    return
+                # Markdown inválido (ex: corte a meio de um negrito)
+                if self._message is None:
+                    self._message = await self.reply_to.reply_text(self._text)
+                else:
+                    await self._edit(self._text, force=True)
+                return
+
+        # Sem edição possível a tempo: o texto final numa mensagem nova
+        logger.error(
+            f"Versão final da mensagem não editada em {self.finalize_timeout}s "
+            "(limite do Telegram), enviada numa mensagem nova"
+        )
+        try:
+            self._message = await self.reply_to.reply_text(self._text)
+            self._sent_text = self._text
+        except TelegramError as e:
+            logger.error(f"Falha ao enviar a versão final da mensagem: {e}")
+
+    async def _edit(self, text: str, force: bool = False):
+        if text == self._sent_text and not force:
+            return
+        try:
+            await self._message.edit_text(text)
+            self._sent_text = text
+        except RetryAfter as e:
+            logger.warning(f"Limite de edições atingido, a aguardar {e.retry_after}s")
+        except BadRequest as e:
+            if "not modified" not in str(e):
+                logger.warning(f"Erro ao editar mensagem em streaming: {e}")
+        self._last_edit = time.monotonic()
+
+
 class IRSBotHandler:
     """Handler principal para o bot IRS Portugal com Marinete"""
 
     def __init__(self):
-        self.groq = GroqHandler()
+        # Tokens de cada chamada registados na base de dados de monitoramento
+        self.groq = GroqHandler(usage_store=monitoring)
+        # Chamadas LLM em curso, canceláveis com /cancel, /reset ou /simular
+        self.em_curso = InFlightTasks()
+        # Mensagens seguidas do mesmo utilizador juntas num só pedido
+        self.debouncer = MessageDebouncer(
+            min_window=CHAT_DEBOUNCE_MIN,
+            max_window=CHAT_DEBOUNCE_MAX,
+            load=self.groq.scheduler.load,
+        )
+        # Histórico da conversa livre (limitado em tokens e utilizadores)
+        self.memoria = ConversationMemory(
+            max_tokens=CHAT_HISTORY_MAX_TOKENS,
+            recent_turns=CHAT_HISTORY_RECENT_TURNS,
+            summary_max_tokens=MODEL_PROFILES["resumo"]["max_tokens"],
+            ttl_seconds=CHAT_HISTORY_TTL,
+            max_users=CHAT_HISTORY_MAX_USERS,
+            summarizer=self._resumir_conversa,
+        )
+        # Sessões (user_data e questionário) esquecidas após inatividade
+        self.sessoes = SessionSweeper(
+            idle_ttl=SESSION_IDLE_TTL,
+            max_users=SESSION_MAX_USERS,
+            interval=SESSION_SWEEP_INTERVAL,
+            busy=self.em_curso.busy,
+        )
         logger.info("✅ IRSBotHandler inicializado com Marinete")
 
+    async def _resumir_conversa(self, user_id: int, resumo: str, mensagens: list) -> str:
+        """Junta mensagens antigas ao resumo (modelo rápido, quota do utilizador)"""
+        conversa = "\n".join(
+            f"{'Utilizador' if m['role'] == 'user' else 'Marinete'}: {m['content']}"
+            for m in mensagens
+        )
+        return await self.groq.generate_response(
+            user_message=f"RESUMO ATUAL: {resumo or '(vazio)'}\n\nNOVAS MENSAGENS:\n{conversa}",
+            system_prompt=SUMMARY_PROMPT,
+            priority=PRIORITY_CHAT,
+            user_id=user_id,
+            profile="resumo",
+            command="resumo",
+        )
+
+    @staticmethod
+    def _resposta_local(mensagem: str) -> str:
+        """Resposta sem IA por palavras-chave (LLM sobrecarregado)"""
+        texto = mensagem.lower()
+        for palavras, resposta in RESPOSTAS_LOCAIS:
+            if any(p in texto for p in palavras):
+                return resposta
+        return ERROR_MESSAGES["ocupado"]
+
+    def _avisar_fila(self, update: Update):
+        """Callback que avisa o utilizador da sua posição na fila do modelo"""
+
+        async def avisar(posicao: int):
+            await update.message.reply_text(
+                ERROR_MESSAGES["posicao_fila"].format(posicao=posicao)
+            )
+
+        return avisar
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Comando /start - Boas-vindas"""
         user = update.effective_user
@@ -120,6 +444,9 @@ class IRSBotHandler:
         )
         monitoring.register_activity(user.id, "command", "/simular")
 
+        # Uma análise anterior ainda em curso deixa de interessar
+        self.em_curso.cancel(InFlightTasks.key(update), "nova simulação")
+
         # Limpar dados anteriores e iniciar novo questionário
         context.user_data.clear()
         context.user_data["respostas_irs"] = {}
@@ -197,9 +524,16 @@ class IRSBotHandler:
         pergunta_atual += 1
         context.user_data["pergunta_atual"] = pergunta_atual
 
-        # Verificar se terminaram as perguntas
+        # Verificar se terminaram as perguntas: a análise corre numa tarefa
+        # à parte, para /cancel ou /simular poderem interrompê-la
         if pergunta_atual >= len(PERGUNTAS_IRS):
-            return await self.finalizar_questionario(update, context)
+            self.em_curso.track(
+                InFlightTasks.key(update, InFlightTasks.SIMULACAO),
+                context.application.create_task(
+                    self.finalizar_questionario(update, context), update=update
+                ),
+            )
+            return ConversationHandler.END
 
         # Enviar próxima pergunta
         await update.message.reply_text(
@@ -225,23 +559,32 @@ class IRSBotHandler:
         respostas = context.user_data.get("respostas_irs", {})
 
         try:
-            # Criar prompt para análise
-            prompt_analise = self._criar_prompt_analise(respostas)
-
-            # Gerar análise com Groq
-            resultado = self.groq.generate_response_sync(
-                user_message=prompt_analise, system_prompt=SYSTEM_PROMPT
-            )
+            # Criar prompt compacto para análise (números já calculados)
+            prompt_analise = criar_prompt_analise(respostas)
+
+            # Gerar análise com Groq em streaming, mostrando o texto à medida
+            # que é gerado em vez de esperar pela resposta completa
+            renderer = StreamingMessageRenderer(update.message)
+            try:
+                await renderer.render(
+                    self.groq.generate_response_stream(
+                        user_message=prompt_analise,
+                        system_prompt=SYSTEM_PROMPT_ANALISE,
+                        priority=PRIORITY_SIMULATION,
+                        user_id=update.effective_user.id,
+                        on_queued=self._avisar_fila(update),
+                        profile="analise",
+                        command="/simular",
+                    )
+                )
+            except LLMUnavailableError as e:
+                # Sem LLM: mostrar pelo menos o cálculo local
+                logger.error(f"LLM indisponível na simulação: {e}")
+                await self._enviar_calculo_local(update, respostas)
 
             # Registrar simulação completada para métricas
             monitoring.register_simulation_completion(update.effective_user.id)
 
-            # Enviar resultado
-            await update.message.reply_text(
-                resultado,
-                parse_mode="Markdown",
-            )
-
             # Oferecer opções
             await update.message.reply_text(
                 "\n📊 **O que desejas fazer agora?**\n\n"
@@ -262,43 +605,23 @@ class IRSBotHandler:
 
         return ConversationHandler.END
 
-    def _criar_prompt_analise(self, respostas: Dict[str, Any]) -> str:
-        """Cria prompt para análise das respostas"""
-
-        prompt = "Com base nas seguintes informações, calcula e explica o IRS:\n\n"
-
-        for i, pergunta in enumerate(PERGUNTAS_IRS):
-            chave = pergunta["chave"]
-            resposta = respostas.get(chave, "Não informado")
-            prompt += f"{i + 1}. {pergunta['pergunta']}\n   Resposta: {resposta}\n\n"
-
-        prompt += """
-Por favor, fornece:
-
-1. **💰 CÁLCULO DETALHADO DO IRS:**
-   - Rendimento coletável
-   - Escalão aplicável e taxa
-   - Valor de IRS a pagar/receber
-   - Impacto das deduções
-
-2. **📊 COMPARAÇÃO (se aplicável):**
-   - Tributação individual vs conjunta
-   - Qual compensa mais e porquê
-
-3. **💡 SUGESTÕES DE OTIMIZAÇÃO:**
-   - Como reduzir o IRS legalmente
-   - Deduções que pode aproveitar melhor
-   - Benefícios fiscais disponíveis
-
-4. **🎯 PRÓXIMOS PASSOS:**
-   - Quando e como entregar a declaração
-   - Documentos necessários
-   - Prazos importantes
-
-Formata de forma clara, com emojis e seções bem definidas. Lembra-te: és a Marinete, fala de forma natural e empática!
-"""
+    async def _enviar_calculo_local(self, update: Update, respostas: Dict[str, Any]):
+        """Resultado sem LLM: cálculo local a partir das respostas"""
+        try:
+            resultado = calcular_irs(**argumentos_de_respostas(respostas))
+        except ValueError as e:
+            logger.warning(f"Respostas insuficientes para cálculo local: {e}")
+            await update.message.reply_text(
+                ERROR_MESSAGES["llm_indisponivel"], parse_mode="Markdown"
+            )
+            return
 
-        return prompt
+        await update.message.reply_text(
+            f"{ERROR_MESSAGES['analise_indisponivel']}\n\n"
+            f"{formatar_calculo(resultado)}\n"
+            f"_Trabalhador dependente, solteiro, sem dependentes._",
+            parse_mode="Markdown",
+        )
 
     async def calcular_rapido(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -317,7 +640,7 @@ Formata de forma clara, com emojis e seções bem definidas. Lembra-te: és a Ma
         )
         monitoring.register_activity(user.id, "command", "/calcular")
 
-        texto = update.message.text.replace("/calcular", "").strip()
+        texto = " ".join(context.args or [])
 
         if not texto:
             await update.message.reply_text(
@@ -326,44 +649,107 @@ Formata de forma clara, com emojis e seções bem definidas. Lembra-te: és a Ma
                 "`/calcular 30000`\n"
                 "ou\n"
                 "`/calcular 30000 saude:500 educacao:300`\n\n"
+                "Outros campos: `habitacao:`, `lares:`, `ss:` (Segurança Social), "
+                "`retencao:` (retido na fonte)\n\n"
                 "Valores em euros (€)",
                 parse_mode="Markdown",
             )
             return ConversationHandler.END
 
         try:
-            # Processar entrada
-            prompt = f"""
-Faz um cálculo rápido de IRS para: {texto}
-
-Considera:
-- Trabalhador dependente, solteiro, sem dependentes
-- Rendimento e deduções fornecidos
-- Portugal Continental, 2024
-
-Mostra:
-1. Rendimento coletável
-2. Escalão e taxa
-3. IRS a pagar/receber (estimativa)
-4. Breve explicação
-
-Sê breve e direto! Máximo 10 linhas.
-"""
+            argumentos = parse_calculo_args(texto)
+        except ValueError as e:
+            logger.info(f"Argumentos inválidos no /calcular: {e}")
+            await update.message.reply_text(
+                f"❌ Erro no cálculo: {e}. Verifica o formato!\nExemplo: `/calcular 30000`"
+            )
+            return ConversationHandler.END
+
+        # Calcular localmente (sem chamada de rede)
+        resultado = calcular_irs(**argumentos)
+        calculo = formatar_calculo(resultado)
 
-            resultado = self.groq.generate_response_sync(
-                user_message=prompt, system_prompt=SYSTEM_PROMPT
+        await update.message.reply_text(
+            f"⚡ **Cálculo Rápido:**\n\n{calculo}\n"
+            f"_Trabalhador dependente, solteiro, sem dependentes._\n\n"
+            f"💡 Para simulação detalhada, usa `/simular`",
+            parse_mode="Markdown",
+        )
+
+        # Explicação em texto pelo LLM (opcional, os números já foram enviados)
+        if CALCULO_EXPLICACAO_LLM:
+            await self._explicar_calculo(update, user.id, calculo)
+
+        return ConversationHandler.END
+
+    async def _explicar_calculo(self, update: Update, user_id: int, calculo: str):
+        """Explicação do /calcular pelo LLM; se falhar, fica só o cálculo"""
+        try:
+            explicacao = await self.groq.generate_response(
+                user_message=(
+                    "Explica de forma breve (máximo 6 linhas) este cálculo "
+                    f"de IRS, sem alterar os valores:\n\n{calculo}"
+                ),
+                system_prompt=SYSTEM_PROMPT,
+                priority=PRIORITY_CALCULATION,
+                user_id=user_id,
+                profile="explicacao",
+                command="/calcular",
             )
+        except LLMOverloadedError:
+            return  # sob sobrecarga o /calcular fica só com o cálculo local
+        except Exception as e:
+            logger.warning(f"Explicação LLM indisponível: {e}")
+            return
+
+        try:
+            await update.message.reply_text(explicacao, parse_mode="Markdown")
+        except BadRequest as e:
+            # Markdown mal formado na resposta do modelo: vai em texto simples
+            logger.warning(f"Explicação do /calcular sem Markdown: {e}")
+            await update.message.reply_text(explicacao)
+
+    async def comparar(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Comando /comparar - IRS e taxas para uma gama de rendimentos"""
+        user = update.effective_user
+        if not user:
+            return ConversationHandler.END
+
+        # Registrar usuário e atividade
+        monitoring.register_user(
+            user_id=user.id,
+            username=user.username or "",
+            first_name=user.first_name or "",
+            last_name=user.last_name or "",
+        )
+        monitoring.register_activity(user.id, "command", "/comparar")
+
+        try:
+            # Argumentos em falta usam os valores por omissão
+            padrao = [10000, 80000, 5000]
+            valores = [float(arg) for arg in (context.args or [])]
+            inicio, fim, passo = valores + padrao[len(valores) :]
+            if passo <= 0 or fim < inicio or (fim - inicio) / passo > 500:
+                raise ValueError("Gama de rendimentos inválida")
+
+            rendimentos = np.arange(inicio, fim + passo / 2, passo)
+            lote = calcular_irs_lote(rendimentos)
+            mensagens = formatar_comparacao(lote, MAX_MESSAGE_LENGTH)
 
             await update.message.reply_text(
-                f"⚡ **Cálculo Rápido:**\n\n{resultado}\n\n"
-                f"💡 Para simulação detalhada, usa `/simular`",
+                "📈 **Comparação de IRS por rendimento**\n"
+                "_Trabalhador dependente, solteiro, sem deduções à coleta._",
                 parse_mode="Markdown",
             )
+            for mensagem in mensagens:
+                await update.message.reply_text(mensagem, parse_mode="Markdown")
 
         except Exception as e:
-            logger.error(f"Erro no cálculo rápido: {e}")
+            logger.error(f"Erro na comparação: {e}")
             await update.message.reply_text(
-                f"❌ Erro no cálculo. Verifica o formato!\nExemplo: `/calcular 30000`"
+                "❌ Formato inválido!\n"
+                "Exemplo: `/comparar 10000 80000 5000` (de, até, passo; máx. 500 linhas)",
+                parse_mode="Markdown",
             )
 
         return ConversationHandler.END
@@ -421,7 +807,9 @@ Sê breve e direto! Máximo 10 linhas.
         # Registrar atividade
         monitoring.register_activity(user.id, "command", "/reset")
 
+        self.em_curso.cancel(InFlightTasks.key(update), "/reset")
         context.user_data.clear()
+        self.memoria.clear(user.id)
 
         await update.message.reply_text(
             "🔄 Dados limpos!\n\n"
@@ -440,6 +828,8 @@ Sê breve e direto! Máximo 10 linhas.
         # Registrar atividade
         monitoring.register_activity(user.id, "command", "/cancel")
 
+        self.em_curso.cancel(InFlightTasks.key(update), "/cancel")
+
         await update.message.reply_text(
             "❌ Operação cancelada.\n\n"
             "Usa `/start` para ver opções ou `/simular` para nova simulação.",
@@ -542,30 +932,28 @@ Sê breve e direto! Máximo 10 linhas.
             # Gerar relatório de sugestões
             suggestions_report = suggestion_manager.generate_suggestions_report()
 
-            # Enviar relatório de showcase (dividido se muito longo)
-            if len(showcase_report) > 4000:
-                # Dividir em partes
-                parts = [
-                    showcase_report[i : i + 4000]
-                    for i in range(0, len(showcase_report), 4000)
-                ]
-                for i, part in enumerate(parts):
-                    await update.message.reply_text(
-                        f"**PARTE {i + 1}/{len(parts)}**\n\n{part}",
-                        parse_mode="Markdown",
-                    )
-            else:
-                await update.message.reply_text(
-                    showcase_report,
-                    parse_mode="Markdown",
-                )
-
-            # Enviar relatório de sugestões separadamente
-            await update.message.reply_text(
-                suggestions_report,
-                parse_mode="Markdown",
+            # Gerar relatório de performance da camada LLM
+            llm_report = monitoring.generate_llm_report(
+                {
+                    **self.groq.get_performance_stats(),
+                    "memory": self.memoria.get_stats(),
+                    "sessions": self.sessoes.get_stats(),
+                    "in_flight": self.em_curso.get_stats(),
+                    "debounce": self.debouncer.get_stats(),
+                    "updates": context.application.update_processor.get_stats(),
+                    "persistence": (
+                        context.application.persistence.get_stats()
+                        if context.application.persistence
+                        else {}
+                    ),
+                }
             )
 
+            # Relatórios em mensagens separadas (divididos se muito longos)
+            await self._enviar_relatorio(update, showcase_report)
+            await self._enviar_relatorio(update, suggestions_report)
+            await self._enviar_relatorio(update, llm_report)
+
         except Exception as e:
             logger.error(f"Erro ao gerar estatísticas: {e}")
             await update.message.reply_text(
@@ -574,6 +962,34 @@ Sê breve e direto! Máximo 10 linhas.
 
         return ConversationHandler.END
 
+    @staticmethod
+    async def _enviar_relatorio(update: Update, report: str, max_length: int = 4000):
+        """
+        Envia um relatório do /stats em partes de até max_length caracteres
+
+        Corta entre linhas para não partir a formatação; se o Markdown não
+        for aceite (ex: "_" ou "*" num nome de modelo ou backend), a parte
+        vai em texto simples.
+        """
+        parts = []
+        for line in report.splitlines(keepends=True):
+            while len(line) > max_length:
+                parts.append(line[:max_length])
+                line = line[max_length:]
+            if parts and len(parts[-1]) + len(line) <= max_length:
+                parts[-1] += line
+            else:
+                parts.append(line)
+
+        for i, part in enumerate(parts):
+            if len(parts) > 1:
+                part = f"**PARTE {i + 1}/{len(parts)}**\n\n{part}"
+            try:
+                await update.message.reply_text(part, parse_mode="Markdown")
+            except BadRequest as e:
+                logger.warning(f"Relatório do /stats sem Markdown: {e}")
+                await update.message.reply_text(part)
+
     async def showcase_detalhado(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
@@ -757,10 +1173,32 @@ _Proposta personalizada sem compromisso_
         )
         monitoring.register_activity(user.id, "message", mensagem)
 
+        # Uma mensagem nova substitui a anterior ainda à espera do modelo (ou
+        # da janela do debounce); as mensagens sem resposta vão todas juntas.
+        # A análise da simulação tem outra chave e nunca é substituída aqui
+        chave = InFlightTasks.key(update, InFlightTasks.CHAT)
+        self.em_curso.track(chave, calling=False)
+        rajada = await self.debouncer.submit(chave, mensagem)
+        if rajada is None:
+            return ConversationHandler.END
+        mensagem = rajada.text
+        self.em_curso.started(chave)
+
+        resposta = None
         try:
-            # Gerar resposta com contexto
+            # Gerar resposta com o histórico da conversa (a cache só é usada
+            # na primeira mensagem, sem contexto anterior)
+            historico = self.memoria.get_messages(user.id)
             resposta = await self.groq.generate_response(
-                user_message=mensagem, system_prompt=SYSTEM_PROMPT
+                user_message=mensagem,
+                system_prompt=SYSTEM_PROMPT,
+                use_cache=True,
+                priority=PRIORITY_CHAT,
+                user_id=user.id,
+                on_queued=self._avisar_fila(update),
+                profile="chat",
+                command="mensagem",
+                history=historico,
             )
 
             await update.message.reply_text(
@@ -768,6 +1206,27 @@ _Proposta personalizada sem compromisso_
                 parse_mode="Markdown",
             )
 
+        except LLMQuotaExceededError:
+            await update.message.reply_text(
+                ERROR_MESSAGES["quota_excedida"], parse_mode="Markdown"
+            )
+
+        except LLMOverloadedError:
+            # Sobrecarga (e sem resposta na cache): resposta local imediata
+            await update.message.reply_text(
+                self._resposta_local(mensagem), parse_mode="Markdown"
+            )
+
+        except LLMUnavailableError as e:
+            logger.error(f"LLM indisponível na mensagem livre: {e}")
+            # Respostas estáticas em vez de um erro genérico
+            if "dedu" in mensagem.lower():
+                await update.message.reply_text(DEDUCTIONS_INFO, parse_mode="Markdown")
+            else:
+                await update.message.reply_text(
+                    ERROR_MESSAGES["llm_indisponivel"], parse_mode="Markdown"
+                )
+
         except Exception as e:
             logger.error(f"Erro na mensagem livre: {e}")
             await update.message.reply_text(
@@ -775,10 +1234,23 @@ _Proposta personalizada sem compromisso_
                 "Podes tentar de novo? 😊"
             )
 
+        finally:
+            # Rajada respondida (ou cancelada): as próximas mensagens começam
+            # outra, mesmo que cheguem durante o resumo do histórico abaixo
+            self.debouncer.done(chave, rajada)
+
+        if resposta is not None and resposta != ERROR_MESSAGES["fila_cheia"]:
+            await self.memoria.add_exchange(user.id, mensagem, resposta)
         return ConversationHandler.END
 
-    def get_conversation_handler(self) -> ConversationHandler:
-        """Retorna o ConversationHandler configurado"""
+    def get_conversation_handler(self, persistent: bool = False) -> ConversationHandler:
+        """
+        Retorna o ConversationHandler configurado
+
+        Args:
+            persistent: Guardar o estado de cada conversa na persistência da
+                aplicação (obrigatória), para sobreviver a reinícios
+        """
 
         # Estados para as 20 perguntas
         states = {}
@@ -806,23 +1278,65 @@ _Proposta personalizada sem compromisso_
             ],
             per_user=True,
             per_chat=True,
+            name="questionario_irs",
+            persistent=persistent,
         )
 
 
-def create_application():
-    """Cria e configura a aplicação do bot IRS"""
-    from config import TELEGRAM_BOT_TOKEN
-
-    # Criar aplicação
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-
+def create_application(post_init=None, post_shutdown=None, persistence=None):
+    """
+    Cria e configura a aplicação do bot IRS
+
+    Args:
+        post_init: Corrotina executada após initialize() (ex: aquecer conexões)
+        post_shutdown: Corrotina executada no fim (ex: fechar conexões)
+        persistence: BasePersistence para user_data e estado do questionário
+            (ex: SQLitePersistence); sem ela o estado fica só em memória
+    """
+    from config import (
+        TELEGRAM_BASE_URL,
+        TELEGRAM_BOT_TOKEN,
+        TELEGRAM_POOL_SIZE,
+        UPDATE_CONCURRENCY,
+    )
+    from llm_handler.http_pool import HTTP2_AVAILABLE
+
+    # Criar aplicação (pool de conexões à API do Telegram maior que o
+    # padrão, para respostas em paralelo não esperarem por uma conexão livre;
+    # updates de utilizadores diferentes em paralelo, os de cada um por ordem)
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .connection_pool_size(TELEGRAM_POOL_SIZE)
+        .concurrent_updates(PerUserUpdateProcessor(UPDATE_CONCURRENCY))
+    )
+    if HTTP2_AVAILABLE:
+        builder = builder.http_version("2")
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(TELEGRAM_BASE_URL)
+    if persistence:
+        builder = builder.persistence(persistence)
     # Criar handler principal
     bot = IRSBotHandler()
 
+    async def iniciar(application):
+        bot.sessoes.start()
+        if post_init:
+            await post_init(application)
+
+    async def parar(application):
+        bot.sessoes.stop()
+
+    builder = builder.post_init(iniciar).post_stop(parar)
+    if post_shutdown:
+        builder = builder.post_shutdown(post_shutdown)
+    application = builder.build()
+
     # Registrar handlers
     # 1. Comandos principais (fora da conversação)
     application.add_handler(CommandHandler("start", bot.start))
     application.add_handler(CommandHandler("calcular", bot.calcular_rapido))
+    application.add_handler(CommandHandler("comparar", bot.comparar))
     application.add_handler(CommandHandler("deducoes", bot.deducoes))
     application.add_handler(CommandHandler("contato", bot.contato))
     application.add_handler(CommandHandler("ajuda", bot.ajuda))
@@ -833,13 +1347,22 @@ def create_application():
     )
 
     # 2. Conversation handler para simulação e sugestões
-    application.add_handler(bot.get_conversation_handler())
+    questionario = bot.get_conversation_handler(persistent=persistence is not None)
+    application.add_handler(questionario)
+    # /cancel fora do questionário (ex: durante a análise final)
+    application.add_handler(CommandHandler("cancel", bot.cancelar))
 
-    # 3. Handler para mensagens livres (deve ser último)
+    # 3. Handler para mensagens livres (deve ser último); não bloqueia, para
+    # /cancel ou uma mensagem nova poderem interromper a resposta em curso
     application.add_handler(
-        MessageHandler(filters.TEXT & ~filters.COMMAND, bot.mensagem_livre)
+        MessageHandler(
+            filters.TEXT & ~filters.COMMAND, bot.mensagem_livre, block=False
+        )
     )
 
+    # 0. Registo de atividade de cada update (grupo -1, antes de todos)
+    bot.sessoes.attach(application, [questionario])
+
     logger.info(
         "✅ Bot IRS Portugal configurado com Marinete e sistema de monitoramento!"
     )
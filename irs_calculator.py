@@ -0,0 +1,427 @@
+"""
+Motor de Cálculo de IRS - Bot IRS Portugal
+Cálculo determinístico e local (sem chamadas de rede) a partir de config.py
+"""
+
+import re
+import math
+import bisect
+import logging
+from typing import Any
+
+import numpy as np
+
+from config import DEDUCTIONS, SOCIAL_SECURITY_RATE, TAX_BRACKETS
+
+logger = logging.getLogger(__name__)
+
+# Nomes aceites em "/calcular 30000 saude:500" -> chave em DEDUCTIONS
+DEDUCTION_ALIASES = {
+    "saude": "despesas_saude",
+    "educacao": "despesas_educacao",
+    "habitacao": "encargos_habitacao",
+    "lares": "lares",
+}
+SOCIAL_SECURITY_ALIASES = ("ss", "segurancasocial")
+WITHHOLDING_ALIASES = ("retencao", "retencoes", "retido")
+
+# Escalões pré-processados: limites inferiores, taxas e imposto acumulado
+# até ao início de cada escalão (evita somar escalão a escalão por cálculo)
+_BRACKETS = sorted(TAX_BRACKETS.values(), key=lambda b: b["min"])
+BRACKET_LOWER = [float(b["min"]) for b in _BRACKETS]
+BRACKET_RATES = [float(b["rate"]) for b in _BRACKETS]
+BRACKET_BASE_TAX = [0.0]
+for _i in range(1, len(_BRACKETS)):
+    BRACKET_BASE_TAX.append(
+        BRACKET_BASE_TAX[-1]
+        + (BRACKET_LOWER[_i] - BRACKET_LOWER[_i - 1]) * BRACKET_RATES[_i - 1]
+    )
+
+# Versões NumPy das tabelas para o cálculo em lote
+_LOWER = np.array(BRACKET_LOWER)
+_RATES = np.array(BRACKET_RATES)
+_BASE_TAX = np.array(BRACKET_BASE_TAX)
+
+
+def _parse_valor(texto: str) -> float:
+    """Converte '30000', '30.000', '30000,50' ou '30.000,50€' em float"""
+    valor = texto.strip().replace("€", "").replace(" ", "")
+    if "," in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(\.\d{3})+", valor):
+        valor = valor.replace(".", "")
+    numero = float(valor)
+    if not math.isfinite(numero):
+        raise ValueError(f"Valor inválido: {texto}")
+    if numero < 0:
+        raise ValueError(f"Valor negativo não permitido: {texto}")
+    return numero
+
+
+def _normalizar_nome(nome: str) -> str:
+    """Remove acentos e separadores: 'Saúde' -> 'saude', 'seg_social' -> 'segsocial'"""
+    nome = nome.lower().translate(str.maketrans("áàâãéêíóôõúç", "aaaaeeiooouc"))
+    return re.sub(r"[^a-z]", "", nome)
+
+
+def parse_calculo_args(texto: str) -> dict[str, Any]:
+    """
+    Interpreta os argumentos de /calcular
+
+    Exemplo: "30000 saude:500 educacao:300 retencao:4000"
+
+    Returns:
+        dict: rendimento_bruto, despesas, seguranca_social e retencoes
+
+    Raises:
+        ValueError: se o formato for inválido
+    """
+    partes = texto.split()
+    if not partes:
+        raise ValueError("Rendimento em falta")
+
+    resultado = {
+        "rendimento_bruto": _parse_valor(partes[0]),
+        "despesas": {},
+        "seguranca_social": None,
+        "retencoes": 0.0,
+    }
+
+    for parte in partes[1:]:
+        if ":" not in parte:
+            raise ValueError(f"Argumento inválido: {parte}")
+        nome, valor = parte.split(":", 1)
+        nome = _normalizar_nome(nome)
+        valor = _parse_valor(valor)
+
+        if nome in DEDUCTION_ALIASES:
+            chave = DEDUCTION_ALIASES[nome]
+            resultado["despesas"][chave] = resultado["despesas"].get(chave, 0) + valor
+        elif nome in SOCIAL_SECURITY_ALIASES:
+            resultado["seguranca_social"] = valor
+        elif nome in WITHHOLDING_ALIASES:
+            resultado["retencoes"] = valor
+        else:
+            raise ValueError(f"Dedução desconhecida: {nome}")
+
+    return resultado
+
+
+# Respostas do questionário (/simular) -> argumentos de calcular_irs
+RESPOSTAS_DESPESAS = {
+    "despesas_saude": "despesas_saude",
+    "despesas_educacao": "despesas_educacao",
+    "despesas_habitacao": "encargos_habitacao",
+    "despesas_lares": "lares",
+}
+
+
+# Palavras de escala a seguir ao número ("25 mil euros", "30k", "1,5 milhões")
+ESCALAS_RESPOSTA = {"mil": 1_000, "k": 1_000, "milhao": 1_000_000, "milhoes": 1_000_000}
+
+
+def valor_resposta(resposta: Any) -> float | None:
+    """
+    Valor numérico de uma resposta livre ('30.000€ por ano', '25 mil euros')
+
+    Devolve None sem número, com mais do que um número ('entre 20 e 30 mil'),
+    com um número negativo ou com uma percentagem: na dúvida é melhor não ter
+    valor do que passar um errado ao cálculo.
+    """
+    if resposta is None:
+        return None
+    texto = str(resposta).lower().translate(str.maketrans("õ", "o"))
+    numeros = list(re.finditer(r"-?\d[\d.,]*", texto))
+    if len(numeros) != 1 or numeros[0].group().startswith("-"):
+        return None
+    encontrado = numeros[0]
+    sufixo = re.match(r"\s*(%|[a-z]+)?", texto[encontrado.end():]).group(1)
+    if sufixo == "%":
+        return None
+    try:
+        valor = _parse_valor(encontrado.group().rstrip(".,"))
+    except ValueError:
+        return None
+    return valor * ESCALAS_RESPOSTA.get(sufixo, 1)
+
+
+def _valor_em_euros(respostas: dict[str, Any], chave: str) -> float | None:
+    """valor_resposta de um campo, com erro se tem números mas não foi interpretado"""
+    resposta = respostas.get(chave)
+    valor = valor_resposta(resposta)
+    if valor is None and re.search(r"\d", str(resposta or "")):
+        raise ValueError(f"Resposta não interpretada em {chave}: {resposta}")
+    return valor
+
+
+def argumentos_de_respostas(respostas: dict[str, Any]) -> dict[str, Any]:
+    """
+    Converte as respostas do questionário em argumentos de calcular_irs
+
+    Raises:
+        ValueError: se o rendimento bruto estiver em falta ou inválido, ou se
+            um valor em euros tiver números que não foi possível interpretar
+    """
+    rendimento = _valor_em_euros(respostas, "rendimento_bruto")
+    if not rendimento:
+        raise ValueError("Rendimento bruto em falta")
+
+    despesas = {}
+    for chave_resposta, chave in RESPOSTAS_DESPESAS.items():
+        valor = _valor_em_euros(respostas, chave_resposta)
+        if valor:
+            despesas[chave] = valor
+
+    return {
+        "rendimento_bruto": rendimento,
+        "despesas": despesas,
+        "seguranca_social": _valor_em_euros(respostas, "seguranca_social"),
+        "retencoes": _valor_em_euros(respostas, "retencoes_fonte") or 0.0,
+    }
+
+
+def imposto_progressivo(rendimento_coletavel: float) -> tuple[float, int]:
+    """
+    Aplica os escalões progressivos ao rendimento coletável
+
+    Returns:
+        tuple: (coleta, índice do escalão aplicável)
+    """
+    if rendimento_coletavel <= 0:
+        return 0.0, 0
+    i = bisect.bisect_right(BRACKET_LOWER, rendimento_coletavel) - 1
+    coleta = BRACKET_BASE_TAX[i] + (rendimento_coletavel - BRACKET_LOWER[i]) * (
+        BRACKET_RATES[i]
+    )
+    return coleta, i
+
+
+def calcular_irs(
+    rendimento_bruto: float,
+    despesas: dict[str, float] | None = None,
+    seguranca_social: float | None = None,
+    retencoes: float = 0.0,
+) -> dict[str, Any]:
+    """
+    Calcula o IRS de um trabalhador dependente (categoria A), solteiro
+
+    Args:
+        rendimento_bruto: Rendimento bruto anual (€)
+        despesas: Despesas por chave de DEDUCTIONS (ex: {"despesas_saude": 500})
+        seguranca_social: Contribuições pagas; por omissão 11% do bruto
+        retencoes: Retenções na fonte ao longo do ano
+
+    Returns:
+        dict: Valores intermédios e finais do cálculo
+    """
+    despesas = despesas or {}
+    if seguranca_social is None:
+        seguranca_social = rendimento_bruto * SOCIAL_SECURITY_RATE
+
+    # Dedução específica: o maior entre o valor fixo e as contribuições
+    deducao_especifica = min(
+        rendimento_bruto, max(DEDUCTIONS["deducao_especifica"], seguranca_social)
+    )
+    rendimento_coletavel = rendimento_bruto - deducao_especifica
+
+    coleta, escalao = imposto_progressivo(rendimento_coletavel)
+
+    # Deduções à coleta com os respetivos limites
+    deducoes = {}
+    for chave, valor in despesas.items():
+        regra = DEDUCTIONS[chave]
+        deducoes[chave] = min(valor * regra["rate"], regra["max"])
+    total_deducoes = min(sum(deducoes.values()), coleta)
+    imposto = coleta - total_deducoes
+
+    # Mínimo de existência: o rendimento líquido de imposto não pode ficar
+    # abaixo deste valor
+    minimo = DEDUCTIONS["minimo_existencia"]
+    imposto = max(0.0, min(imposto, rendimento_bruto - minimo))
+
+    return {
+        "rendimento_bruto": rendimento_bruto,
+        "deducao_especifica": deducao_especifica,
+        "rendimento_coletavel": rendimento_coletavel,
+        "escalao": escalao + 1,
+        "taxa_marginal": BRACKET_RATES[escalao],
+        "coleta": coleta,
+        "deducoes": deducoes,
+        "total_deducoes": total_deducoes,
+        "imposto": imposto,
+        "taxa_efetiva": imposto / rendimento_bruto if rendimento_bruto else 0.0,
+        "retencoes": retencoes,
+        "saldo": retencoes - imposto,
+    }
+
+
+def calcular_irs_lote(
+    rendimentos,
+    despesas: dict[str, Any] | None = None,
+    seguranca_social=None,
+    retencoes=0.0,
+) -> dict[str, np.ndarray]:
+    """
+    Calcula o IRS para muitos cenários numa só chamada (vetorizado com NumPy)
+
+    Mesmas regras de calcular_irs, mas cada argumento pode ser um array
+    (um valor por cenário) ou um escalar comum a todos os cenários.
+
+    Args:
+        rendimentos: Rendimentos brutos anuais (€)
+        despesas: Despesas por chave de DEDUCTIONS (arrays ou escalares)
+        seguranca_social: Contribuições pagas; por omissão 11% do bruto
+        retencoes: Retenções na fonte
+
+    Returns:
+        dict: Arrays com os valores intermédios e finais de cada cenário
+    """
+    bruto = np.asarray(rendimentos, dtype=np.float64)
+    if seguranca_social is None:
+        seguranca_social = bruto * SOCIAL_SECURITY_RATE
+
+    deducao_especifica = np.minimum(
+        bruto, np.maximum(DEDUCTIONS["deducao_especifica"], seguranca_social)
+    )
+    coletavel = bruto - deducao_especifica
+
+    # Escalão de cada cenário por pesquisa binária nos limites inferiores
+    idx = np.searchsorted(_LOWER, coletavel, side="right") - 1
+    np.clip(idx, 0, len(_LOWER) - 1, out=idx)
+    coleta = _BASE_TAX[idx] + (coletavel - _LOWER[idx]) * _RATES[idx]
+    np.maximum(coleta, 0.0, out=coleta)
+
+    total_deducoes = np.zeros_like(bruto)
+    for chave, valor in (despesas or {}).items():
+        regra = DEDUCTIONS[chave]
+        total_deducoes = total_deducoes + np.minimum(
+            np.asarray(valor, dtype=np.float64) * regra["rate"], regra["max"]
+        )
+    total_deducoes = np.minimum(total_deducoes, coleta)
+
+    # Mínimo de existência
+    imposto = np.minimum(
+        coleta - total_deducoes, bruto - DEDUCTIONS["minimo_existencia"]
+    )
+    np.maximum(imposto, 0.0, out=imposto)
+
+    taxa_efetiva = np.divide(
+        imposto, bruto, out=np.zeros_like(imposto), where=bruto > 0
+    )
+
+    return {
+        "rendimento_bruto": bruto,
+        "rendimento_coletavel": coletavel,
+        "escalao": idx + 1,
+        "taxa_marginal": _RATES[idx],
+        "coleta": coleta,
+        "total_deducoes": total_deducoes,
+        "imposto": imposto,
+        "taxa_efetiva": taxa_efetiva,
+        "saldo": retencoes - imposto,
+    }
+
+
+def _euros(valor: float) -> str:
+    """Formata valor em euros no estilo português: 1.234,56€"""
+    return f"{valor:,.2f}€".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def formatar_calculo(resultado: dict[str, Any]) -> str:
+    """Formata o resultado de calcular_irs para mensagem Telegram (Markdown)"""
+    texto = f"💰 Rendimento bruto: {_euros(resultado['rendimento_bruto'])}\n"
+    texto += f"➖ Dedução específica: {_euros(resultado['deducao_especifica'])}\n"
+    texto += f"📊 Rendimento coletável: {_euros(resultado['rendimento_coletavel'])}\n"
+    texto += (
+        f"📈 Escalão {resultado['escalao']} "
+        f"(taxa marginal {resultado['taxa_marginal'] * 100:.1f}%)\n"
+    )
+    texto += f"🧮 Coleta: {_euros(resultado['coleta'])}\n"
+
+    for chave, valor in resultado["deducoes"].items():
+        nome = chave.replace("despesas_", "").replace("encargos_", "")
+        texto += f"   • Dedução {nome}: -{_euros(valor)}\n"
+
+    texto += f"\n🏛️ **IRS estimado: {_euros(resultado['imposto'])}**"
+    texto += f" (taxa efetiva {resultado['taxa_efetiva'] * 100:.1f}%)\n"
+
+    if resultado["retencoes"]:
+        saldo = resultado["saldo"]
+        if saldo >= 0:
+            texto += f"✅ Reembolso estimado: {_euros(saldo)}\n"
+        else:
+            texto += f"⚠️ A pagar: {_euros(-saldo)}\n"
+
+    return texto
+
+
+def formatar_comparacao(lote: dict[str, np.ndarray], max_length: int) -> list[str]:
+    """
+    Formata o resultado de calcular_irs_lote como tabela monoespaçada
+
+    Returns:
+        list[str]: Mensagens Markdown, cada uma com no máximo max_length caracteres
+    """
+    cabecalho = f"{'Bruto':>9} {'IRS':>9} {'Marg.':>6} {'Efet.':>6}\n"
+    linhas = [
+        f"{bruto:>8,.0f}€ {imposto:>8,.0f}€ {marginal * 100:>5.1f}% "
+        f"{efetiva * 100:>5.1f}%\n".replace(",", ".")
+        for bruto, imposto, marginal, efetiva in zip(
+            lote["rendimento_bruto"],
+            lote["imposto"],
+            lote["taxa_marginal"],
+            lote["taxa_efetiva"],
+        )
+    ]
+
+    mensagens = []
+    atual = cabecalho
+    for linha in linhas:
+        if len(atual) + len(linha) + 8 > max_length:
+            mensagens.append(f"```\n{atual}```")
+            atual = cabecalho
+        atual += linha
+    mensagens.append(f"```\n{atual}```")
+    return mensagens
+
+
+# Exemplo de uso e micro-benchmark
+if __name__ == "__main__":
+    import timeit
+
+    print("🧮 Motor de cálculo IRS (local)")
+    print("=" * 60)
+
+    args = parse_calculo_args("30000 saude:500 educacao:300 retencao:4000")
+    resultado = calcular_irs(**args)
+    print(formatar_calculo(resultado))
+
+    n = 200_000
+    duracao = timeit.timeit(lambda: calcular_irs(**args), number=n)
+    print(f"⚡ calcular_irs: {duracao / n * 1e6:.2f} µs por cálculo ({n} cálculos)")
+
+    duracao = timeit.timeit(
+        lambda: calcular_irs(
+            **parse_calculo_args("30000 saude:500 educacao:300 retencao:4000")
+        ),
+        number=n,
+    )
+    print(f"⚡ parse + cálculo: {duracao / n * 1e6:.2f} µs por pedido")
+
+    # Cálculo em lote: um milhão de cenários aleatórios
+    rng = np.random.default_rng(42)
+    n = 1_000_000
+    rendimentos = rng.uniform(5_000, 120_000, n)
+    despesas = {
+        "despesas_saude": rng.uniform(0, 3_000, n),
+        "despesas_educacao": rng.uniform(0, 3_000, n),
+    }
+    calcular_irs_lote(rendimentos[:1000])  # aquecimento
+    duracao = min(
+        timeit.repeat(
+            lambda: calcular_irs_lote(rendimentos, despesas=despesas),
+            number=1,
+            repeat=5,
+        )
+    )
+    print(f"🚀 calcular_irs_lote: {n / duracao / 1e6:.1f} milhões de cenários/s")
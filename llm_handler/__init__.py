@@ -6,6 +6,8 @@ Handlers para diferentes provedores de LLM
 # Não importar automaticamente para evitar erros de inicialização
 # Os handlers devem ser importados explicitamente quando necessário
 
-__all__ = ["GroqHandler"]
+__all__ = ["GroqHandler", "LLMRouter", "GroqBackend", "OpenAICompatibleBackend"]
 
 # Para importar: from llm_handler.groq_handler import GroqHandler
+# Backends e router: from llm_handler.providers import GroqBackend, ...
+#                    from llm_handler.router import LLMRouter
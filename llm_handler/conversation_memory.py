@@ -0,0 +1,205 @@
+"""
+Conversation Memory - Histórico limitado da conversa livre por utilizador
+Últimas mensagens na íntegra, as mais antigas condensadas num resumo, com
+orçamento de tokens por utilizador e remoção dos históricos inativos
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable
+
+
+def count_tokens(text: str) -> int:
+    """Estimativa rápida de tokens (~4 caracteres por token)"""
+    return len(text) // 4 + 4
+
+
+class ChatHistory:
+    """Histórico de um utilizador"""
+
+    def __init__(self):
+        self.turns: deque[dict[str, str]] = deque()  # mensagens na íntegra
+        self.summary = ""  # resumo das mensagens mais antigas
+        self.last_seen = time.monotonic()
+        self.folding = False
+
+    def tokens(self) -> int:
+        total = count_tokens(self.summary) if self.summary else 0
+        return total + sum(count_tokens(t["content"]) for t in self.turns)
+
+    def size_bytes(self) -> int:
+        return len(self.summary.encode("utf-8")) + sum(
+            len(t["content"].encode("utf-8")) for t in self.turns
+        )
+
+
+class ConversationMemory:
+    """
+    Memória das conversas livres, limitada em tokens e em utilizadores
+
+    Cada histórico guarda no máximo recent_turns mensagens na íntegra; as que
+    saem (por número ou por passarem de max_tokens) são condensadas no resumo
+    pelo summarizer (uma chamada LLM barata, feita em nome do utilizador:
+    summarizer(user_id, resumo, mensagens)). Sem summarizer, ou se falhar
+    (ex: quota diária esgotada), ficam as primeiras frases. Históricos sem
+    uso há mais de ttl_seconds, ou os menos recentes acima de max_users, são
+    removidos.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1500,
+        recent_turns: int = 6,
+        summary_max_tokens: int = 300,
+        ttl_seconds: float = 1800,
+        max_users: int = 5000,
+        summarizer: Callable[[int, str, list], Awaitable[str]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.recent_turns = max(2, recent_turns)
+        self.summary_max_tokens = summary_max_tokens
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max(1, max_users)
+        self.summarizer = summarizer
+        # user_id -> histórico, do menos para o mais recentemente usado
+        self._histories: OrderedDict[int, ChatHistory] = OrderedDict()
+
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def evict_idle(self) -> int:
+        """Remove históricos inativos (os mais antigos estão no início)"""
+        now = time.monotonic()
+        removed = 0
+        while self._histories:
+            user_id, history = next(iter(self._histories.items()))
+            if now - history.last_seen <= self.ttl_seconds:
+                break
+            del self._histories[user_id]
+            removed += 1
+        self.evicted_idle += removed
+        return removed
+
+    def _touch(self, user_id: int) -> ChatHistory:
+        self.evict_idle()
+        history = self._histories.get(user_id)
+        if history is None:
+            history = ChatHistory()
+            self._histories[user_id] = history
+            while len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+                self.evicted_lru += 1
+        history.last_seen = time.monotonic()
+        self._histories.move_to_end(user_id)
+        return history
+
+    def get_messages(self, user_id: int) -> list[dict[str, str]]:
+        """
+        Mensagens anteriores para o prompt (resumo + mensagens recentes)
+
+        Nunca passa de max_tokens: se o resumo ainda não foi feito, só entram
+        as mensagens mais recentes que cabem no orçamento.
+        """
+        self.evict_idle()
+        history = self._histories.get(user_id)
+        if history is None:
+            return []
+
+        messages = []
+        budget = self.max_tokens
+        if history.summary:
+            summary = f"Resumo da conversa anterior com este utilizador: {history.summary}"
+            budget -= count_tokens(summary)
+            messages.append({"role": "system", "content": summary})
+
+        recent = []
+        for turn in reversed(history.turns):
+            budget -= count_tokens(turn["content"])
+            if budget < 0:
+                break
+            recent.append(turn)
+        # Começar sempre numa mensagem do utilizador
+        while recent and recent[-1]["role"] != "user":
+            recent.pop()
+        return messages + list(reversed(recent))
+
+    async def add_exchange(self, user_id: int, question: str, answer: str):
+        """Guarda pergunta e resposta e condensa o excesso no resumo"""
+        history = self._touch(user_id)
+        history.turns.append({"role": "user", "content": question})
+        history.turns.append({"role": "assistant", "content": answer})
+
+        if history.folding:
+            return  # outra mensagem do mesmo utilizador já está a condensar
+        old = []
+        while len(history.turns) > 2 and (
+            len(history.turns) > self.recent_turns or history.tokens() > self.max_tokens
+        ):
+            old.append(history.turns.popleft())
+        if old:
+            history.folding = True
+            try:
+                history.summary = await self._fold(user_id, history.summary, old)
+            except asyncio.CancelledError:
+                # Resposta cancelada (ex: mensagem nova) a meio do resumo: as
+                # mensagens voltam ao início, para a próxima troca as condensar
+                history.turns.extendleft(reversed(old))
+                raise
+            finally:
+                history.folding = False
+
+    async def _fold(self, user_id: int, summary: str, old: list[dict[str, str]]) -> str:
+        """Junta mensagens antigas ao resumo (LLM, ou extrato se falhar)"""
+        if self.summarizer is not None:
+            try:
+                new_summary = await self.summarizer(user_id, summary, old)
+                if new_summary:
+                    self.summaries += 1
+                    return self._truncate(new_summary.strip())
+            except Exception as e:
+                self.logger.warning(f"Resumo da conversa falhou: {e}")
+            self.summary_failures += 1
+
+        # Extrato: primeira frase de cada mensagem, mantendo o mais recente
+        extract = " ".join(
+            f"{'Utilizador' if t['role'] == 'user' else 'Marinete'}: "
+            f"{t['content'].split('. ')[0][:200]}"
+            for t in old
+        )
+        return self._truncate(f"{summary} {extract}".strip(), keep_end=True)
+
+    def _truncate(self, text: str, keep_end: bool = False) -> str:
+        max_chars = self.summary_max_tokens * 4
+        if len(text) <= max_chars:
+            return text
+        return "…" + text[-max_chars:] if keep_end else text[:max_chars] + "…"
+
+    def clear(self, user_id: int):
+        """Esquece a conversa de um utilizador (ex: /reset)"""
+        self._histories.pop(user_id, None)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Uso de memória e remoções para o /stats"""
+        self.evict_idle()
+        histories = list(self._histories.values())
+        return {
+            "users": len(histories),
+            "max_users": self.max_users,
+            "messages": sum(len(h.turns) for h in histories),
+            "with_summary": sum(1 for h in histories if h.summary),
+            "tokens": sum(h.tokens() for h in histories),
+            "bytes": sum(h.size_bytes() for h in histories),
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+        }
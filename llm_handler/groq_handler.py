@@ -1,64 +1,708 @@
 """
 Groq Handler - Manipula chamadas para API Groq
 Usando modelo Moonshot AI (Kimi K2 Instruct)
+
+As chamadas assíncronas usam clientes assíncronos, pelo que várias conversas
+podem aguardar o modelo em simultâneo sem bloquear o event loop do bot. Com
+vários backends configurados (ver llm_handler.providers), cada pedido vai
+para o mais rápido e saudável, com failover automático.
 """
 
+import time
+import asyncio
 import logging
+from typing import AsyncIterator, Callable
+
 from groq import Groq
-from config import GROQ_API_KEY, MODEL_NAME
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RECOVERY_TIMEOUT,
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    LLM_DAILY_TOKEN_QUOTA,
+    LLM_DEADLINE,
+    LLM_HEDGE_BUDGET,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGING,
+    LLM_MAX_ATTEMPTS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_REQUEST_TIMEOUT,
+    LLM_RPM_LIMIT,
+    LLM_SHED_LATENCY,
+    LLM_SHED_QUEUE_DEPTH,
+    LLM_TPM_LIMIT,
+    MODEL_PROFILES,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from llm_handler.response_cache import ResponseCache, prompt_hash
+from llm_handler.semantic_cache import SemanticCache
+from llm_handler.single_flight import SingleFlight, request_key
+from llm_handler.scheduler import (
+    PRIORITY_CHAT,
+    PRIORITY_SIMULATION,
+    LLMQueueFullError,
+    LLMScheduler,
+)
+from llm_handler.hedging import HedgePolicy
+from llm_handler.http_pool import HTTPPool, shared_pool
+from llm_handler.load_shedding import LLMOverloadedError, LoadShedder
+from llm_handler.profiles import ProfileMetrics, profile_params
+from llm_handler.providers import build_backends, describe_backends
+from llm_handler.quota import LLMQuotaExceededError, TokenQuota
+from llm_handler.resilience import (
+    CircuitOpenError,
+    LLMUnavailableError,
+    RetryPolicy,
+    is_retryable,
+    retry_after_seconds,
+)
+from llm_handler.router import LLMRouter
+from prompts import ERROR_MESSAGES
+
+
+def estimate_tokens(messages: list) -> int:
+    """Estimativa rápida de tokens de um prompt (~4 caracteres por token)"""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+
+
+async def _close_stream(stream):
+    """Fecha um stream do SDK Groq (close) ou um gerador assíncrono (aclose)"""
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is not None:
+        await close()
 
 
 class GroqHandler:
     """Handler para API Groq com modelo Moonshot AI"""
 
-    def __init__(self):
-        # Inicializar cliente Groq com API key do config
-        self.client = Groq(api_key=GROQ_API_KEY)
-        self.model = MODEL_NAME
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        base_url: str = GROQ_BASE_URL,
+        backends: list = None,
+        http_pool: HTTPPool = None,
+        usage_store=None,
+    ):
+        # Cliente síncrono (só Groq) para generate_response_sync
+        self.client = Groq(api_key=GROQ_API_KEY, base_url=base_url)
+
+        # Pool de conexões keep-alive partilhado por todos os backends
+        self.http_pool = http_pool or shared_pool()
+
+        # Backends assíncronos (modelos Groq, endpoints compatíveis com
+        # OpenAI...), escolhidos por latência com failover automático
+        self.router = LLMRouter(
+            (
+                backends
+                if backends is not None
+                else build_backends(base_url, http_pool=self.http_pool)
+            ),
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=CIRCUIT_RECOVERY_TIMEOUT,
+        )
+        self.model = self.router.primary.model
+
+        # Fila global: limite de chamadas simultâneas, RPM/TPM e prioridades
+        self.max_concurrency = max(1, max_concurrency)
+        self.scheduler = LLMScheduler(
+            max_concurrency=self.max_concurrency,
+            rpm_limit=LLM_RPM_LIMIT,
+            tpm_limit=LLM_TPM_LIMIT,
+            max_queue_size=LLM_MAX_QUEUE,
+        )
+        # Sob sobrecarga os pedidos dispensáveis são recusados à entrada
+        self.shedder = LoadShedder(
+            queue_depth=lambda: self.scheduler.queue_depth,
+            queue_threshold=LLM_SHED_QUEUE_DEPTH,
+            latency_threshold=LLM_SHED_LATENCY,
+        )
+
+        # Cache de respostas para perguntas repetidas (usada pelo chat livre)
+        self.cache = ResponseCache(
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL
+        )
+        # Cache semântica para paráfrases (consultada após falha da exata)
+        self.semantic_cache = None
+        if SEMANTIC_CACHE_THRESHOLD > 0:
+            self.semantic_cache = SemanticCache(
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                ttl_seconds=RESPONSE_CACHE_TTL,
+            )
+
+        # Pedidos idênticos em simultâneo partilham uma só chamada à API
+        self.single_flight = SingleFlight()
+
+        # Repetições com backoff e prazos (circuit breakers por backend no router)
+        self.retry_policy = RetryPolicy(max_attempts=LLM_MAX_ATTEMPTS)
+        self.request_timeout = LLM_REQUEST_TIMEOUT
+        self.deadline = LLM_DEADLINE
+        self.retries = 0
 
-        # Configurações padrão otimizadas para o modelo Kimi
+        # Pedidos duplicados quando uma chamada passa do p90 (opcional)
+        self.hedging = HedgePolicy(
+            enabled=LLM_HEDGING,
+            percentile=LLM_HEDGE_PERCENTILE,
+            budget=LLM_HEDGE_BUDGET,
+        )
+
+        # Configurações padrão otimizadas para o modelo Kimi (os perfis de
+        # MODEL_PROFILES sobrepõem-se a estas nas chamadas assíncronas)
         self.default_params = {
             "temperature": 0.7,
             "max_tokens": 2048,
             "top_p": 0.9,
         }
+        self.profile_metrics = ProfileMetrics()
+
+        # Contabilidade de tokens por utilizador/comando (usage_store, ex:
+        # monitoring, guarda cada chamada) e limite diário por utilizador
+        self.usage_store = usage_store
+        self.quota = TokenQuota(daily_limit=LLM_DAILY_TOKEN_QUOTA, store=usage_store)
+        # Chamadas canceladas a meio (utilizador cancelou ou mudou de assunto)
+        self.cancellations = 0
+        self.tokens_saved = 0
 
         self.logger = logging.getLogger(__name__)
-        self.logger.info(f"✅ GroqHandler inicializado com modelo: {self.model}")
+        self.logger.info(
+            f"✅ GroqHandler inicializado com modelo: {self.model} "
+            f"(concorrência máx.: {self.max_concurrency})"
+        )
+
+    def _build_messages(
+        self, user_message: str, system_prompt: str = None, history: list = None
+    ) -> list:
+        """Monta a lista de mensagens no formato chat-completions"""
+        messages = []
+
+        # Adicionar system prompt se fornecido
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+
+        # Mensagens anteriores da conversa (resumo + mais recentes)
+        if history:
+            messages.extend(history)
+
+        # Adicionar mensagem do usuário
+        messages.append({"role": "user", "content": user_message})
+
+        return messages
 
     async def generate_response(
-        self, user_message: str, system_prompt: str = None
+        self,
+        user_message: str,
+        system_prompt: str = None,
+        use_cache: bool = False,
+        priority: int = PRIORITY_CHAT,
+        user_id: int = None,
+        on_queued: Callable[[int], object] = None,
+        profile: str = "chat",
+        command: str = None,
+        history: list = None,
     ) -> str:
         """
-        Gera resposta usando Groq API (versão assíncrona)
+        Gera resposta usando Groq API (versão assíncrona, não bloqueante)
 
         Args:
             user_message: Mensagem do usuário
             system_prompt: Prompt de sistema opcional
+            use_cache: Responder da cache a perguntas já feitas (ignorado com
+                histórico, a resposta depende da conversa, exceto sob
+                sobrecarga: uma resposta genérica é melhor que nenhuma)
+            priority: Prioridade na fila (ver llm_handler.scheduler)
+            user_id: Utilizador, para justiça na fila
+            on_queued: Callback com a posição na fila, se o pedido esperar
+            profile: Perfil da tarefa em MODEL_PROFILES (modelo, tokens, temperatura)
+            command: Comando de origem, para a contabilidade de tokens
+            history: Mensagens anteriores da conversa (ver ConversationMemory)
 
         Returns:
             str: Resposta gerada pelo modelo
+
+        Raises:
+            LLMQuotaExceededError: se o utilizador esgotou os tokens do dia
+            LLMOverloadedError: pedido recusado por sobrecarga (sem resposta
+                na cache)
+            LLMUnavailableError: se a API falhar (após as repetições)
         """
+        params = profile_params(profile, self.default_params)
+        model = params.get("model", self.model)
+
+        cache_key = None
+        namespace = (model, prompt_hash(system_prompt))
+        shedding = use_cache and self.shedder.would_shed(priority)
+        if use_cache and (not history or shedding):
+            lookup_key = self.cache.make_key(model, system_prompt, user_message)
+            if not history:
+                cache_key = lookup_key
+            cached = self.cache.get(lookup_key)
+            if cached is None and self.semantic_cache is not None:
+                match = self.semantic_cache.lookup(namespace, user_message)
+                if match is not None:
+                    cached = match[0]
+            if cached is not None:
+                if shedding:
+                    self.shedder.served_from_cache += 1
+                return cached
+
         try:
-            messages = []
+            self.shedder.check(priority)
+            messages = self._build_messages(user_message, system_prompt, history)
+            # Respostas da cache não gastam tokens: só aqui se verifica a quota
+            self.quota.check(
+                user_id, estimate_tokens(messages) + params.get("max_tokens", 0)
+            )
+            key = request_key(model, messages, params)
 
-            # Adicionar system prompt se fornecido
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
+            content = await self.single_flight.do(
+                key,
+                lambda: self._complete(
+                    messages, params, priority, user_id, on_queued, profile, command
+                ),
+            )
 
-            # Adicionar mensagem do usuário
-            messages.append({"role": "user", "content": user_message})
+        except LLMQueueFullError:
+            self.logger.warning("Fila LLM cheia, pedido recusado")
+            return ERROR_MESSAGES["fila_cheia"]
 
-            # Fazer chamada para API Groq
-            response = self.client.chat.completions.create(
-                model=self.model, messages=messages, **self.default_params
-            )
+        except (LLMQuotaExceededError, LLMOverloadedError):
+            raise
 
-            return response.choices[0].message.content
+        except LLMUnavailableError as e:
+            self.logger.error(f"API Groq indisponível: {e}")
+            raise
 
         except Exception as e:
             self.logger.error(f"Erro na API Groq: {e}")
-            return f"Desculpe, tive um problema técnico ao processar sua mensagem. Erro: {str(e)}"
+            raise LLMUnavailableError(str(e)) from e
+
+        # Só respostas bem-sucedidas entram na cache
+        if cache_key is not None and content:
+            self.cache.set(cache_key, content)
+            if self.semantic_cache is not None:
+                self.semantic_cache.add(namespace, user_message, content)
+
+        return content
+
+    async def _complete(
+        self,
+        messages: list,
+        params: dict,
+        priority: int = PRIORITY_CHAT,
+        user_id: int = None,
+        on_queued: Callable[[int], object] = None,
+        profile: str = "chat",
+        command: str = None,
+    ) -> str:
+        """
+        Chama o melhor backend com failover, retry, prazo total e circuit breaker
+
+        Raises:
+            LLMUnavailableError: tentativas esgotadas, prazo ultrapassado
+                ou todos os backends com o circuito aberto
+        """
+        started = time.monotonic()
+        deadline = started + self.deadline
+        tried: list = []  # backends já usados nesta ronda de tentativas
+        last_error = None
+
+        for attempt in range(self.retry_policy.max_attempts):
+            try:
+                response = await self._call_hedged(
+                    messages,
+                    params,
+                    priority=priority,
+                    user_id=user_id,
+                    on_queued=on_queued if attempt == 0 else None,
+                    deadline=deadline,
+                    tried=tried,
+                )
+                content = response.choices[0].message.content
+                usage = response.usage
+                self.shedder.record_latency(time.monotonic() - started)
+                self._record_usage(
+                    user_id,
+                    command or profile,
+                    profile,
+                    response.model or params.get("model", self.model),
+                    time.monotonic() - started,
+                    usage.prompt_tokens if usage else estimate_tokens(messages),
+                    usage.completion_tokens if usage else len(content or "") // 4,
+                )
+                return content
+
+            except (LLMQueueFullError, LLMUnavailableError):
+                raise
+
+            except asyncio.CancelledError:
+                self._record_cancellation(user_id, command or profile, profile, params, 0)
+                raise
+
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+
+            if not await self._prepare_retry(attempt, last_error, tried, deadline):
+                break
+
+        raise LLMUnavailableError(
+            f"LLM falhou após {attempt + 1} tentativa(s): {last_error}"
+        ) from last_error
+
+    def _record_usage(
+        self,
+        user_id: int,
+        command: str,
+        profile: str,
+        model: str,
+        latency: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+    ):
+        """Regista os tokens de uma chamada (perfil, quota e usage_store)"""
+        self.profile_metrics.record(profile, latency, prompt_tokens, completion_tokens)
+        self.quota.record(user_id, prompt_tokens + completion_tokens)
+        if self.usage_store is not None:
+            self.usage_store.register_llm_usage(
+                user_id, command, model, prompt_tokens, completion_tokens, latency
+            )
+
+    def _record_cancellation(
+        self,
+        user_id: int,
+        command: str,
+        profile: str,
+        params: dict,
+        generated_tokens: int,
+    ):
+        """Regista uma chamada cancelada e os tokens de resposta poupados"""
+        expected = self.profile_metrics.avg_completion_tokens(
+            profile, params.get("max_tokens", 0)
+        )
+        saved = max(0, expected - generated_tokens)
+        self.cancellations += 1
+        self.tokens_saved += saved
+        self.logger.info(f"Chamada LLM cancelada ({command}), ~{saved} tokens poupados")
+        if self.usage_store is not None:
+            self.usage_store.register_llm_cancellation(user_id, command, saved)
+
+    def _pick_backends(self, tried: list) -> list:
+        """Backends por ordem de preferência, primeiro os ainda não tentados"""
+        backends = self.router.candidates(exclude=tried) or self.router.candidates()
+        if not backends:
+            raise CircuitOpenError("Todos os backends LLM em falha, circuito aberto")
+        return backends
+
+    def _acquire_backend(self, backends: list, avoid=None):
+        """Reserva o primeiro backend disponível (avoid só em último recurso)"""
+        ordered = [b for b in backends if b is not avoid]
+        if avoid is not None:
+            ordered.append(avoid)
+        for backend in ordered:
+            if self.router.acquire(backend):
+                return backend
+        raise CircuitOpenError("Todos os backends LLM em falha, circuito aberto")
+
+    async def _prepare_retry(
+        self, attempt: int, last_error: Exception, tried: list, deadline: float
+    ) -> bool:
+        """
+        Prepara a tentativa seguinte: failover imediato se houver outro
+        backend disponível, senão backoff e nova ronda por todos
+
+        Returns:
+            bool: False se não houver mais tentativas
+        """
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            return False
+
+        if self.router.candidates(exclude=tried):
+            self.router.failovers += 1
+            self.logger.warning(
+                f"Falha em {tried[-1].name} ({last_error}), a mudar de backend"
+            )
+            return True
+
+        delay = self.retry_policy.delay(attempt, retry_after_seconds(last_error))
+        if time.monotonic() + delay >= deadline:
+            return False
+        self.retries += 1
+        self.logger.warning(
+            f"Tentativa {attempt + 1} falhou ({last_error}), nova tentativa em {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+        tried.clear()
+        return True
+
+    async def _call_api(
+        self,
+        messages: list,
+        params: dict,
+        priority: int,
+        user_id: int,
+        on_queued: Callable[[int], object],
+        deadline: float,
+        tried: list,
+        dispatched: asyncio.Event = None,
+        avoid=None,
+    ):
+        """
+        Uma chamada à API, com vez na fila e timeout por tentativa
+
+        O backend só é escolhido depois de sair da fila, com as métricas
+        atualizadas entretanto.
+        """
+        async with self.scheduler.slot(
+            priority=priority,
+            user_id=user_id,
+            estimated_tokens=estimate_tokens(messages) + params.get("max_tokens", 0),
+            on_queued=on_queued,
+        ) as ticket:
+            backend = self._acquire_backend(self._pick_backends(tried), avoid=avoid)
+            tried.append(backend)
+            if dispatched is not None:
+                dispatched.set()
+            timeout = min(self.request_timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise LLMUnavailableError("Prazo do pedido ultrapassado")
+
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    backend.create(messages, **params), timeout=timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.router.record_failure(backend, e)
+                raise
+            latency = time.monotonic() - started
+            self.router.record_success(backend, latency)
+            self.hedging.call_latency.record(latency)
+
+            if response.usage is not None:
+                ticket.settle(response.usage.total_tokens)
+        return response
+
+    async def _call_hedged(
+        self,
+        messages: list,
+        params: dict,
+        priority: int,
+        user_id: int,
+        on_queued: Callable[[int], object],
+        deadline: float,
+        tried: list,
+    ):
+        """
+        Chamada com hedging: se passar do percentil configurado sem resposta,
+        lança uma segunda chamada idêntica (noutro backend, se houver) e fica
+        com a primeira a terminar
+
+        O atraso conta a partir do momento em que o pedido sai da fila. A
+        chamada perdedora é cancelada.
+        """
+        self.hedging.requests += 1
+        dispatched = asyncio.Event()
+        primary = asyncio.ensure_future(
+            self._call_api(
+                messages,
+                params,
+                priority,
+                user_id,
+                on_queued,
+                deadline,
+                tried,
+                dispatched=dispatched,
+            )
+        )
+        hedge = None
+        try:
+            waiter = asyncio.ensure_future(dispatched.wait())
+            await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            started = time.monotonic()
+
+            delay = self.hedging.hedge_delay()
+            if delay is not None and not primary.done():
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done() or not self.hedging.try_acquire():
+                response = await primary
+                self.hedging.effective_latency.record(time.monotonic() - started)
+                return response
+
+            # O duplicado vai para outro backend, se houver algum disponível
+            self.logger.debug(f"Sem resposta em {delay:.2f}s, a lançar pedido duplicado")
+            hedge = asyncio.ensure_future(
+                self._call_api(
+                    messages,
+                    params,
+                    priority,
+                    user_id,
+                    None,
+                    deadline,
+                    tried,
+                    avoid=tried[-1],
+                )
+            )
+
+            # A primeira chamada com êxito ganha; se uma falhar espera-se a outra
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedging.hedge_wins += 1
+                        self.hedging.effective_latency.record(
+                            time.monotonic() - started
+                        )
+                        return task.result()
+                    error = task.exception()
+            raise error
+
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def generate_response_stream(
+        self,
+        user_message: str,
+        system_prompt: str = None,
+        priority: int = PRIORITY_SIMULATION,
+        user_id: int = None,
+        on_queued: Callable[[int], object] = None,
+        profile: str = "analise",
+        command: str = None,
+    ) -> AsyncIterator[str]:
+        """
+        Gera resposta em streaming, devolvendo os tokens à medida que chegam
+
+        Falhas antes do primeiro token são repetidas (ou passam para outro
+        backend) como em generate_response; depois do primeiro token já não é
+        possível repetir sem duplicar texto.
+
+        Args:
+            user_message: Mensagem do usuário
+            system_prompt: Prompt de sistema opcional
+            priority: Prioridade na fila (ver llm_handler.scheduler)
+            user_id: Utilizador, para justiça na fila
+            on_queued: Callback com a posição na fila, se o pedido esperar
+            profile: Perfil da tarefa em MODEL_PROFILES (modelo, tokens, temperatura)
+            command: Comando de origem, para a contabilidade de tokens
+
+        Yields:
+            str: Fragmentos de texto da resposta
+
+        Raises:
+            LLMQuotaExceededError: se o utilizador esgotou os tokens do dia
+            LLMOverloadedError: pedido recusado por sobrecarga (nunca com
+                PRIORITY_SIMULATION)
+            LLMUnavailableError: se nenhum backend responder
+        """
+        messages = self._build_messages(user_message, system_prompt)
+        params = profile_params(profile, self.default_params)
+        prompt_tokens = estimate_tokens(messages)
+        self.shedder.check(priority)
+        self.quota.check(user_id, prompt_tokens + params["max_tokens"])
+        stream_started = time.monotonic()
+        deadline = stream_started + self.deadline
+        tried: list = []
+        started = False
+        completion_chars = 0
+        last_error = None
+
+        for attempt in range(self.retry_policy.max_attempts):
+            try:
+                async with self.scheduler.slot(
+                    priority=priority,
+                    user_id=user_id,
+                    estimated_tokens=prompt_tokens + params["max_tokens"],
+                    on_queued=on_queued if attempt == 0 else None,
+                ) as ticket:
+                    backend = self._acquire_backend(self._pick_backends(tried))
+                    tried.append(backend)
+                    timeout = min(self.request_timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        raise LLMUnavailableError("Prazo do pedido ultrapassado")
+                    request_started = time.monotonic()
+                    stream = await asyncio.wait_for(
+                        backend.create(messages, stream=True, **params),
+                        timeout=timeout,
+                    )
+                    first_token = None
+                    completion_chars = 0
+                    try:
+                        async for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                if first_token is None:
+                                    first_token = time.monotonic() - request_started
+                                started = True
+                                completion_chars += len(delta)
+                                yield delta
+                    finally:
+                        # Fecha a resposta HTTP mesmo se o stream for cancelado
+                        await _close_stream(stream)
+                    ticket.settle(prompt_tokens + completion_chars // 4)
+                    self._record_usage(
+                        user_id,
+                        command or profile,
+                        profile,
+                        params.get("model") or backend.model,
+                        time.monotonic() - stream_started,
+                        prompt_tokens,
+                        completion_chars // 4,
+                    )
+
+                # Latência do stream = tempo até ao primeiro token
+                first_token = (
+                    first_token
+                    if first_token is not None
+                    else time.monotonic() - request_started
+                )
+                self.router.record_success(backend, first_token)
+                # Para o utilizador conta também a espera na fila
+                self.shedder.record_latency(request_started - stream_started + first_token)
+                return
+
+            except LLMQueueFullError:
+                self.logger.warning("Fila LLM cheia, pedido recusado (stream)")
+                yield ERROR_MESSAGES["fila_cheia"]
+                return
+
+            except LLMUnavailableError:
+                raise
+
+            except (asyncio.CancelledError, GeneratorExit):
+                self._record_cancellation(
+                    user_id, command or profile, profile, params, completion_chars // 4
+                )
+                raise
+
+            except Exception as e:
+                self.logger.error(f"Erro no backend {backend.name} (stream): {e}")
+                self.router.record_failure(backend, e)
+                if not is_retryable(e) or started:
+                    raise LLMUnavailableError(str(e)) from e
+                last_error = e
+
+            if not await self._prepare_retry(attempt, last_error, tried, deadline):
+                break
+
+        raise LLMUnavailableError(
+            f"LLM falhou após {attempt + 1} tentativa(s): {last_error}"
+        ) from last_error
 
     def generate_response_sync(
         self, user_message: str, system_prompt: str = None
@@ -66,6 +710,9 @@ class GroqHandler:
         """
         Versão síncrona da geração de resposta
 
+        Bloqueia a thread atual; não deve ser chamada dentro dos handlers
+        do bot (usar generate_response).
+
         Args:
             user_message: Mensagem do usuário
             system_prompt: Prompt de sistema opcional
@@ -74,12 +721,7 @@ class GroqHandler:
             str: Resposta gerada pelo modelo
         """
         try:
-            messages = []
-
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-
-            messages.append({"role": "user", "content": user_message})
+            messages = self._build_messages(user_message, system_prompt)
 
             response = self.client.chat.completions.create(
                 model=self.model, messages=messages, **self.default_params
@@ -130,6 +772,36 @@ class GroqHandler:
             self.logger.error(f"❌ Erro no teste de conexão com Groq: {e}")
             return False
 
+    def get_performance_stats(self) -> dict:
+        """
+        Retorna métricas de performance da camada LLM (para o /stats)
+
+        Returns:
+            dict: Métricas por componente
+        """
+        return {
+            "cache": self.cache.get_stats(),
+            "semantic_cache": (
+                self.semantic_cache.get_stats() if self.semantic_cache else {}
+            ),
+            "single_flight": self.single_flight.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "resilience": {
+                "retries": self.retries,
+                "failovers": self.router.failovers,
+            },
+            "providers": self.router.get_stats(),
+            "hedging": self.hedging.get_stats(),
+            "profiles": self.profile_metrics.get_stats(),
+            "http_pool": self.http_pool.get_stats(),
+            "quota": self.quota.get_stats(),
+            "shedding": self.shedder.get_stats(),
+            "cancellations": {
+                "cancelled": self.cancellations,
+                "tokens_saved": self.tokens_saved,
+            },
+        }
+
     def get_model_info(self) -> dict:
         """
         Retorna informações sobre o modelo atual
@@ -138,11 +810,14 @@ class GroqHandler:
             dict: Informações do modelo e configurações
         """
         return {
-            "provider": "Groq",
+            "provider": self.router.primary.kind,
             "model": self.model,
+            "backends": describe_backends(self.router.backends),
+            "profiles": MODEL_PROFILES,
             "temperature": self.default_params["temperature"],
             "max_tokens": self.default_params["max_tokens"],
             "top_p": self.default_params["top_p"],
+            "max_concurrency": self.max_concurrency,
         }
 
 
@@ -0,0 +1,101 @@
+"""
+Hedging - Pedidos duplicados para cortar a cauda de latência
+Se uma chamada demora mais do que o percentil p90 recente, é lançada uma
+segunda chamada idêntica e usa-se a que terminar primeiro.
+"""
+
+import math
+import logging
+from collections import deque
+from typing import Any
+
+
+class LatencyTracker:
+    """Janela deslizante de latências (segundos) com percentis"""
+
+    def __init__(self, window: int = 500):
+        self._samples: deque[float] = deque(maxlen=max(1, window))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """Percentil p (0-100) pelo método nearest-rank, None se vazio"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+        return ordered[rank - 1]
+
+    def get_stats(self) -> dict[str, Any]:
+        def ms(p):
+            value = self.percentile(p)
+            return round(value * 1000) if value is not None else None
+
+        return {"samples": len(self), "p50_ms": ms(50), "p90_ms": ms(90), "p99_ms": ms(99)}
+
+
+class HedgePolicy:
+    """
+    Decide quando lançar um pedido duplicado
+
+    O atraso é o percentil configurado das latências recentes de chamadas
+    individuais; o número de duplicados fica limitado a uma fração (budget)
+    do total de pedidos, para não multiplicar a carga sobre a API.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 90,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        window: int = 500,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+
+        # Latência de cada chamada individual à API (sem hedging) e latência
+        # efetivamente vista por quem fez o pedido (com hedging)
+        self.call_latency = LatencyTracker(window)
+        self.effective_latency = LatencyTracker(window)
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def hedge_delay(self) -> float | None:
+        """Atraso até ao pedido duplicado, ou None se não houver hedging"""
+        if not self.enabled or len(self.call_latency) < self.min_samples:
+            return None
+        return self.call_latency.percentile(self.percentile)
+
+    def try_acquire(self) -> bool:
+        """Reserva um pedido duplicado se o orçamento o permitir"""
+        if self.hedges >= self.budget * self.requests:
+            self.budget_denied += 1
+            return False
+        self.hedges += 1
+        return True
+
+    def get_stats(self) -> dict[str, Any]:
+        """Métricas de hedging para o /stats"""
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "without_hedging": self.call_latency.get_stats(),
+            "with_hedging": self.effective_latency.get_stats(),
+        }
@@ -0,0 +1,168 @@
+"""
+HTTP Pool - Cliente HTTP partilhado pelos backends LLM
+Conexões keep-alive reutilizadas (HTTP/2 quando o pacote h2 existe),
+aquecimento no arranque e pings periódicos para não deixar as conexões
+arrefecer em períodos sem utilizadores
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any
+
+import httpx
+
+from config import (
+    LLM_HTTP2,
+    LLM_HTTP_KEEPALIVE_EXPIRY,
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_HTTP_MAX_KEEPALIVE,
+)
+
+try:
+    import h2  # noqa: F401 (só para saber se o HTTP/2 está disponível)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPPool:
+    """
+    Pool de conexões httpx com métricas de reutilização
+
+    As métricas vêm do trace do httpcore: cada pedido enviado conta como
+    pedido; cada connect TCP conta como conexão nova. O resto foi servido
+    por uma conexão já aberta.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = LLM_HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = LLM_HTTP2,
+    ):
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            logger.info("HTTP/2 indisponível (pacote h2 não instalado), a usar HTTP/1.1")
+
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.client = httpx.AsyncClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            event_hooks={"request": [self._on_request]},
+        )
+
+        # name -> (url, headers) usados no aquecimento e nos pings
+        self._endpoints: dict[str, tuple[str, dict]] = {}
+        self._keepalive_task: asyncio.Task | None = None
+
+        # Métricas
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.warm_up_ms = None
+
+    def register_endpoint(self, name: str, url: str, headers: dict = None):
+        """Regista um URL barato (ex: lista de modelos) para aquecer/pingar"""
+        self._endpoints[name] = (url, headers or {})
+
+    async def _on_request(self, request: httpx.Request):
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+        elif event_name.endswith("send_request_headers.started"):
+            self.requests += 1
+
+    async def _ping(self, name: str, url: str, headers: dict) -> bool:
+        try:
+            # Qualquer resposta serve: o objetivo é abrir/manter a conexão
+            await self.client.get(url, headers=headers, timeout=10.0)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Ping HTTP a {name} falhou: {e}")
+            return False
+
+    async def warm_up(self) -> int:
+        """
+        Abre uma conexão para cada endpoint registado (no arranque do bot)
+
+        Returns:
+            int: Número de endpoints que responderam
+        """
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(self._ping(name, url, h) for name, (url, h) in self._endpoints.items())
+        )
+        self.warm_up_ms = round((time.monotonic() - started) * 1000)
+        logger.info(
+            f"🔥 Conexões LLM aquecidas: {sum(results)}/{len(results)} "
+            f"em {self.warm_up_ms}ms"
+        )
+        return sum(results)
+
+    async def _keepalive_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for name, (url, headers) in list(self._endpoints.items()):
+                self.pings += 1
+                if not await self._ping(name, url, headers):
+                    self.ping_failures += 1
+
+    def start_keepalive(self, interval: float):
+        """Pings periódicos (interval deve ser menor que keepalive_expiry)"""
+        if interval <= 0 or self._keepalive_task is not None:
+            return
+        self._keepalive_task = asyncio.get_running_loop().create_task(
+            self._keepalive_loop(interval)
+        )
+
+    async def aclose(self):
+        """Para os pings e fecha as conexões"""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        await self.client.aclose()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Métricas de reutilização de conexões para o /stats"""
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused": reused,
+            "reuse_rate": (
+                round(reused * 100.0 / self.requests, 2) if self.requests else 0.0
+            ),
+            "tls_handshakes": self.tls_handshakes,
+            "warm_up_ms": self.warm_up_ms,
+            "pings": self.pings,
+            "ping_failures": self.ping_failures,
+        }
+
+
+_shared_pool: HTTPPool | None = None
+
+
+def shared_pool() -> HTTPPool:
+    """Pool partilhado por todo o processo (criado no primeiro uso)"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = HTTPPool()
+    return _shared_pool
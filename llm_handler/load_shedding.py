@@ -0,0 +1,133 @@
+"""
+Load Shedding - Recusa pedidos dispensáveis quando o LLM está sobrecarregado
+Com a fila funda ou a API lenta, o chat livre e as explicações do /calcular
+passam a respostas locais; a simulação completa continua a ir ao modelo
+"""
+
+import math
+import time
+import logging
+from collections import deque
+from typing import Any, Callable
+
+from llm_handler.resilience import LLMUnavailableError
+from llm_handler.scheduler import PRIORITY_NAMES, PRIORITY_SIMULATION
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """Pedido recusado para aliviar o modelo (usar uma resposta local)"""
+
+
+class LoadShedder:
+    """
+    Decide se um pedido deve ser recusado antes de entrar na fila
+
+    Sobrecarga: fila com queue_threshold ou mais pedidos, ou p90 das
+    latências dos últimos window_seconds acima de latency_threshold (com
+    pelo menos min_samples latências: uma chamada lenta isolada não conta).
+    Sai da sobrecarga com a fila abaixo de metade do limite (histerese) e
+    quando as latências lentas saem da janela. Pedidos com prioridade igual
+    ou melhor que protected_priority nunca são recusados. Limite 0 desliga
+    o critério.
+    """
+
+    def __init__(
+        self,
+        queue_depth: Callable[[], int],
+        queue_threshold: int = 50,
+        latency_threshold: float = 10.0,
+        window_seconds: float = 60.0,
+        min_samples: int = 5,
+        protected_priority: int = PRIORITY_SIMULATION,
+    ):
+        self.queue_depth = queue_depth
+        self.queue_threshold = queue_threshold
+        self.latency_threshold = latency_threshold
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.protected_priority = protected_priority
+
+        self._latencies: deque[tuple[float, float]] = deque(maxlen=1000)  # (instante, s)
+        self._queue_overloaded = False
+        self._overloaded = False
+        self.shed = {name: 0 for p, name in PRIORITY_NAMES.items() if p > protected_priority}
+        self.times_overloaded = 0
+        self.served_from_cache = 0  # respondidos pela cache em vez de recusados
+
+        self.logger = logging.getLogger(__name__)
+
+    def record_latency(self, seconds: float):
+        """Latência de uma chamada concluída"""
+        self._latencies.append((time.monotonic(), seconds))
+
+    def _recent_p90(self) -> float | None:
+        cutoff = time.monotonic() - self.window_seconds
+        while self._latencies and self._latencies[0][0] < cutoff:
+            self._latencies.popleft()
+        if not self._latencies:
+            return None
+        ordered = sorted(latency for _, latency in self._latencies)
+        return ordered[max(1, math.ceil(0.9 * len(ordered))) - 1]
+
+    def overload_reason(self) -> str | None:
+        """Motivo da sobrecarga atual, ou None"""
+        reason = None
+        if self.queue_threshold:
+            depth = self.queue_depth()
+            if depth >= self.queue_threshold:
+                self._queue_overloaded = True
+            elif depth < self.queue_threshold / 2:
+                self._queue_overloaded = False
+            if self._queue_overloaded:
+                reason = f"fila com {depth} pedidos"
+
+        if reason is None and self.latency_threshold:
+            p90 = self._recent_p90()
+            if (
+                p90 is not None
+                and len(self._latencies) >= self.min_samples
+                and p90 >= self.latency_threshold
+            ):
+                reason = f"p90 de {p90:.1f}s"
+
+        if reason is not None and not self._overloaded:
+            self.times_overloaded += 1
+            self.logger.warning(f"LLM sobrecarregado ({reason}): só respostas locais")
+        elif reason is None and self._overloaded:
+            self.logger.info("LLM recuperado da sobrecarga")
+        self._overloaded = reason is not None
+        return reason
+
+    def would_shed(self, priority: int) -> bool:
+        """Um pedido com esta prioridade seria recusado agora?"""
+        return priority > self.protected_priority and self.overload_reason() is not None
+
+    def check(self, priority: int):
+        """
+        Recusa o pedido se houver sobrecarga e a prioridade não for protegida
+
+        Raises:
+            LLMOverloadedError: pedido recusado
+        """
+        if priority <= self.protected_priority:
+            return
+        reason = self.overload_reason()
+        if reason is None:
+            return
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        self.shed[name] = self.shed.get(name, 0) + 1
+        self.logger.debug(f"Pedido de {name} recusado ({reason})")
+        raise LLMOverloadedError(f"LLM sobrecarregado: {reason}")
+
+    def get_stats(self) -> dict[str, Any]:
+        """Limites, estado e pedidos recusados para o /stats"""
+        p90 = self._recent_p90()
+        return {
+            "queue_threshold": self.queue_threshold,
+            "latency_threshold": self.latency_threshold,
+            "overloaded": self.overload_reason(),
+            "recent_p90_ms": round(p90 * 1000) if p90 is not None else None,
+            "shed": dict(self.shed),
+            "served_from_cache": self.served_from_cache,
+            "times_overloaded": self.times_overloaded,
+        }
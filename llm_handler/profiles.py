@@ -0,0 +1,77 @@
+"""
+Perfis de modelo por tarefa e métricas por perfil
+Tarefas curtas usam um modelo pequeno com poucos tokens; a análise completa
+da simulação mantém o modelo grande (ver MODEL_PROFILES no config)
+"""
+
+import logging
+from typing import Any
+
+from config import MODEL_PROFILES
+from llm_handler.hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+def profile_params(profile: str, defaults: dict) -> dict:
+    """
+    Parâmetros do pedido: defaults sobrepostos pelo perfil
+
+    Inclui "model" só se o perfil fixar um modelo; sem ele cada backend usa
+    o seu próprio.
+    """
+    params = dict(defaults)
+    overrides = MODEL_PROFILES.get(profile)
+    if overrides is None:
+        logger.warning(f"Perfil de modelo desconhecido: {profile}, a usar defaults")
+        return params
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return params
+
+
+class ProfileMetrics:
+    """Latência e tokens gastos por perfil, para afinar a divisão entre modelos"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._latency: dict[str, LatencyTracker] = {}
+        self._totals: dict[str, dict[str, int]] = {}
+
+    def record(
+        self,
+        profile: str,
+        latency: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+    ):
+        self._latency.setdefault(profile, LatencyTracker(self.window)).record(latency)
+        totals = self._totals.setdefault(
+            profile, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+        totals["requests"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+
+    def avg_completion_tokens(self, profile: str, default: int) -> int:
+        """Tamanho médio das respostas do perfil (default sem histórico)"""
+        totals = self._totals.get(profile)
+        if not totals or not totals["requests"]:
+            return default
+        return round(totals["completion_tokens"] / totals["requests"])
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """Métricas por perfil para o /stats"""
+        stats = {}
+        for profile, totals in self._totals.items():
+            requests = totals["requests"]
+            latency = self._latency[profile].get_stats()
+            stats[profile] = {
+                "model": MODEL_PROFILES.get(profile, {}).get("model"),
+                "requests": requests,
+                "p50_ms": latency["p50_ms"],
+                "p90_ms": latency["p90_ms"],
+                "avg_prompt_tokens": round(totals["prompt_tokens"] / requests),
+                "avg_completion_tokens": round(totals["completion_tokens"] / requests),
+                "total_tokens": totals["prompt_tokens"] + totals["completion_tokens"],
+            }
+        return stats
@@ -0,0 +1,205 @@
+"""
+Providers - Backends LLM intercambiáveis
+Modelos Groq, qualquer endpoint compatível com OpenAI (chat-completions)
+ou um servidor mock local, todos com a mesma interface
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator
+
+import groq
+import httpx
+from groq import AsyncGroq
+from groq.types.chat import ChatCompletion, ChatCompletionChunk
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    LLM_FALLBACK_MODELS,
+    LLM_PROVIDER,
+    MODEL_NAME,
+    OPENAI_COMPAT_API_KEY,
+    OPENAI_COMPAT_BASE_URL,
+    OPENAI_COMPAT_MODEL,
+)
+from llm_handler.http_pool import HTTPPool, shared_pool
+
+DEFAULT_GROQ_URL = "https://api.groq.com"
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend(ABC):
+    """
+    Interface comum dos backends
+
+    create() devolve um ChatCompletion, ou um iterador assíncrono de
+    ChatCompletionChunk quando stream=True. O argumento model (do perfil da
+    tarefa) só é usado pelos backends Groq. Os erros usam as exceções do SDK
+    Groq (APIStatusError, APIConnectionError, APITimeoutError), pelo que a
+    lógica de retry é a mesma para todos os backends.
+    """
+
+    kind = "base"
+
+    def __init__(self, name: str, model: str):
+        self.name = name
+        self.model = model
+
+    @abstractmethod
+    async def create(
+        self, messages: list, stream: bool = False, model: str = None, **params
+    ):
+        """Pedido de chat-completions ao backend"""
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name} ({self.model})>"
+
+
+class GroqBackend(LLMBackend):
+    """Modelo servido pela API Groq (ou pelo mock, via base_url)"""
+
+    kind = "groq"
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        api_key: str = GROQ_API_KEY,
+        base_url: str = GROQ_BASE_URL,
+        http_pool: HTTPPool = None,
+    ):
+        super().__init__(name, model)
+        pool = http_pool or shared_pool()
+        # As repetições são feitas pelo GroqHandler, não pelo cliente
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=pool.client,
+        )
+        # Lista de modelos: pedido barato para aquecer a conexão
+        pool.register_endpoint(
+            (base_url or DEFAULT_GROQ_URL).rstrip("/"),
+            f"{(base_url or DEFAULT_GROQ_URL).rstrip('/')}/openai/v1/models",
+            {"Authorization": f"Bearer {api_key}"},
+        )
+
+    async def create(
+        self, messages: list, stream: bool = False, model: str = None, **params
+    ):
+        return await self.client.chat.completions.create(
+            model=model or self.model, messages=messages, stream=stream, **params
+        )
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Endpoint chat-completions compatível com OpenAI (ex: https://host/v1)"""
+
+    kind = "openai"
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        base_url: str,
+        api_key: str = None,
+        http_pool: HTTPPool = None,
+    ):
+        super().__init__(name, model)
+        pool = http_pool or shared_pool()
+        self.client = pool.client
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        pool.register_endpoint(self.base_url, f"{self.base_url}/models", self.headers)
+
+    async def create(
+        self, messages: list, stream: bool = False, model: str = None, **params
+    ):
+        # Os perfis usam nomes de modelos Groq: aqui vale sempre o configurado
+        payload = {"model": self.model, "messages": messages, "stream": stream, **params}
+        request = self.client.build_request(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=payload,
+            headers=self.headers,
+            timeout=None,  # o timeout por tentativa é aplicado pelo GroqHandler
+        )
+        try:
+            response = await self.client.send(request, stream=stream)
+        except httpx.TimeoutException as e:
+            raise groq.APITimeoutError(request=request) from e
+        except httpx.HTTPError as e:
+            raise groq.APIConnectionError(request=request) from e
+
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            raise groq.APIStatusError(
+                f"Error code: {response.status_code} - {body}",
+                response=response,
+                body=body,
+            )
+
+        if stream:
+            return self._iter_chunks(response)
+        return ChatCompletion.model_validate(response.json())
+
+    async def _iter_chunks(
+        self, response: httpx.Response
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        """Lê Server-Sent Events até [DONE]"""
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                yield ChatCompletionChunk.model_validate(json.loads(data))
+        finally:
+            await response.aclose()
+
+
+def build_backends(
+    base_url: str = GROQ_BASE_URL, http_pool: HTTPPool = None
+) -> list[LLMBackend]:
+    """
+    Cria os backends configurados, o principal (LLM_PROVIDER) primeiro
+
+    Config:
+        MODEL_NAME e LLM_FALLBACK_MODELS: modelos Groq
+        OPENAI_COMPAT_BASE_URL/_MODEL/_API_KEY: endpoint compatível com OpenAI
+    """
+    groq_backends: list[LLMBackend] = [
+        GroqBackend(f"groq:{model}", model, base_url=base_url, http_pool=http_pool)
+        for model in [MODEL_NAME, *LLM_FALLBACK_MODELS]
+    ]
+    openai_backends: list[LLMBackend] = []
+    if OPENAI_COMPAT_BASE_URL:
+        openai_backends.append(
+            OpenAICompatibleBackend(
+                f"openai:{OPENAI_COMPAT_MODEL}",
+                OPENAI_COMPAT_MODEL,
+                base_url=OPENAI_COMPAT_BASE_URL,
+                api_key=OPENAI_COMPAT_API_KEY,
+                http_pool=http_pool,
+            )
+        )
+
+    if LLM_PROVIDER == "openai" and openai_backends:
+        return openai_backends + groq_backends
+    if LLM_PROVIDER not in ("groq", "openai"):
+        logger.warning(f"LLM_PROVIDER desconhecido: {LLM_PROVIDER}, a usar groq")
+    return groq_backends + openai_backends
+
+
+def describe_backends(backends: list[LLMBackend]) -> list[dict[str, Any]]:
+    """Resumo dos backends para get_model_info"""
+    return [{"name": b.name, "kind": b.kind, "model": b.model} for b in backends]
@@ -0,0 +1,88 @@
+"""
+Token Quota - Limite diário de tokens por utilizador
+Verificado antes de cada chamada com uma estimativa barata do pedido,
+para um só utilizador não consumir o orçamento de todos
+"""
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Any
+
+from llm_handler.resilience import LLMUnavailableError
+
+
+class LLMQuotaExceededError(LLMUnavailableError):
+    """O utilizador esgotou os tokens do dia"""
+
+
+class TokenQuota:
+    """
+    Tokens gastos hoje por utilizador, em memória
+
+    O consumo de cada utilizador é carregado do store (ex: base de dados de
+    monitoramento) no primeiro pedido do dia, pelo que o limite sobrevive a
+    reinícios do bot. daily_limit 0 desliga o limite.
+    """
+
+    def __init__(self, daily_limit: int = 0, store=None):
+        self.daily_limit = daily_limit
+        self.store = store
+        self._day = self._today()
+        self._used: dict[int, int] = {}
+        self.denied = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _today() -> date:
+        # Dia em UTC, como o CURRENT_TIMESTAMP do SQLite
+        return datetime.now(timezone.utc).date()
+
+    def _rollover(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used.clear()
+
+    def used_today(self, user_id: int) -> int:
+        """Tokens gastos hoje pelo utilizador"""
+        self._rollover()
+        if user_id not in self._used:
+            self._used[user_id] = (
+                self.store.get_tokens_today(user_id) if self.store is not None else 0
+            )
+        return self._used[user_id]
+
+    def check(self, user_id: int, estimated_tokens: int):
+        """
+        Recusa o pedido se a estimativa passar do limite diário
+
+        Raises:
+            LLMQuotaExceededError: se o utilizador não tiver tokens suficientes
+        """
+        if not self.daily_limit or user_id is None:
+            return
+        used = self.used_today(user_id)
+        if used + estimated_tokens > self.daily_limit:
+            self.denied += 1
+            self.logger.warning(
+                f"Quota diária esgotada para {user_id}: "
+                f"{used} + {estimated_tokens} > {self.daily_limit} tokens"
+            )
+            raise LLMQuotaExceededError(f"Quota diária de tokens esgotada ({user_id})")
+
+    def record(self, user_id: int, tokens: int):
+        """Soma os tokens efetivamente gastos"""
+        if user_id is None:
+            return
+        self._used[user_id] = self.used_today(user_id) + tokens
+
+    def get_stats(self) -> dict[str, Any]:
+        """Métricas de quota para o /stats"""
+        self._rollover()
+        return {
+            "daily_limit": self.daily_limit,
+            "users_today": len(self._used),
+            "tokens_today": sum(self._used.values()),
+            "denied": self.denied,
+        }
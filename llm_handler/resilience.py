@@ -0,0 +1,167 @@
+"""
+Resilience - Retry com backoff exponencial e circuit breaker
+Evita acumular pedidos lentos e condenados quando a API está degradada
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Any
+
+import groq
+
+# Estados do circuit breaker
+STATE_CLOSED = "fechado"  # normal
+STATE_OPEN = "aberto"  # falha imediata, sem chamar a API
+STATE_HALF_OPEN = "semiaberto"  # um pedido de teste para ver se recuperou
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """O modelo não está disponível (tentativas esgotadas ou circuito aberto)"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Circuito aberto: a API falhou demasiadas vezes seguidas"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erros transitórios que vale a pena repetir"""
+    if isinstance(error, (asyncio.TimeoutError, groq.APIConnectionError)):
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Lê o cabeçalho retry-after de uma resposta de erro, se existir"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter completo, limitado por um prazo total"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        Espera antes da tentativa seguinte
+
+        Args:
+            attempt: Tentativa que acabou de falhar (0 = primeira)
+            retry_after: Valor do cabeçalho retry-after, que tem precedência
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clássico
+
+    Abre após failure_threshold falhas seguidas; passado recovery_timeout
+    deixa passar um pedido de teste (semiaberto) e fecha se este tiver êxito.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None  # instante do pedido de teste em curso
+
+        self.times_opened = 0
+        self.rejected = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def allow_request(self) -> bool:
+        """Indica se um pedido pode seguir para a API"""
+        if self.state == STATE_CLOSED:
+            return True
+
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                self.rejected += 1
+                return False
+            self.state = STATE_HALF_OPEN
+            self._probe_started = None
+
+        # Semiaberto: só um pedido de teste de cada vez (um teste que nunca
+        # terminou, ex: cancelado, deixa de contar passado recovery_timeout)
+        now = time.monotonic()
+        if (
+            self._probe_started is not None
+            and now - self._probe_started < self.recovery_timeout
+        ):
+            self.rejected += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def is_available(self) -> bool:
+        """Como allow_request(), mas sem efeitos (não reserva o pedido de teste)"""
+        now = time.monotonic()
+        if self.state == STATE_OPEN:
+            return now - self._opened_at >= self.recovery_timeout
+        if self.state == STATE_HALF_OPEN:
+            return (
+                self._probe_started is None
+                or now - self._probe_started >= self.recovery_timeout
+            )
+        return True
+
+    def record_success(self):
+        if self.state != STATE_CLOSED:
+            self.logger.info("✅ Circuit breaker fechado: API recuperou")
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self._probe_started = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_started = None
+        if (
+            self.state == STATE_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.state != STATE_OPEN:
+                self.times_opened += 1
+                self.logger.warning(
+                    f"⚠️ Circuit breaker aberto após {self.consecutive_failures} falhas"
+                )
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Estado do circuit breaker para o /stats"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,94 @@
+"""
+Response Cache - Cache de respostas LLM para perguntas repetidas
+LRU com limite de entradas, TTL e contadores de acertos/falhas
+"""
+
+import re
+import time
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza uma pergunta para comparação exata
+
+    Ignora maiúsculas, acentos, pontuação e espaços repetidos:
+    "O que é IRS?" e "o que e irs" dão a mesma chave.
+    """
+    texto = unicodedata.normalize("NFKD", question.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def prompt_hash(system_prompt: str | None) -> str:
+    """Hash curto do system prompt (mudar o prompt invalida a cache)"""
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Cache LRU em memória de respostas do modelo"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 86400):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        # chave -> (instante de escrita, resposta)
+        self._entries: OrderedDict[tuple, tuple[float, str]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def make_key(self, model: str, system_prompt: str | None, question: str) -> tuple:
+        """Chave da cache: modelo, hash do system prompt e pergunta normalizada"""
+        return (model, prompt_hash(system_prompt), normalize_question(question))
+
+    def get(self, key: tuple) -> str | None:
+        """Devolve a resposta em cache ou None (conta acerto/falha)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, key: tuple, response: str):
+        """Guarda uma resposta, removendo a entrada menos usada se cheia"""
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Esvazia a cache (os contadores mantêm-se)"""
+        self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Estatísticas da cache para o /stats"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits * 100.0 / total, 2) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
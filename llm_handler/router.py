@@ -0,0 +1,143 @@
+"""
+LLM Router - Escolhe o backend mais rápido e saudável para cada pedido
+Latência e taxa de erro por backend em médias móveis exponenciais (EWMA),
+com um circuit breaker por backend para failover automático
+"""
+
+import time
+import logging
+from typing import Any
+
+import groq
+
+from llm_handler.providers import LLMBackend
+from llm_handler.resilience import CircuitBreaker, is_retryable
+
+# Penalização da taxa de erro no score: 10% de erros ~ +100% de latência
+ERROR_PENALTY = 10.0
+# Latência assumida (segundos) para um backend que ainda não teve êxito
+UNKNOWN_LATENCY = 1.0
+
+
+class BackendHealth:
+    """Métricas de um backend"""
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.ewma_latency: float | None = None  # segundos
+        self.error_rate = 0.0  # EWMA de 0 (sucesso) / 1 (falha)
+        self.requests = 0
+        self.failures = 0
+        self.last_used = 0.0
+
+
+class LLMRouter:
+    """
+    Ordena os backends por latência esperada
+
+    score = latência EWMA x (1 + ERROR_PENALTY x taxa de erro EWMA). Backends
+    sem erros e sem medições, ou sem uso há mais de explore_interval segundos,
+    passam à frente para serem medidos. Backends com o circuito aberto ficam de
+    fora até ao próximo teste.
+    """
+
+    def __init__(
+        self,
+        backends: list[LLMBackend],
+        alpha: float = 0.3,
+        explore_interval: float = 60.0,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+    ):
+        if not backends:
+            raise ValueError("É necessário pelo menos um backend LLM")
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.explore_interval = explore_interval
+        self.health = {
+            b.name: BackendHealth(
+                CircuitBreaker(
+                    failure_threshold=failure_threshold,
+                    recovery_timeout=recovery_timeout,
+                )
+            )
+            for b in self.backends
+        }
+        self.failovers = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def primary(self) -> LLMBackend:
+        return self.backends[0]
+
+    def _score(self, backend: LLMBackend, now: float) -> float:
+        health = self.health[backend.name]
+        if health.error_rate == 0 and (
+            health.ewma_latency is None
+            or now - health.last_used > self.explore_interval
+        ):
+            return 0.0
+        latency = health.ewma_latency if health.ewma_latency is not None else UNKNOWN_LATENCY
+        return latency * (1.0 + ERROR_PENALTY * health.error_rate)
+
+    def candidates(self, exclude=()) -> list[LLMBackend]:
+        """Backends disponíveis, do melhor para o pior (sem reservar nenhum)"""
+        now = time.monotonic()
+        available = [
+            b
+            for b in self.backends
+            if b not in exclude and self.health[b.name].breaker.is_available()
+        ]
+        # sorted é estável: em caso de empate mantém-se a ordem configurada
+        return sorted(available, key=lambda b: self._score(b, now))
+
+    def acquire(self, backend: LLMBackend) -> bool:
+        """Confirma o uso de um backend (pedido de teste se estiver semiaberto)"""
+        health = self.health[backend.name]
+        if not health.breaker.allow_request():
+            return False
+        health.requests += 1
+        health.last_used = time.monotonic()
+        return True
+
+    def record_success(self, backend: LLMBackend, latency: float):
+        health = self.health[backend.name]
+        health.breaker.record_success()
+        if health.ewma_latency is None:
+            health.ewma_latency = latency
+        else:
+            health.ewma_latency += self.alpha * (latency - health.ewma_latency)
+        health.error_rate *= 1.0 - self.alpha
+
+    def record_failure(self, backend: LLMBackend, error: BaseException):
+        health = self.health[backend.name]
+        # Erro do próprio pedido (ex: 400): o backend respondeu, está saudável
+        if isinstance(error, groq.APIStatusError) and not is_retryable(error):
+            health.breaker.record_success()
+            return
+        health.failures += 1
+        health.breaker.record_failure()
+        health.error_rate += self.alpha * (1.0 - health.error_rate)
+
+    def get_stats(self) -> list[dict[str, Any]]:
+        """Estado de cada backend para o /stats"""
+        stats = []
+        for backend in self.backends:
+            health = self.health[backend.name]
+            stats.append(
+                {
+                    "name": backend.name,
+                    "state": health.breaker.state,
+                    "ewma_latency_ms": (
+                        round(health.ewma_latency * 1000)
+                        if health.ewma_latency is not None
+                        else None
+                    ),
+                    "error_rate": round(health.error_rate * 100, 1),
+                    "requests": health.requests,
+                    "failures": health.failures,
+                    "times_opened": health.breaker.times_opened,
+                }
+            )
+        return stats
@@ -0,0 +1,298 @@
+"""
+LLM Scheduler - Fila global de pedidos ao modelo
+Limites de pedidos/minuto (RPM) e tokens/minuto (TPM) com token buckets,
+prioridades por comando e justiça entre utilizadores
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+# Prioridades (menor número = servido primeiro)
+PRIORITY_SIMULATION = 0  # resultado da simulação de 20 perguntas
+PRIORITY_CALCULATION = 1  # /calcular
+PRIORITY_CHAT = 2  # conversa livre
+
+PRIORITY_NAMES = {
+    PRIORITY_SIMULATION: "simulação",
+    PRIORITY_CALCULATION: "cálculo",
+    PRIORITY_CHAT: "chat livre",
+}
+
+# Limites superiores (segundos) dos intervalos do histograma de espera
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, float("inf"))
+
+
+class LLMQueueFullError(Exception):
+    """A fila de pedidos ao modelo está cheia"""
+
+
+class TokenBucket:
+    """Token bucket: capacidade por minuto, reposto continuamente"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0  # por segundo
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Segundos até haver amount disponível (0 se já houver)"""
+        self._refill()
+        # Pedidos maiores que a capacidade passam com o balde cheio
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        """Devolve (ou cobra, se negativo) a diferença para o custo real"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Ticket:
+    """Pedido na fila; é libertado com release() quando a chamada termina"""
+
+    def __init__(
+        self, scheduler: "LLMScheduler", priority: int, user_id, tokens: int
+    ):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.user_id = user_id
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+        self.released = False
+
+    def settle(self, actual_tokens: int):
+        """Acerta o bucket de TPM com os tokens realmente gastos"""
+        if self.scheduler.tpm_bucket is not None:
+            self.scheduler.tpm_bucket.refund(self.tokens - actual_tokens)
+        self.tokens = actual_tokens
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)
+
+
+class LLMScheduler:
+    """
+    Escalonador assíncrono à frente da API
+
+    Ordena os pedidos por (prioridade, ronda do utilizador, chegada): dentro
+    da mesma prioridade cada utilizador é servido à vez, pelo que quem envia
+    muitas mensagens seguidas não passa à frente dos outros.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        max_queue_size: int = 200,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm_bucket = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self.tpm_bucket = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self.max_queue_size = max_queue_size
+
+        self._heap: list[tuple] = []
+        self._seq = itertools.count()
+        self._queued_per_user: dict[Any, int] = {}
+        self._active = 0
+        self._wakeup: asyncio.TimerHandle | None = None
+
+        # Métricas
+        self.max_depth_seen = 0
+        self.rejected = 0
+        self.dispatched_by_priority = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_histogram = {b: 0 for b in WAIT_BUCKETS}
+        self.total_wait = 0.0
+
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._heap)
+
+    async def acquire(
+        self,
+        priority: int = PRIORITY_CHAT,
+        user_id=None,
+        estimated_tokens: int = 0,
+        on_queued: Callable[[int], Any] | None = None,
+    ) -> _Ticket:
+        """
+        Aguarda vez para chamar a API
+
+        Args:
+            priority: PRIORITY_SIMULATION, PRIORITY_CALCULATION ou PRIORITY_CHAT
+            user_id: Utilizador (para justiça entre utilizadores)
+            estimated_tokens: Estimativa de tokens (prompt + max_tokens)
+            on_queued: Callback opcional com a posição na fila, chamado só se
+                o pedido tiver de esperar
+
+        Returns:
+            _Ticket: chamar release() no fim (ou usar slot())
+
+        Raises:
+            LLMQueueFullError: se a fila estiver cheia
+        """
+        if len(self._heap) >= self.max_queue_size:
+            self.rejected += 1
+            raise LLMQueueFullError("Fila de pedidos ao modelo cheia")
+
+        ticket = _Ticket(self, priority, user_id, estimated_tokens)
+        user_round = self._queued_per_user.get(user_id, 0)
+        self._queued_per_user[user_id] = user_round + 1
+        heapq.heappush(self._heap, (priority, user_round, next(self._seq), ticket))
+        self.max_depth_seen = max(self.max_depth_seen, len(self._heap))
+
+        self._dispatch()
+
+        try:
+            if not ticket.future.done() and on_queued is not None:
+                try:
+                    result = on_queued(self.position(ticket))
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    self.logger.warning(f"Erro ao notificar posição na fila: {e}")
+
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Já tinha sido despachado: libertar o lugar
+                ticket.release()
+            else:
+                self._remove(ticket)
+            raise
+
+        return ticket
+
+    @asynccontextmanager
+    async def slot(self, **kwargs) -> AsyncIterator[_Ticket]:
+        """Context manager: acquire() à entrada e release() à saída"""
+        ticket = await self.acquire(**kwargs)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def position(self, ticket: _Ticket) -> int:
+        """Posição (1 = próximo) de um pedido na fila"""
+        for i, entry in enumerate(sorted(self._heap), 1):
+            if entry[3] is ticket:
+                return i
+        return 0
+
+    def _remove(self, ticket: _Ticket):
+        remaining = [entry for entry in self._heap if entry[3] is not ticket]
+        if len(remaining) != len(self._heap):
+            self._heap = remaining
+            heapq.heapify(self._heap)
+            self._decrement_user(ticket.user_id)
+        self._dispatch()
+
+    def _decrement_user(self, user_id):
+        remaining = self._queued_per_user.get(user_id, 1) - 1
+        if remaining <= 0:
+            self._queued_per_user.pop(user_id, None)
+        else:
+            self._queued_per_user[user_id] = remaining
+
+    def _release(self, ticket: _Ticket):
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Despacha pedidos enquanto houver vaga e orçamento de RPM/TPM"""
+        while self._heap and self._active < self.max_concurrency:
+            ticket = self._heap[0][3]
+            if ticket.future.done():
+                # Pedido cancelado enquanto esperava
+                heapq.heappop(self._heap)
+                self._decrement_user(ticket.user_id)
+                continue
+
+            wait = 0.0
+            if self.rpm_bucket is not None:
+                wait = max(wait, self.rpm_bucket.time_until(1))
+            if self.tpm_bucket is not None:
+                wait = max(wait, self.tpm_bucket.time_until(ticket.tokens))
+            if wait > 0:
+                self._schedule_wakeup(wait)
+                return
+
+            heapq.heappop(self._heap)
+            self._decrement_user(ticket.user_id)
+            if self.rpm_bucket is not None:
+                self.rpm_bucket.consume(1)
+            if self.tpm_bucket is not None:
+                self.tpm_bucket.consume(ticket.tokens)
+
+            self._active += 1
+            self._record_wait(ticket)
+            ticket.future.set_result(None)
+
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def _record_wait(self, ticket: _Ticket):
+        waited = time.monotonic() - ticket.enqueued_at
+        self.total_wait += waited
+        self.dispatched_by_priority[ticket.priority] = (
+            self.dispatched_by_priority.get(ticket.priority, 0) + 1
+        )
+        for bucket in WAIT_BUCKETS:
+            if waited <= bucket:
+                self.wait_histogram[bucket] += 1
+                break
+
+    def load(self) -> float:
+        """Carga atual: pedidos em curso e na fila por vaga (1.0 = cheio)"""
+        return (self._active + len(self._heap)) / self.max_concurrency
+
+    def get_stats(self) -> dict[str, Any]:
+        """Estatísticas da fila para o /stats"""
+        dispatched = sum(self.dispatched_by_priority.values())
+        return {
+            "queue_depth": len(self._heap),
+            "max_queue_depth": self.max_depth_seen,
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "rejected": self.rejected,
+            "dispatched": dispatched,
+            "dispatched_by_priority": {
+                PRIORITY_NAMES.get(p, str(p)): n
+                for p, n in self.dispatched_by_priority.items()
+            },
+            "avg_wait": round(self.total_wait / dispatched, 3) if dispatched else 0.0,
+            "wait_histogram": {
+                ("+inf" if b == float("inf") else f"≤{b}s"): n
+                for b, n in self.wait_histogram.items()
+            },
+        }
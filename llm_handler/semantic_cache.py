@@ -0,0 +1,325 @@
+"""
+Semantic Cache - Reutiliza respostas para perguntas parecidas
+Índice TF-IDF de n-gramas de caracteres, atualizado incrementalmente
+
+Apanha paráfrases que a cache exata não apanha, por exemplo
+"como funciona o IRS jovem" vs "IRS jovem como funciona?".
+"""
+
+import math
+import time
+import logging
+import sqlite3
+from collections import Counter, OrderedDict
+from typing import Any
+
+from llm_handler.response_cache import normalize_question
+
+
+def char_ngrams(text: str, n: int = 3) -> Counter:
+    """Conta os n-gramas de caracteres de cada palavra (com espaços nas pontas)"""
+    grams = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        if len(padded) <= n:
+            grams[padded] += 1
+            continue
+        for i in range(len(padded) - n + 1):
+            grams[padded[i : i + n]] += 1
+    return grams
+
+
+# Palavras que não mudam o sentido da pergunta. "nao", "sem", "nunca" e
+# "nem" ficam de fora de propósito: negam a pergunta
+STOPWORDS = frozenset(
+    "o a os as um uma uns umas de do da dos das em no na nos nas ao aos e ou "
+    "que qual quais quanto quanta como onde quando porque para pra por pelo "
+    "pela com se me eu tu voce meu minha teu tua seu sua isso isto este esta "
+    "esse essa ja la ai sobre entre mais muito ha e ser sao foi fica tem".split()
+)
+
+
+def content_tokens(text: str) -> frozenset:
+    """
+    Palavras com conteúdo de uma pergunta normalizada
+
+    Duas perguntas só são a mesma se tiverem as mesmas: "dependentes" vs
+    "independentes", "posso deduzir" vs "nao posso deduzir" ou "irs jovem"
+    vs "irs" dão n-gramas muito parecidos mas respostas diferentes. Os
+    números também contam (30000 e 35000 nunca são a mesma pergunta).
+    """
+    return frozenset(w for w in text.split() if w not in STOPWORDS)
+
+
+class SemanticCache:
+    """
+    Cache de respostas por semelhança (cosseno TF-IDF)
+
+    Cada entrada pertence a um namespace (modelo + hash do system prompt);
+    só entradas do mesmo namespace são comparadas. Acima do limiar, o acerto
+    só conta se as palavras com conteúdo (content_tokens) forem as mesmas:
+    o cosseno dos n-gramas sozinho junta perguntas de sentido oposto.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+        ngram_size: int = 3,
+    ):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.ngram_size = ngram_size
+
+        # id -> (namespace, n-gramas, palavras, resposta, instante de escrita)
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        self._postings: dict[str, set[int]] = {}  # n-grama -> ids
+        self._weights: dict[int, dict[str, float]] = {}  # vetor TF-IDF unitário
+        self._next_id = 0
+        self._docs_at_refresh = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # acima do limiar mas com palavras diferentes
+        self.evictions = 0
+
+        self.logger = logging.getLogger(__name__)
+
+    def _idf(self, gram: str) -> float:
+        df = len(self._postings.get(gram, ()))
+        return math.log((1 + len(self._entries)) / (1 + df)) + 1.0
+
+    def _vector(self, grams: Counter) -> dict[str, float]:
+        """Vetor TF-IDF normalizado (norma 1) com o IDF atual"""
+        weights = {g: tf * self._idf(g) for g, tf in grams.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {g: w / norm for g, w in weights.items()}
+
+    def _refresh_weights_if_stale(self):
+        # Os vetores guardados usam o IDF do momento em que foram indexados;
+        # recalcular só quando o número de documentos variou mais de 10%
+        n = len(self._entries)
+        tolerance = max(10, self._docs_at_refresh // 10)
+        if abs(n - self._docs_at_refresh) <= tolerance:
+            return
+        for doc_id, entry in self._entries.items():
+            self._weights[doc_id] = self._vector(entry[1])
+        self._docs_at_refresh = n
+
+    def lookup(self, namespace: tuple, question: str) -> tuple[str, float] | None:
+        """
+        Procura a resposta da pergunta mais parecida acima do limiar
+
+        Returns:
+            tuple: (resposta, semelhança) ou None se nada passar o limiar
+        """
+        match = self.best_match(namespace, question)
+        if match is None or match[1] < self.threshold:
+            self.misses += 1
+            return None
+
+        doc_id, score = match
+        self._entries.move_to_end(doc_id)
+        self.hits += 1
+        return self._entries[doc_id][3], score
+
+    def best_match(self, namespace: tuple, question: str) -> tuple[int, float] | None:
+        """Devolve (id, semelhança) da entrada mais parecida, sem limiar"""
+        normalized = normalize_question(question)
+        grams = char_ngrams(normalized, self.ngram_size)
+        if not grams or not self._entries:
+            return None
+
+        self._refresh_weights_if_stale()
+        query = self._vector(grams)
+        tokens = content_tokens(normalized)
+
+        # Produto interno acumulado através das listas invertidas
+        scores: dict[int, float] = {}
+        for gram, weight in query.items():
+            for doc_id in self._postings.get(gram, ()):
+                doc_weight = self._weights[doc_id][gram]
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc_weight
+
+        now = time.monotonic()
+        best = None
+        for doc_id, score in scores.items():
+            entry_namespace, _, entry_tokens, _, stored_at = self._entries[doc_id]
+            if entry_namespace != namespace or now - stored_at > self.ttl_seconds:
+                continue
+            if entry_tokens != tokens:
+                if score >= self.threshold:
+                    self.rejected += 1
+                continue
+            if best is None or score > best[1]:
+                best = (doc_id, min(score, 1.0))
+        return best
+
+    def add(self, namespace: tuple, question: str, response: str):
+        """Indexa uma nova pergunta/resposta (atualização incremental)"""
+        normalized = normalize_question(question)
+        grams = char_ngrams(normalized, self.ngram_size)
+        if not grams:
+            return
+
+        doc_id = self._next_id
+        self._next_id += 1
+        self._entries[doc_id] = (
+            namespace,
+            grams,
+            content_tokens(normalized),
+            response,
+            time.monotonic(),
+        )
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(doc_id)
+        self._weights[doc_id] = self._vector(grams)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, doc_id: int):
+        grams = self._entries.pop(doc_id)[1]
+        self._weights.pop(doc_id, None)
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                continue
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[gram]
+
+    def get_stats(self) -> dict[str, Any]:
+        """Estatísticas do índice semântico para o /stats"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ngrams": len(self._postings),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits * 100.0 / total, 2) if total else 0.0,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+
+def evaluate_thresholds(
+    questions: list[str], thresholds: list[float]
+) -> dict[float, float]:
+    """
+    Avaliação offline: repete as perguntas por ordem e mede a taxa de acerto
+
+    Cada pergunta é primeiro procurada no índice; se não houver acerto é
+    indexada, tal como aconteceria com uma resposta nova do modelo.
+
+    Returns:
+        dict: limiar -> taxa de acerto (%)
+    """
+    results = {}
+    for threshold in thresholds:
+        cache = SemanticCache(threshold=threshold, max_entries=len(questions) + 1)
+        for question in questions:
+            if cache.lookup(("eval",), question) is None:
+                cache.add(("eval",), question, question)
+        results[threshold] = cache.get_stats()["hit_rate"]
+    return results
+
+
+# Pares de referência (pergunta, pergunta em cache, mesma resposta?)
+REFERENCE_PAIRS = [
+    ("como funciona o IRS jovem", "IRS jovem como funciona?", True),
+    ("O que é o IRS Jovem?", "o que e o irs jovem", True),
+    ("quanto posso deduzir de saúde", "Quanto posso deduzir de saude?", True),
+    ("qual o prazo de entrega do IRS", "Qual é o prazo de entrega do IRS?", True),
+    ("como declarar rendimentos de trabalho independente", "rendimentos de trabalho independente como declarar", True),
+    ("deduções por dependentes", "deducoes dos dependentes", True),
+    ("quais as deduções com educação", "deduções com educação quais são", True),
+    ("o que é o englobamento", "o que é englobamento?", True),
+    ("deduções por dependentes", "deduções por independentes", False),
+    ("quanto posso deduzir de despesas gerais", "quanto não posso deduzir de despesas gerais", False),
+    ("posso deduzir as rendas", "não posso deduzir as rendas", False),
+    ("o que é o IRS jovem", "o que é o IRS", False),
+    ("IRS com dependentes", "IRS sem dependentes", False),
+    ("taxa de IRS para 30000 euros", "taxa de IRS para 35000 euros", False),
+    ("como declarar rendimentos de categoria A", "como declarar rendimentos de categoria B", False),
+    ("dedução de despesas de saúde", "dedução de despesas de educação", False),
+    ("prazo de entrega do IRS 2024", "prazo de entrega do IRS 2025", False),
+    ("tributação conjunta ou separada", "tributação separada", False),
+]
+
+
+def evaluate_precision(
+    pairs: list[tuple[str, str, bool]], thresholds: list[float]
+) -> dict[float, tuple[float, float]]:
+    """
+    Avaliação offline com pares anotados: cada par tem a segunda pergunta
+    em cache e procura a primeira
+
+    Returns:
+        dict: limiar -> (precisão %, cobertura %) dos acertos
+    """
+    results = {}
+    same = sum(1 for _, _, expected in pairs if expected)
+    for threshold in thresholds:
+        correct = wrong = 0
+        for question, cached, expected in pairs:
+            cache = SemanticCache(threshold=threshold)
+            cache.add(("eval",), cached, cached)
+            if cache.lookup(("eval",), question) is not None:
+                correct += expected
+                wrong += not expected
+        hits = correct + wrong
+        results[threshold] = (
+            round(correct * 100.0 / hits, 2) if hits else 100.0,
+            round(correct * 100.0 / same, 2) if same else 0.0,
+        )
+    return results
+
+
+def load_logged_questions(db_path: str = "bot_statistics.db") -> list[str]:
+    """Lê as mensagens livres registadas em user_activities, por ordem"""
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        SELECT content FROM user_activities
+        WHERE activity_type = 'message'
+        ORDER BY timestamp, id
+        """)
+        return [row[0] for row in cursor.fetchall() if row[0]]
+
+
+# Avaliação offline sobre o histórico de mensagens
+# Uso: python -m llm_handler.semantic_cache [bot_statistics.db]
+if __name__ == "__main__":
+    import sys
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "bot_statistics.db"
+    thresholds = [0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+    print("🔎 Avaliação da cache semântica")
+    print("=" * 60)
+    print(f"🏷️  Pares de referência: {len(REFERENCE_PAIRS)}")
+    for threshold, (precision, recall) in evaluate_precision(REFERENCE_PAIRS, thresholds).items():
+        print(f"   limiar {threshold:.2f}: precisão {precision:6.2f}% | cobertura {recall:6.2f}%")
+    print()
+
+    questions = load_logged_questions(db_path)
+    print(f"📨 Mensagens no histórico: {len(questions)}")
+    if not questions:
+        sys.exit(0)
+
+    seen = set()
+    exact_hits = 0
+    for question in questions:
+        key = normalize_question(question)
+        exact_hits += key in seen
+        seen.add(key)
+    print(f"🎯 Cache exata (referência): {exact_hits * 100.0 / len(questions):.2f}%\n")
+
+    for threshold, hit_rate in evaluate_thresholds(questions, thresholds).items():
+        print(f"   limiar {threshold:.2f}: {hit_rate:6.2f}% de acertos")
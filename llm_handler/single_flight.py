@@ -0,0 +1,75 @@
+"""
+Single Flight - Agrupa pedidos idênticos em curso numa só chamada
+Quando vários utilizadores enviam o mesmo prompt ao mesmo tempo, só o
+primeiro chega à API; os restantes aguardam o mesmo resultado.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+
+def request_key(model: str, messages: list, params: dict) -> str:
+    """Chave determinística de um pedido (modelo, mensagens e parâmetros)"""
+    return json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+
+class SingleFlight:
+    """Partilha uma única tarefa entre chamadas concorrentes com a mesma chave"""
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+
+        self.leaders = 0  # pedidos que chegaram de facto à API
+        self.coalesced = 0  # pedidos servidos por uma chamada já em curso
+        self.abandoned = 0  # chamadas canceladas por todos terem desistido
+
+        self.logger = logging.getLogger(__name__)
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa call() uma única vez para todos os pedidos com a mesma chave
+
+        A tarefa partilhada é protegida com shield: se um dos pedidos for
+        cancelado, os outros continuam a receber o resultado. Se todos forem
+        cancelados, a chamada à API é cancelada também.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            self.logger.debug("Pedido idêntico em curso, a aguardar o mesmo resultado")
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                self.abandoned += 1
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def get_stats(self) -> dict[str, Any]:
+        """Estatísticas de agrupamento para o /stats"""
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_requests": self.leaders,
+            "coalesced_requests": self.coalesced,
+            "abandoned": self.abandoned,
+            "coalesced_rate": round(self.coalesced * 100.0 / total, 2) if total else 0.0,
+        }
@@ -6,8 +6,34 @@ Versão 2.0.0 - Compatível com Python 3.13
 """
 
 import sys
+import asyncio
 import logging
+from telegram import Bot
+
+from config import (
+    BOT_MODE,
+    BOT_SHARDS,
+    LLM_KEEPALIVE_INTERVAL,
+    PERSISTENCE_FLUSH_INTERVAL,
+    PERSISTENCE_INTERVAL,
+    SHARD_BASE_PORT,
+    STATE_DB_PATH,
+    TELEGRAM_BASE_URL,
+    TELEGRAM_BOT_TOKEN,
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from conversation_handler import create_application
+from llm_handler.http_pool import shared_pool
+from persistence import SQLitePersistence
+from sharding import serve_sharded
+from webhook_server import serve_webhook
+
+ALLOWED_UPDATES = ["message", "callback_query"]
 
 # Configurar logging
 logging.basicConfig(
@@ -19,12 +45,63 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def aquecer_conexoes(application):
+    """Abre as conexões à API LLM antes do primeiro utilizador"""
+    # A conexão ao Telegram já foi aberta pelo initialize() (get_me)
+    pool = shared_pool()
+    await pool.warm_up()
+    pool.start_keepalive(LLM_KEEPALIVE_INTERVAL)
+
+
+async def fechar_conexoes(application):
+    """Fecha o pool de conexões LLM no fim"""
+    await shared_pool().aclose()
+
+
 def main():
     """Função principal para iniciar o bot"""
     try:
+        if BOT_MODE == "sharded":
+            # Frente + processos worker, cada um com a sua aplicação
+            if not WEBHOOK_URL or not STATE_DB_PATH:
+                raise ValueError("BOT_MODE=sharded precisa de WEBHOOK_URL e STATE_DB_PATH")
+            logger.info(f"🧩 Modo sharded: {WEBHOOK_URL}{WEBHOOK_PATH}, {BOT_SHARDS} workers")
+            asyncio.run(
+                serve_sharded(
+                    Bot(TELEGRAM_BOT_TOKEN, base_url=TELEGRAM_BASE_URL)
+                    if TELEGRAM_BASE_URL
+                    else Bot(TELEGRAM_BOT_TOKEN),
+                    webhook_url=WEBHOOK_URL,
+                    path=WEBHOOK_PATH,
+                    secret_token=WEBHOOK_SECRET,
+                    host=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    shards=BOT_SHARDS,
+                    base_port=SHARD_BASE_PORT,
+                    db_path=STATE_DB_PATH,
+                    allowed_updates=ALLOWED_UPDATES,
+                    drop_pending_updates=True,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                )
+            )
+            return
+
+        # Questionários a meio sobrevivem a um deploy (estado em SQLite)
+        persistence = None
+        if STATE_DB_PATH:
+            persistence = SQLitePersistence(
+                STATE_DB_PATH,
+                update_interval=PERSISTENCE_INTERVAL,
+                flush_interval=PERSISTENCE_FLUSH_INTERVAL,
+            )
+
         # Criar aplicação
         logger.info("🚀 Iniciando Bot Técnico Contábil Virtual...")
-        app = create_application()
+        app = create_application(
+            post_init=aquecer_conexoes,
+            post_shutdown=fechar_conexoes,
+            persistence=persistence,
+        )
 
         print("=" * 70)
         print("🤖 Bot Técnico Contábil Virtual iniciado!")
@@ -33,10 +110,30 @@ def main():
         print("=" * 70)
         print("\n✅ Bot está rodando... Pressione Ctrl+C para parar.\n")
 
+        if BOT_MODE == "webhook":
+            # Updates entregues pelo Telegram assim que chegam
+            if not WEBHOOK_URL:
+                raise ValueError("BOT_MODE=webhook precisa de WEBHOOK_URL")
+            logger.info(f"🌐 Modo webhook: {WEBHOOK_URL}{WEBHOOK_PATH}")
+            asyncio.run(
+                serve_webhook(
+                    app,
+                    webhook_url=WEBHOOK_URL,
+                    path=WEBHOOK_PATH,
+                    secret_token=WEBHOOK_SECRET,
+                    host=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    allowed_updates=ALLOWED_UPDATES,
+                    drop_pending_updates=True,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                )
+            )
+            return
+
         # Iniciar polling
         # Workaround para Python 3.13: usar run_polling() diretamente
         app.run_polling(
-            allowed_updates=["message", "callback_query"],
+            allowed_updates=ALLOWED_UPDATES,
             drop_pending_updates=True,
             poll_interval=1.0,
             timeout=10,
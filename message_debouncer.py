@@ -0,0 +1,112 @@
+"""
+Message Debouncer - Junta rajadas de mensagens seguidas de um utilizador
+Uma pergunta escrita em três mensagens rápidas vira um só pedido ao LLM.
+A janela de espera cresce com a carga da fila do modelo.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class Burst:
+    """Mensagens de um utilizador ainda sem resposta"""
+
+    def __init__(self, parts: list[str] = None):
+        self.parts: list[str] = parts or []
+        self.version = 0
+        self.flushed = False  # já enviada ao LLM, à espera da resposta
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.parts)
+
+
+class MessageDebouncer:
+    """
+    Agrupa mensagens que chegam com menos de window() segundos entre si
+
+    submit() espera pela janela: se entretanto chegar outra mensagem do mesmo
+    utilizador devolve None (a chamada mais recente trata da rajada); senão
+    devolve a rajada. Se chegar uma mensagem enquanto a rajada anterior ainda
+    espera pela resposta, as mensagens antigas passam para a nova rajada (a
+    resposta antiga é cancelada e substituída por uma que responde a tudo).
+    """
+
+    def __init__(
+        self,
+        min_window: float = 0.8,
+        max_window: float = 3.0,
+        load: Callable[[], float] = None,
+        max_parts: int = 10,
+    ):
+        self.min_window = min_window
+        self.max_window = max(min_window, max_window)
+        self.load = load
+        self.max_parts = max_parts
+        self._bursts: dict[Hashable, Burst] = {}
+
+        self.messages = 0
+        self.flushes = 0
+        self.carried = 0  # mensagens reenviadas porque chegou outra a meio
+
+        self.logger = logging.getLogger(__name__)
+
+    def window(self) -> float:
+        """Janela atual: mínima sem carga, máxima com a fila cheia"""
+        if self.load is None:
+            return self.min_window
+        load = min(1.0, max(0.0, self.load()))
+        return self.min_window + (self.max_window - self.min_window) * load
+
+    async def submit(self, key: Hashable, text: str) -> Burst | None:
+        """
+        Junta a mensagem à rajada do utilizador e espera pela janela
+
+        Returns:
+            Burst: Rajada completa para enviar ao LLM, ou None se uma
+                mensagem mais recente ficou com ela
+        """
+        self.messages += 1
+        burst = self._bursts.get(key)
+        if burst is None or burst.flushed:
+            previous = burst.parts if burst is not None else []
+            self.carried += len(previous)
+            burst = Burst(previous[-(self.max_parts - 1):] if previous else [])
+            self._bursts[key] = burst
+        burst.parts.append(text)
+        burst.version += 1
+        version = burst.version
+
+        # Rajada grande demais: envia já, sem esperar
+        if len(burst.parts) < self.max_parts:
+            await asyncio.sleep(self.window())
+        if self._bursts.get(key) is not burst or burst.version != version:
+            return None
+
+        burst.flushed = True
+        self.flushes += 1
+        if len(burst.parts) > 1:
+            self.logger.debug(f"{len(burst.parts)} mensagens juntas num só pedido")
+        return burst
+
+    def done(self, key: Hashable, burst: Burst):
+        """A rajada foi respondida: as próximas mensagens começam outra"""
+        if self._bursts.get(key) is burst:
+            del self._bursts[key]
+
+    def get_stats(self) -> dict[str, Any]:
+        """Mensagens recebidas vs pedidos ao LLM para o /stats"""
+        return {
+            "messages": self.messages,
+            "llm_requests": self.flushes,
+            "saved_requests": self.messages - self.flushes,
+            "reduction": (
+                round((1 - self.flushes / self.messages) * 100, 1) if self.messages else 0.0
+            ),
+            "carried": self.carried,
+            "pending": sum(1 for b in self._bursts.values() if not b.flushed),
+            "window": round(self.window(), 2),
+        }
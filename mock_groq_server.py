@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Servidor Mock da API Groq (compatível com OpenAI chat-completions)
+Permite testar performance do bot sem chamar a API real nem gastar tokens:
+latência com distribuição configurável, ritmo de geração de tokens, erros
+injetados e limites RPM/TPM com respostas 429 como os da Groq
+"""
+
+import sys
+import json
+import math
+import random
+import socket
+import struct
+import logging
+import argparse
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Caminhos aceites: Groq SDK usa /openai/v1, clientes OpenAI usam /v1
+CHAT_COMPLETIONS_PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions")
+MODELS_PATHS = ("/openai/v1/models", "/v1/models")
+
+
+class LatencyDistribution:
+    """
+    Distribuição das latências simuladas (segundos)
+
+    Especificações aceites por parse():
+        0.5 ou "fixed:0.5"       sempre 0.5s
+        "uniform:0.2,1.0"        uniforme entre 0.2s e 1.0s
+        "normal:0.5,0.1"         normal com média 0.5s e desvio 0.1s
+        "lognormal:0.5,0.6"      log-normal com mediana 0.5s e sigma 0.6
+                                 (cauda longa, parecida com APIs reais)
+        "exp:0.5"                exponencial com média 0.5s
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exp")
+
+    def __init__(self, kind: str = "fixed", a: float = 0.5, b: float = 0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Distribuição desconhecida: {kind} (usar {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec) -> "LatencyDistribution":
+        """Cria a distribuição a partir de um número ou de tipo:a,b"""
+        if isinstance(spec, LatencyDistribution):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec))
+        kind, _, args = str(spec).partition(":")
+        if not args:
+            return cls("fixed", float(kind))
+        values = [float(v) for v in args.split(",")]
+        return cls(kind, values[0], values[1] if len(values) > 1 else 0.0)
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            value = random.uniform(self.a, self.b)
+        elif self.kind == "normal":
+            value = random.gauss(self.a, self.b)
+        elif self.kind == "lognormal":
+            value = random.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        elif self.kind == "exp":
+            value = random.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        else:
+            value = self.a
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        if self.kind == "fixed":
+            return f"fixed:{self.a}"
+        if self.kind == "exp":
+            return f"exp:{self.a}"
+        return f"{self.kind}:{self.a},{self.b}"
+
+
+class RateLimiter:
+    """
+    Limites por minuto do mock (janela deslizante de 60s), como a Groq:
+    pedido recusado com 429, Retry-After e cabeçalhos x-ratelimit-*
+    """
+
+    def __init__(self, rpm_limit: int = 0, tpm_limit: int = 0):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self._window: deque[tuple[float, int]] = deque()  # (instante, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> tuple[float, dict[str, str]]:
+        """
+        Regista um pedido se houver orçamento
+
+        Returns:
+            (segundos a esperar, 0 se aceite; cabeçalhos x-ratelimit-*)
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= 60.0:
+                self._tokens -= self._window.popleft()[1]
+
+            wait = 0.0
+            if self.rpm_limit and len(self._window) >= self.rpm_limit:
+                wait = 60.0 - (now - self._window[0][0])
+            if self.tpm_limit and self._window and self._tokens + tokens > self.tpm_limit:
+                # Esperar até saírem da janela tokens suficientes
+                freed = 0
+                for started, used in self._window:
+                    freed += used
+                    if self._tokens - freed + tokens <= self.tpm_limit:
+                        wait = max(wait, 60.0 - (now - started))
+                        break
+            if not wait:
+                self._window.append((now, tokens))
+                self._tokens += tokens
+
+            headers = {}
+            if self.rpm_limit:
+                headers["x-ratelimit-limit-requests"] = str(self.rpm_limit)
+                headers["x-ratelimit-remaining-requests"] = str(
+                    max(0, self.rpm_limit - len(self._window))
+                )
+            if self.tpm_limit:
+                headers["x-ratelimit-limit-tokens"] = str(self.tpm_limit)
+                headers["x-ratelimit-remaining-tokens"] = str(
+                    max(0, self.tpm_limit - self._tokens)
+                )
+            return max(0.0, wait), headers
+
+
+class MockGroqRequestHandler(BaseHTTPRequestHandler):
+    """Responde a pedidos chat-completions com latência simulada"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("mock: " + format % args)
+
+    def do_GET(self):
+        # Lista de modelos: usada no aquecimento e nos pings de keep-alive
+        if self.path not in MODELS_PATHS:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        self._send_json(
+            200,
+            {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]},
+        )
+
+    def do_POST(self):
+        if self.path not in CHAT_COMPLETIONS_PATHS:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+        tokens = self._reply_tokens(body)
+
+        # Limites RPM/TPM e 429 aleatórios: recusados logo, sem latência
+        wait, headers = server.rate_limiter.acquire(prompt_chars // 4 + len(tokens))
+        if not wait and random.random() < server.rate_limit_rate:
+            wait = server.retry_after
+        if wait:
+            server.count("rate_limited")
+            headers["Retry-After"] = f"{wait:.2f}"
+            self._send_json(
+                429,
+                {"error": {"message": "mock: rate limit", "type": "rate_limit_exceeded"}},
+                headers=headers,
+            )
+            return
+
+        # Simular tempo até ao primeiro token (alguns pedidos ficam na cauda lenta)
+        time.sleep(server.prompt_token_interval * prompt_chars / 4)
+        if random.random() < server.slow_rate:
+            time.sleep(server.slow_latency)
+        else:
+            time.sleep(server.latency.sample())
+        server.count("requests_served")
+
+        # Falhas injetadas (testes de retry e circuit breaker)
+        sorteio = random.random()
+        if sorteio < server.error_rate:
+            server.count("errors_injected")
+            self._send_json(500, {"error": {"message": "mock: erro interno"}})
+            return
+        drop = sorteio < server.error_rate + server.disconnect_rate
+        if drop and not body.get("stream"):
+            self._drop_connection()
+            return
+
+        if body.get("stream"):
+            self._send_stream(body, tokens, drop_after=len(tokens) // 2 if drop else None)
+            return
+
+        # Resposta completa: simular também o tempo de geração dos tokens
+        time.sleep(server.token_interval * len(tokens))
+
+        content = " ".join(tokens)
+        self._send_json(
+            200,
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_chars // 4 + len(tokens),
+                },
+            },
+            headers=headers,
+        )
+
+    def _reply_tokens(self, body: dict) -> list[str]:
+        """Palavras da resposta (uma por token), limitadas ao max_tokens pedido"""
+        words = self.server.reply_text.split(" ")
+        count = self.server.completion_tokens or len(words)
+        if body.get("max_tokens"):
+            count = min(count, int(body["max_tokens"]))
+        return [words[i % len(words)] for i in range(max(1, count))]
+
+    def _drop_connection(self):
+        """Corta a ligação com RST, sem resposta (ou a meio do stream)"""
+        self.server.count("disconnects")
+        self.close_connection = True
+        try:
+            self.wfile.flush()
+            # SO_LINGER a 0: o close envia RST em vez de um fim normal (FIN)
+            self.connection.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+            )
+            self.connection.close()
+        except OSError:
+            pass
+
+    def _send_stream(self, body: dict, tokens: list[str], drop_after: int = None):
+        """Envia a resposta em Server-Sent Events, um token de cada vez"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for i, token in enumerate(tokens):
+            if i == drop_after:
+                self._drop_connection()
+                return
+            delta = {"content": token if i == 0 else " " + token}
+            self._send_event(completion_id, body, delta, None)
+            time.sleep(self.server.token_interval)
+        self._send_event(completion_id, body, {}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, completion_id: str, body: dict, delta: dict, finish_reason):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockGroqServer(ThreadingHTTPServer):
+    """Servidor HTTP local que imita o endpoint chat-completions da Groq"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float | str | LatencyDistribution = 0.5,
+        token_interval: float = 0.0,
+        reply_text: str = "Olá! Sou a Marinete (mock).",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 2.0,
+        prompt_token_interval: float = 0.0,
+        tokens_per_second: float = 0.0,
+        completion_tokens: int = 0,
+        disconnect_rate: float = 0.0,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+    ):
+        super().__init__((host, port), MockGroqRequestHandler)
+        # latency: tempo até ao primeiro token, número ou distribuição (ver
+        # LatencyDistribution); token_interval: tempo por token gerado
+        self.latency = LatencyDistribution.parse(latency)
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second else token_interval
+        # prompt_token_interval: tempo de leitura de cada token do prompt
+        self.prompt_token_interval = prompt_token_interval
+        # Resposta: reply_text, repetido até completion_tokens palavras se > 0
+        self.reply_text = reply_text
+        self.completion_tokens = completion_tokens
+        # Fração de pedidos que falha com 500, com 429 (+ Retry-After) e que
+        # perde a ligação (sem resposta, ou a meio do stream)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.disconnect_rate = disconnect_rate
+        # Limites por minuto da "conta" (0 = sem limite)
+        self.rate_limiter = RateLimiter(rpm_limit, tpm_limit)
+        # Fração de pedidos com latência slow_latency em vez de latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.rate_limited = 0
+        self.disconnects = 0
+        self._counters_lock = threading.Lock()
+        self._thread = None
+
+    def count(self, counter: str):
+        """Incrementa um contador (os pedidos correm em threads)"""
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_stats(self) -> dict:
+        """Configuração e contadores do mock"""
+        return {
+            "latency": str(self.latency),
+            "token_interval": self.token_interval,
+            "requests_served": self.requests_served,
+            "errors_injected": self.errors_injected,
+            "rate_limited": self.rate_limited,
+            "disconnects": self.disconnects,
+        }
+
+    def handle_error(self, request, client_address):
+        # Cliente que desistiu do pedido (ex: hedging cancela o perdedor)
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            logger.debug(f"mock: cliente {client_address} fechou a ligação")
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        """URL base para passar ao cliente Groq (GROQ_BASE_URL)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockGroqServer":
+        """Inicia o servidor numa thread em background"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Mock Groq a correr em {self.base_url}")
+        return self
+
+    def stop(self):
+        """Para o servidor e liberta a porta"""
+        self.shutdown()
+        self.server_close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor mock da API Groq")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latencia",
+        default="0.5",
+        help="tempo até ao primeiro token: 0.5, uniform:0.2,1, normal:0.5,0.1, "
+        "lognormal:0.5,0.6 ou exp:0.5",
+    )
+    parser.add_argument("--tokens-por-segundo", type=float, default=0.0)
+    parser.add_argument(
+        "--tokens-resposta", type=int, default=0, help="palavras por resposta (0 = texto fixo)"
+    )
+    parser.add_argument("--erros", type=float, default=0.0, help="fração de erros 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fração de 429 aleatórios")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--desconexoes", type=float, default=0.0, help="fração de ligações cortadas")
+    parser.add_argument("--rpm", type=int, default=0, help="pedidos por minuto (0 = sem limite)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens por minuto (0 = sem limite)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    args = parse_args()
+    server = MockGroqServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latencia,
+        tokens_per_second=args.tokens_por_segundo,
+        completion_tokens=args.tokens_resposta,
+        error_rate=args.erros,
+        rate_limit_rate=args.rate_limit,
+        retry_after=args.retry_after,
+        disconnect_rate=args.desconexoes,
+        rpm_limit=args.rpm,
+        tpm_limit=args.tpm,
+    )
+    print(f"🧪 Mock Groq em {server.base_url} (Ctrl+C para parar)")
+    print(f"   Latência: {server.latency} | RPM: {args.rpm or '-'} | TPM: {args.tpm or '-'}")
+    print(f"   Exporta GROQ_BASE_URL={server.base_url} para usar com o bot")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
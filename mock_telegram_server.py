@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Servidor Mock da Bot API do Telegram
+Entrega updates sintéticos por getUpdates (long polling) ou por webhook,
+como o Telegram, para medir o bot sem rede nem conta real
+"""
+
+import json
+import queue
+import logging
+import threading
+import time
+import http.client
+from urllib.parse import parse_qsl, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Marinete", "username": "marinete_mock_bot"}
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    """Update de uma mensagem privada (comandos com a entidade bot_command)"""
+    update = {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Teste"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Teste"},
+            "text": text,
+        },
+    }
+    if text.startswith("/"):
+        command = text.split(" ", 1)[0]
+        update["message"]["entities"] = [
+            {"type": "bot_command", "offset": 0, "length": len(command)}
+        ]
+    return update
+
+
+class MockTelegramRequestHandler(BaseHTTPRequestHandler):
+    """Responde aos métodos da Bot API usados pelo bot"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("mock telegram: " + format % args)
+
+    def do_POST(self):
+        # /bot<token>/<método>
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        params = self._read_params()
+        server = self.server
+        server.count(method)
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "getUpdates":
+            result = server.wait_updates(
+                int(params.get("offset") or 0),
+                float(params.get("timeout") or 0),
+                int(params.get("limit") or 100),
+            )
+        elif method == "setWebhook":
+            server.set_webhook(
+                params.get("url", ""),
+                params.get("secret_token", ""),
+                int(params.get("max_connections") or 40),
+            )
+            result = True
+        elif method == "deleteWebhook":
+            server.set_webhook("", "", 0)
+            result = True
+        elif method in ("sendMessage", "editMessageText"):
+            result = server.record_message(params)
+        else:
+            result = True
+        self._send_json({"ok": True, "result": result})
+
+    do_GET = do_POST
+
+    def _read_params(self) -> dict:
+        """Parâmetros em JSON ou form-urlencoded (valores JSON, como o PTB envia)"""
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        query = urlsplit(self.path).query
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or b"{}")
+        params = {}
+        for key, value in parse_qsl(raw.decode("utf-8") + "&" + query):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    def _send_json(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockTelegramServer(ThreadingHTTPServer):
+    """
+    Bot API local: push_message() cria um update que é entregue ao bot pelo
+    próximo getUpdates ou enviado logo ao webhook registado com setWebhook
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, on_message=None):
+        super().__init__((host, port), MockTelegramRequestHandler)
+        # on_message(params): chamado a cada sendMessage/editMessageText
+        self.on_message = on_message
+        self._updates: list[dict] = []
+        self._next_update_id = 1
+        self._cond = threading.Condition()
+        self.pushed_at: dict[int, float] = {}  # update_id -> instante do envio
+        self.sent_messages: list[dict] = []
+        self.calls: dict[str, int] = {}
+
+        self.webhook_url = ""
+        self.webhook_secret = ""
+        self._webhook_queue: queue.Queue = queue.Queue()
+        self._webhook_threads: list[threading.Thread] = []
+        self.webhook_failures = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """URL base para o ApplicationBuilder().base_url() (com /bot)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def count(self, method: str):
+        with self._cond:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def push_message(self, user_id: int, text: str) -> int:
+        """Cria um update de mensagem privada e devolve o update_id"""
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            update = message_update(update_id, user_id, text)
+            self.pushed_at[update_id] = time.perf_counter()
+            if self.webhook_url:
+                self._webhook_queue.put(update)
+            else:
+                self._updates.append(update)
+                self._cond.notify_all()
+        return update_id
+
+    def wait_updates(self, offset: int, timeout: float, limit: int) -> list[dict]:
+        """getUpdates: confirma os anteriores a offset e espera por novos"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if offset:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._updates[:limit]
+
+    def set_webhook(self, url: str, secret: str, max_connections: int):
+        """Ativa (ou desativa, com url vazio) a entrega por webhook"""
+        self.webhook_url = url
+        self.webhook_secret = secret
+        missing = min(max_connections, 8) - len(self._webhook_threads)
+        for _ in range(max(0, missing) if url else 0):
+            thread = threading.Thread(target=self._deliver, daemon=True)
+            thread.start()
+            self._webhook_threads.append(thread)
+
+    def _deliver(self):
+        """Envia updates ao webhook numa ligação keep-alive, como o Telegram"""
+        connection = None
+        while True:
+            update = self._webhook_queue.get()
+            if update is None:
+                return
+            url = urlsplit(self.webhook_url)
+            body = json.dumps(update).encode("utf-8")
+            for _ in range(2):  # uma nova tentativa se a ligação caiu
+                try:
+                    if connection is None:
+                        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+                    connection.request(
+                        "POST",
+                        url.path or "/",
+                        body,
+                        {
+                            "Content-Type": "application/json",
+                            "X-Telegram-Bot-Api-Secret-Token": self.webhook_secret,
+                        },
+                    )
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        self.webhook_failures += 1
+                    break
+                except (OSError, http.client.HTTPException):
+                    connection = None
+            else:
+                self.webhook_failures += 1
+
+    def record_message(self, params: dict) -> dict:
+        """sendMessage/editMessageText: guarda e devolve a mensagem"""
+        with self._cond:
+            self.sent_messages.append(params)
+            message_id = len(self.sent_messages)
+        if self.on_message:
+            self.on_message(params)
+        return {
+            "message_id": params.get("message_id") or message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            "from": BOT_USER,
+            "text": str(params.get("text", "")),
+        }
+
+    def start(self) -> "MockTelegramServer":
+        """Inicia o servidor numa thread em background"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Mock Telegram a correr em {self.base_url}")
+        return self
+
+    def stop(self):
+        """Para o servidor, os envios ao webhook e liberta a porta"""
+        for _ in self._webhook_threads:
+            self._webhook_queue.put(None)
+        with self._cond:
+            self._cond.notify_all()
+        self.shutdown()
+        self.server_close()
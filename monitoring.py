@@ -8,6 +8,7 @@ import logging
 from datetime import datetime
 from typing import Any
 
+from config import LLM_PRICE_INPUT_PER_MTOK, LLM_PRICE_OUTPUT_PER_MTOK
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +60,34 @@ class BotMonitoring:
                 )
                 """)
 
+                # Tabela de consumo de tokens LLM (uma linha por chamada)
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_usage (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    command TEXT,        -- comando de origem ou perfil
+                    model TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    latency_ms INTEGER,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                """)
+                # Chamadas LLM canceladas a meio e tokens de resposta poupados
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cancellations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    command TEXT,
+                    saved_tokens INTEGER,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                """)
+                cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_llm_usage_user_time
+                ON llm_usage (user_id, timestamp)
+                """)
+
                 # Inicializar contadores básicos se não existirem
                 cursor.execute("""
                 INSERT OR IGNORE INTO statistics (key, value) VALUES
@@ -183,6 +212,160 @@ class BotMonitoring:
         except Exception as e:
             logger.error(f"❌ Erro ao registrar simulação completada: {e}")
 
+    def register_llm_usage(
+        self,
+        user_id: int | None,
+        command: str | None,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+    ):
+        """Registra os tokens e a latência de uma chamada ao LLM"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    """
+                INSERT INTO llm_usage
+                    (user_id, command, model, prompt_tokens, completion_tokens, latency_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                    (
+                        user_id,
+                        command,
+                        model,
+                        prompt_tokens,
+                        completion_tokens,
+                        round(latency * 1000),
+                    ),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Erro ao registrar consumo LLM: {e}")
+
+    def register_llm_cancellation(
+        self, user_id: int | None, command: str | None, saved_tokens: int
+    ):
+        """Registra uma chamada LLM cancelada e os tokens poupados"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    """
+                INSERT INTO llm_cancellations (user_id, command, saved_tokens)
+                VALUES (?, ?, ?)
+                """,
+                    (user_id, command, saved_tokens),
+                )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Erro ao registrar cancelamento LLM: {e}")
+
+    def get_cancellation_stats(self) -> tuple[int, int]:
+        """Retorna (chamadas canceladas, tokens de resposta poupados)"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(saved_tokens), 0) FROM llm_cancellations"
+                )
+                return cursor.fetchone()
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter cancelamentos: {e}")
+            return 0, 0
+
+    def get_tokens_today(self, user_id: int) -> int:
+        """Tokens gastos hoje por um usuário (para a quota diária)"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)
+                FROM llm_usage
+                WHERE user_id = ? AND timestamp >= DATE('now')
+                """,
+                    (user_id,),
+                )
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter tokens de hoje: {e}")
+            return 0
+
+    @staticmethod
+    def token_cost(prompt_tokens: int, completion_tokens: int) -> float:
+        """Custo estimado (USD) a partir dos preços por milhão de tokens"""
+        return (
+            prompt_tokens * LLM_PRICE_INPUT_PER_MTOK
+            + completion_tokens * LLM_PRICE_OUTPUT_PER_MTOK
+        ) / 1_000_000
+
+    def get_top_token_consumers(self, limit: int = 10) -> list[tuple[Any, ...]]:
+        """Retorna os usuários que mais tokens consumiram"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                SELECT l.user_id, COALESCE(u.first_name, 'N/A') as first_name,
+                       SUM(l.prompt_tokens) as prompt_tokens,
+                       SUM(l.completion_tokens) as completion_tokens,
+                       COUNT(*) as calls
+                FROM llm_usage l
+                LEFT JOIN users u ON u.user_id = l.user_id
+                GROUP BY l.user_id
+                ORDER BY SUM(l.prompt_tokens + l.completion_tokens) DESC
+                LIMIT ?
+                """,
+                    (limit,),
+                )
+                return cursor.fetchall()
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter top consumidores: {e}")
+            return []
+
+    def get_token_usage_by_command(self) -> list[tuple[Any, ...]]:
+        """Retorna tokens, chamadas e latência média por comando"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                SELECT COALESCE(command, 'N/A'), COUNT(*),
+                       SUM(prompt_tokens), SUM(completion_tokens),
+                       ROUND(AVG(latency_ms))
+                FROM llm_usage
+                GROUP BY command
+                ORDER BY SUM(prompt_tokens + completion_tokens) DESC
+                """)
+                return cursor.fetchall()
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter consumo por comando: {e}")
+            return []
+
+    def get_cost_per_simulation(self) -> float:
+        """Custo médio (USD) em tokens de cada simulação completada"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                SELECT COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0)
+                FROM llm_usage WHERE command = '/simular'
+                """)
+                prompt_tokens, completion_tokens = cursor.fetchone()
+                cursor.execute(
+                    "SELECT value FROM statistics WHERE key = 'completed_simulations'"
+                )
+                row = cursor.fetchone()
+                completed = row[0] if row else 0
+                if not completed:
+                    return 0.0
+                return self.token_cost(prompt_tokens, completion_tokens) / completed
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao calcular custo por simulação: {e}")
+            return 0.0
+
     def get_engagement_metrics(self) -> dict[str, float]:
         """Retorna métricas de engagement para showcase"""
         try:
@@ -584,6 +767,253 @@ class BotMonitoring:
             logger.error(f"❌ Erro ao gerar relatório: {e}")
             return "❌ Erro ao gerar relatório de estatísticas."
 
+    def _token_report(self, quota: dict[str, Any]) -> str:
+        """Secção de consumo de tokens e custos do relatório LLM"""
+        by_command = self.get_token_usage_by_command()
+        top_consumers = self.get_top_token_consumers(5)
+
+        report = "\n🪙 **CONSUMO DE TOKENS:**\n"
+        total_prompt = sum(row[2] or 0 for row in by_command)
+        total_completion = sum(row[3] or 0 for row in by_command)
+        report += (
+            f"• Total: {total_prompt + total_completion} tokens "
+            f"({total_prompt} prompt + {total_completion} resposta) | "
+            f"custo ${self.token_cost(total_prompt, total_completion):.4f}\n"
+        )
+        report += f"• Custo por simulação completada: ${self.get_cost_per_simulation():.4f}\n"
+        for command, calls, prompt_tokens, completion_tokens, latency in by_command:
+            report += (
+                f"• {command}: {calls} chamadas, "
+                f"{(prompt_tokens or 0) + (completion_tokens or 0)} tokens, "
+                f"{int(latency or 0)}ms em média\n"
+            )
+        cancelled, saved_tokens = self.get_cancellation_stats()
+        if cancelled:
+            report += (
+                f"• Canceladas a meio: {cancelled} chamadas, ~{saved_tokens} tokens poupados "
+                f"(${self.token_cost(0, saved_tokens):.4f})\n"
+            )
+        if quota:
+            limite = quota.get("daily_limit") or "sem limite"
+            report += (
+                f"• Quota diária: {limite} | Hoje: {quota.get('tokens_today', 0)} tokens "
+                f"de {quota.get('users_today', 0)} usuários | Recusados: {quota.get('denied', 0)}\n"
+            )
+
+        if top_consumers:
+            report += "\n💸 **TOP CONSUMIDORES DE TOKENS:**\n"
+            for i, (user_id, first_name, prompt_tokens, completion_tokens, calls) in enumerate(
+                top_consumers, 1
+            ):
+                report += (
+                    f"{i}. {first_name} ({user_id}) - {prompt_tokens + completion_tokens} tokens, "
+                    f"{calls} chamadas (${self.token_cost(prompt_tokens, completion_tokens):.4f})\n"
+                )
+        return report
+
+    def generate_llm_report(self, llm_stats: dict[str, Any]) -> str:
+        """Gera relatório de performance da camada LLM (métricas em memória)"""
+        try:
+            report = "⚡ **PERFORMANCE LLM**\n\n"
+
+            cache = llm_stats.get("cache", {})
+            report += "🗄️ **CACHE DE RESPOSTAS:**\n"
+            report += f"• Acertos: {cache.get('hits', 0)} | Falhas: {cache.get('misses', 0)}\n"
+            report += f"• Taxa de acerto: {cache.get('hit_rate', 0)}%\n"
+            report += f"• Entradas: {cache.get('entries', 0)}/{cache.get('max_entries', 0)}\n"
+            report += f"• Removidas (LRU): {cache.get('evictions', 0)} | Expiradas: {cache.get('expirations', 0)}\n"
+
+            semantic = llm_stats.get("semantic_cache", {})
+            if semantic:
+                report += "\n🔎 **CACHE SEMÂNTICA (perguntas parecidas):**\n"
+                report += f"• Acertos: {semantic.get('hits', 0)} | Falhas: {semantic.get('misses', 0)}\n"
+                report += f"• Taxa de acerto: {semantic.get('hit_rate', 0)}% (limiar {semantic.get('threshold', 0)})\n"
+                report += (
+                    f"• Perguntas indexadas: {semantic.get('entries', 0)} | "
+                    f"Recusadas (palavras diferentes): {semantic.get('rejected', 0)}\n"
+                )
+
+            single_flight = llm_stats.get("single_flight", {})
+            report += "\n🔗 **PEDIDOS AGRUPADOS (idênticos em simultâneo):**\n"
+            report += f"• Chamadas à API: {single_flight.get('upstream_requests', 0)}\n"
+            report += f"• Pedidos agrupados: {single_flight.get('coalesced_requests', 0)} ({single_flight.get('coalesced_rate', 0)}%)\n"
+
+            scheduler = llm_stats.get("scheduler", {})
+            report += "\n🚦 **FILA LLM:**\n"
+            report += f"• Na fila: {scheduler.get('queue_depth', 0)} (máx. {scheduler.get('max_queue_depth', 0)}) | Em curso: {scheduler.get('active', 0)}/{scheduler.get('max_concurrency', 0)}\n"
+            report += f"• Espera média: {scheduler.get('avg_wait', 0)}s | Recusados: {scheduler.get('rejected', 0)}\n"
+            for name, count in scheduler.get("dispatched_by_priority", {}).items():
+                report += f"• {name}: {count} pedidos\n"
+            histogram = scheduler.get("wait_histogram", {})
+            if histogram:
+                report += "• Espera: " + ", ".join(
+                    f"{bucket}: {count}" for bucket, count in histogram.items() if count
+                ) + "\n"
+
+            shedding = llm_stats.get("shedding", {})
+            if shedding:
+                fila = shedding.get("queue_threshold") or "desligado"
+                latencia = shedding.get("latency_threshold") or "desligado"
+                p90 = shedding.get("recent_p90_ms")
+                estado = shedding.get("overloaded")
+                report += "\n🧯 **LOAD SHEDDING (respostas locais sob sobrecarga):**\n"
+                report += (
+                    f"• Estado: {'SOBRECARGA - ' + estado if estado else 'normal'} "
+                    f"(ativado {shedding.get('times_overloaded', 0)}x)\n"
+                )
+                report += (
+                    f"• Limites: fila {fila} | p90 {latencia}s "
+                    f"(atual: {f'{p90}ms' if p90 is not None else 'sem dados'})\n"
+                )
+                recusados = ", ".join(
+                    f"{name}: {count}" for name, count in shedding.get("shed", {}).items()
+                )
+                report += (
+                    f"• Recusados: {recusados or 'nenhum'} | "
+                    f"Respondidos pela cache: {shedding.get('served_from_cache', 0)}\n"
+                )
+
+            updates = llm_stats.get("updates", {})
+            if updates:
+                report += "\n📥 **UPDATES DO TELEGRAM (paralelo por utilizador):**\n"
+                report += (
+                    f"• Em curso: {updates.get('active', 0)}/{updates.get('max_concurrency', 0)} "
+                    f"(máx. {updates.get('max_active', 0)}) | Utilizadores com updates: "
+                    f"{updates.get('users_pending', 0)}\n"
+                )
+                report += (
+                    f"• Tratados: {updates.get('processed', 0)} | À espera do anterior do "
+                    f"mesmo utilizador: {updates.get('waited_for_user', 0)} | "
+                    f"Espera média: {updates.get('avg_wait_ms', 0)}ms\n"
+                )
+
+            persistence = llm_stats.get("persistence", {})
+            if persistence:
+                flush = persistence.get("flush", {})
+                report += "\n💾 **ESTADO DAS CONVERSAS (SQLite, write-behind):**\n"
+                report += (
+                    f"• Escritas: {persistence.get('writes', 0)} → {persistence.get('rows_written', 0)} "
+                    f"linhas em {persistence.get('flushes', 0)} transações | Pendentes: "
+                    f"{persistence.get('pending', 0)}\n"
+                )
+                report += (
+                    f"• Gravação a cada {persistence.get('flush_interval', 0)}s: p50 "
+                    f"{flush.get('p50_ms', 0)}ms, p99 {flush.get('p99_ms', 0)}ms | Erros: "
+                    f"{persistence.get('errors', 0)}\n"
+                )
+
+            debounce = llm_stats.get("debounce", {})
+            if debounce:
+                report += "\n🧩 **MENSAGENS AGRUPADAS (debounce):**\n"
+                report += (
+                    f"• {debounce.get('messages', 0)} mensagens → {debounce.get('llm_requests', 0)} pedidos ao LLM "
+                    f"(-{debounce.get('reduction', 0)}%)\n"
+                )
+                report += f"• Janela atual: {debounce.get('window', 0)}s | Reenviadas: {debounce.get('carried', 0)}\n"
+
+            in_flight = llm_stats.get("in_flight", {})
+            cancellations = llm_stats.get("cancellations", {})
+            if in_flight or cancellations:
+                motivos = ", ".join(
+                    f"{motivo}: {n}" for motivo, n in in_flight.get("cancelled", {}).items()
+                )
+                report += "\n✋ **CANCELAMENTOS:**\n"
+                report += f"• Tarefas em curso: {in_flight.get('in_flight', 0)} | Canceladas: {motivos or 'nenhuma'}\n"
+                report += (
+                    f"• Chamadas à API interrompidas: {cancellations.get('cancelled', 0)} "
+                    f"(~{cancellations.get('tokens_saved', 0)} tokens poupados)\n"
+                )
+
+            resilience = llm_stats.get("resilience", {})
+            if resilience:
+                report += "\n🛡️ **RESILIÊNCIA API:**\n"
+                report += f"• Repetições: {resilience.get('retries', 0)} | Failovers: {resilience.get('failovers', 0)}\n"
+
+            providers = llm_stats.get("providers", [])
+            if providers:
+                report += "\n🔀 **BACKENDS LLM:**\n"
+                for backend in providers:
+                    latencia = backend.get("ewma_latency_ms")
+                    latencia = f"{latencia}ms" if latencia is not None else "sem dados"
+                    report += (
+                        f"• {backend.get('name')}: {backend.get('state')} | {latencia} | "
+                        f"erros {backend.get('error_rate', 0)}% | "
+                        f"{backend.get('requests', 0)} pedidos (aberto {backend.get('times_opened', 0)}x)\n"
+                    )
+
+            hedging = llm_stats.get("hedging", {})
+            if hedging:
+                sem = hedging.get("without_hedging", {})
+                com = hedging.get("with_hedging", {})
+                estado = "ativo" if hedging.get("enabled") else "desligado"
+                report += f"\n⏱️ **LATÊNCIA API (hedging {estado}):**\n"
+                report += f"• Por chamada: p50 {sem.get('p50_ms')}ms | p99 {sem.get('p99_ms')}ms\n"
+                report += f"• Efetiva: p50 {com.get('p50_ms')}ms | p99 {com.get('p99_ms')}ms\n"
+                report += f"• Duplicados: {hedging.get('hedges', 0)}/{hedging.get('requests', 0)} (ganharam {hedging.get('hedge_wins', 0)}, recusados pelo orçamento {hedging.get('budget_denied', 0)})\n"
+
+            report += self._token_report(llm_stats.get("quota", {}))
+
+            http_pool = llm_stats.get("http_pool", {})
+            if http_pool:
+                versao = "HTTP/2" if http_pool.get("http2") else "HTTP/1.1"
+                aquecimento = http_pool.get("warm_up_ms")
+                report += f"\n🔌 **CONEXÕES HTTP ({versao}):**\n"
+                report += f"• Reutilização: {http_pool.get('reuse_rate', 0)}% ({http_pool.get('reused', 0)}/{http_pool.get('requests', 0)} pedidos)\n"
+                report += f"• Conexões novas: {http_pool.get('new_connections', 0)} | Handshakes TLS: {http_pool.get('tls_handshakes', 0)}\n"
+                report += (
+                    f"• Aquecimento: {f'{aquecimento}ms' if aquecimento is not None else 'não feito'} | "
+                    f"Pings: {http_pool.get('pings', 0)} (falhas {http_pool.get('ping_failures', 0)})\n"
+                )
+
+            memory = llm_stats.get("memory", {})
+            if memory:
+                report += "\n🧠 **MEMÓRIA DA CONVERSA:**\n"
+                report += (
+                    f"• Utilizadores: {memory.get('users', 0)}/{memory.get('max_users', 0)} | "
+                    f"Mensagens: {memory.get('messages', 0)} | Com resumo: {memory.get('with_summary', 0)}\n"
+                )
+                report += f"• Tamanho: ~{memory.get('tokens', 0)} tokens ({memory.get('bytes', 0) / 1024:.1f} KB)\n"
+                report += (
+                    f"• Esquecidos por inatividade: {memory.get('evicted_idle', 0)} | "
+                    f"por limite: {memory.get('evicted_lru', 0)}\n"
+                )
+                report += f"• Resumos: {memory.get('summaries', 0)} (falhas {memory.get('summary_failures', 0)})\n"
+
+            sessions = llm_stats.get("sessions", {})
+            if sessions:
+                report += "\n🧹 **SESSÕES EM MEMÓRIA:**\n"
+                report += (
+                    f"• Utilizadores: {sessions.get('users', 0)}/{sessions.get('max_users', 0)} | "
+                    f"Esquecidos após {sessions.get('idle_ttl', 0) / 60:.0f}min: "
+                    f"{sessions.get('evicted_idle', 0)} | por limite: {sessions.get('evicted_lru', 0)}\n"
+                )
+                report += (
+                    f"• Limpezas: {sessions.get('sweeps', 0)} "
+                    f"(última {sessions.get('last_sweep_ms', 0)}ms) | "
+                    f"Adiadas (tarefa em curso): {sessions.get('skipped_busy', 0)}\n"
+                )
+                for name, structure in sessions.get("structures", {}).items():
+                    report += (
+                        f"• {name}: {structure.get('entries', 0)} entradas "
+                        f"({structure.get('bytes', 0) / 1024:.1f} KB)\n"
+                    )
+
+            profiles = llm_stats.get("profiles", {})
+            if profiles:
+                report += "\n🎛️ **PERFIS DE MODELO:**\n"
+                for name, profile in profiles.items():
+                    report += (
+                        f"• {name} ({profile.get('model') or 'modelo principal'}): {profile.get('requests', 0)} pedidos | "
+                        f"p50 {profile.get('p50_ms')}ms, p90 {profile.get('p90_ms')}ms | "
+                        f"tokens médios {profile.get('avg_prompt_tokens', 0)} + {profile.get('avg_completion_tokens', 0)}\n"
+                    )
+
+            return report
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar relatório LLM: {e}")
+            return "❌ Erro ao gerar relatório de performance LLM."
+
 
 # Instância global do sistema de monitoramento
 monitoring = BotMonitoring()
@@ -0,0 +1,271 @@
+"""
+Persistence - Estado do bot numa base SQLite partilhada
+user_data, chat_data e o estado do ConversationHandler ficam numa base
+SQLite em modo WAL, que vários processos podem usar ao mesmo tempo: um
+deploy ou um worker reiniciado retoma os questionários a meio.
+
+As escritas ficam em memória e vão para o disco em lote (write-behind),
+numa só transação a cada flush_interval segundos.
+"""
+
+import json
+import time
+import pickle
+import asyncio
+import sqlite3
+import logging
+from typing import Any, Callable
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from llm_handler.hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# Escrita de uma linha por tabela (a chave pendente são os primeiros campos)
+_INSERT = {
+    "user_data": "INSERT OR REPLACE INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)",
+    "chat_data": "INSERT OR REPLACE INTO chat_data (chat_id, data, updated_at) VALUES (?, ?, ?)",
+    "bot_data": "INSERT OR REPLACE INTO bot_data (id, data) VALUES (?, ?)",
+    "conversations": (
+        "INSERT OR REPLACE INTO conversations (name, key, chat_id, state, updated_at) "
+        "VALUES (?, ?, ?, ?, ?)"
+    ),
+}
+_DELETE = {
+    "user_data": "DELETE FROM user_data WHERE user_id = ?",
+    "chat_data": "DELETE FROM chat_data WHERE chat_id = ?",
+    "conversations": "DELETE FROM conversations WHERE name = ? AND key = ?",
+}
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Persistência do python-telegram-bot em SQLite
+
+    O PTB chama os métodos update_* a cada update_interval segundos, só para
+    os utilizadores e conversas que mudaram. Essas escritas ficam pendentes
+    em memória (a mais recente de cada chave) e são gravadas numa só
+    transação, fora do event loop, flush_interval segundos depois da
+    primeira, com max_pending linhas pendentes, ou no shutdown. Um processo
+    morto sem aviso perde no máximo update_interval + flush_interval
+    segundos de respostas. Os valores são guardados com pickle (como a
+    PicklePersistence do PTB).
+
+    Com owns, cada processo só carrega os chats que lhe pertencem (ver
+    sharding.py); user_data é filtrado pelo id do utilizador, que num chat
+    privado é igual ao do chat. bot_data não é guardado por omissão: com
+    vários processos, cada um escreveria por cima dos outros.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "bot_state.db",
+        owns: Callable[[int], bool] | None = None,
+        update_interval: float = 1.0,
+        flush_interval: float = 5.0,
+        max_pending: int = 1000,
+        store_data: PersistenceInput | None = None,
+    ):
+        super().__init__(
+            store_data=store_data or PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_path = db_path
+        self.owns = owns
+        self.flush_interval = flush_interval  # 0 = gravar cada escrita logo
+        self.max_pending = max_pending
+        self._conn: sqlite3.Connection | None = None
+        # (tabela, chave) -> linha a gravar, ou None para apagar
+        self._pending: dict[tuple, tuple | None] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+        self.writes = 0  # escritas pedidas pelo PTB
+        self.rows_written = 0  # linhas gravadas (escritas da mesma chave juntam-se)
+        self.flushes = 0  # transações
+        self.flush_errors = 0
+        self.flush_latency = LatencyTracker()
+
+    def _db(self) -> sqlite3.Connection:
+        """Conexão aberta no primeiro uso (e de novo depois do flush)"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        # Os lotes são gravados numa thread (um de cada vez, com _flush_lock)
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        # WAL: leitores não bloqueiam o escritor, seguro entre processos
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id INTEGER PRIMARY KEY,
+            data BLOB,
+            updated_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS chat_data (
+            chat_id INTEGER PRIMARY KEY,
+            data BLOB,
+            updated_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS bot_data (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            data BLOB
+        );
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT,
+            key TEXT,           -- chave do ConversationHandler em JSON
+            chat_id INTEGER,    -- primeiro elemento da chave, para filtrar
+            state BLOB,
+            updated_at REAL,
+            PRIMARY KEY (name, key)
+        );
+        """)
+        conn.commit()
+        return conn
+
+    def _owned(self, chat_id: int | None) -> bool:
+        return self.owns is None or chat_id is None or self.owns(chat_id)
+
+    def _load(self, table: str, column: str) -> dict[int, Any]:
+        rows = self._db().execute(f"SELECT {column}, data FROM {table}").fetchall()
+        return {key: pickle.loads(data) for key, data in rows if self._owned(key)}
+
+    async def _write(self, table: str, key: tuple, row: tuple | None):
+        """Deixa a escrita pendente (a última de cada chave é a que conta)"""
+        self._pending[(table, key)] = row
+        self.writes += 1
+        if self.flush_interval <= 0 or len(self._pending) >= self.max_pending:
+            await self._flush_pending()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self._flush_pending()
+
+    async def _flush_pending(self):
+        """Grava as escritas pendentes numa transação, fora do event loop"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except sqlite3.Error as e:
+                # Fica para o próximo flush, sem tapar escritas mais recentes
+                self.flush_errors += 1
+                logger.error(f"Erro ao gravar o estado ({len(batch)} linhas): {e}")
+                for pending_key, row in batch.items():
+                    self._pending.setdefault(pending_key, row)
+                return
+            self.flush_latency.record(time.perf_counter() - started)
+            self.flushes += 1
+            self.rows_written += len(batch)
+
+    def _write_batch(self, batch: dict[tuple, tuple | None]):
+        conn = self._db()
+        with conn:  # uma transação para o lote todo
+            for (table, key), row in batch.items():
+                if row is None:
+                    conn.execute(_DELETE[table], key)
+                else:
+                    conn.execute(_INSERT[table], row)
+
+    # Leitura no arranque (initialize da aplicação)
+
+    async def get_user_data(self) -> dict[int, dict]:
+        return self._load("user_data", "user_id")
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return self._load("chat_data", "chat_id")
+
+    async def get_bot_data(self) -> dict:
+        row = self._db().execute("SELECT data FROM bot_data WHERE id = 0").fetchone()
+        return pickle.loads(row[0]) if row else {}
+
+    async def get_callback_data(self) -> None:
+        return None  # o bot não usa arbitrary_callback_data
+
+    async def get_conversations(self, name: str) -> dict[tuple, object]:
+        rows = self._db().execute(
+            "SELECT key, chat_id, state FROM conversations WHERE name = ?", (name,)
+        ).fetchall()
+        return {
+            tuple(json.loads(key)): pickle.loads(state)
+            for key, chat_id, state in rows
+            if self._owned(chat_id)
+        }
+
+    # Escrita (periódica, chamada pelo PTB)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        await self._write(
+            "user_data", (user_id,), (user_id, pickle.dumps(data), time.time())
+        )
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        await self._write(
+            "chat_data", (chat_id,), (chat_id, pickle.dumps(data), time.time())
+        )
+
+    async def update_bot_data(self, data: dict) -> None:
+        await self._write("bot_data", (0,), (0, pickle.dumps(data)))
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object | None) -> None:
+        pending_key = (name, json.dumps(key))
+        # Conversa terminada (None): não fica nada guardado
+        row = None
+        if new_state is not None:
+            row = (*pending_key, key[0] if key else None, pickle.dumps(new_state), time.time())
+        await self._write("conversations", pending_key, row)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._write("user_data", (user_id,), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._write("chat_data", (chat_id,), None)
+
+    # Cada chat é tratado por um só processo: nada a recarregar por update
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Chamado no shutdown da aplicação, depois da última escrita"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush_pending()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        logger.info(
+            f"💾 Estado guardado em {self.db_path} "
+            f"({self.writes} escritas, {self.flushes} transações)"
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        """Escritas pendentes e gravadas, para o /stats"""
+        return {
+            "pending": len(self._pending),
+            "writes": self.writes,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "errors": self.flush_errors,
+            "flush_interval": self.flush_interval,
+            "flush": self.flush_latency.get_stats(),
+        }
@@ -0,0 +1,191 @@
+"""
+Prompt Builder - Prompts compactos para a análise da simulação
+Só as respostas dadas, em formato chave: valor, com o cálculo já feito
+localmente; o modelo apenas explica e sugere, não recalcula
+"""
+
+import logging
+from typing import Any
+
+from irs_calculator import argumentos_de_respostas, calcular_irs, valor_resposta
+from prompts import PERGUNTAS_IRS
+
+logger = logging.getLogger(__name__)
+
+# Campos em euros (o resto dos numéricos são contagens ou idades)
+CAMPOS_EUROS = {
+    "rendimento_bruto",
+    "valor_outras_rendas",
+    "retencoes_fonte",
+    "seguranca_social",
+    "despesas_saude",
+    "despesas_educacao",
+    "despesas_habitacao",
+    "despesas_lares",
+    "valor_pensao",
+}
+
+# Numéricos em que 0 é informação útil (nos restantes, 0 = não se aplica)
+CAMPOS_ZERO_RELEVANTE = {"num_dependentes"}
+
+# Campos condicionais: campo -> (campo de que depende, respostas que o anulam)
+CAMPOS_CONDICIONAIS = {
+    "valor_outras_rendas": ("tem_outras_rendas", ("não",)),
+    "detalhes_beneficios": ("tem_beneficios", ("não",)),
+    "valor_pensao": ("paga_pensao", ("não",)),
+    "tributacao_conjunta": (
+        "estado_civil",
+        ("solteiro", "divorciado", "viúvo", "viuvo"),
+    ),
+}
+
+# Perguntas sim/não em que "Não" é o caso comum e não precisa de ir no prompt
+PERGUNTAS_SO_SE_SIM = {"tem_outras_rendas", "tem_beneficios", "paga_pensao"}
+
+# Respostas que equivalem a não responder
+RESPOSTAS_VAZIAS = {"", "-", "não informado", "nao informado", "n/a"}
+
+TAREFA_ANALISE = """TAREFA: explica à pessoa o cálculo acima (não recalcules, usa estes valores).
+1. 💰 Resultado: rendimento coletável, escalão, IRS e reembolso/pagamento
+2. 📊 Individual vs conjunta, só se houver tributacao_conjunta
+3. 💡 Até 3 sugestões legais de otimização para este perfil
+4. 🎯 Próximos passos (prazos e documentos)
+Se o perfil não for o do cálculo (ex: dependentes, recibos verdes, benefícios), diz como isso altera o resultado, sem inventar números."""
+
+
+def _campo_irrelevante(chave: str, respostas: dict[str, Any]) -> bool:
+    """Campos condicionais cuja pergunta de origem os torna irrelevantes"""
+    if chave not in CAMPOS_CONDICIONAIS:
+        return False
+    origem, anulam = CAMPOS_CONDICIONAIS[chave]
+    resposta = str(respostas.get(origem, "")).strip().lower()
+    return any(resposta.startswith(valor) for valor in anulam)
+
+
+def campos_respondidos(respostas: dict[str, Any]) -> dict[str, str]:
+    """
+    Respostas relevantes já normalizadas, pela ordem do questionário
+
+    Números sem símbolos nem texto, euros com o sufixo €; respostas vazias,
+    zeros sem significado, "Não" nas perguntas sim/não e campos condicionais
+    irrelevantes ficam de fora.
+    """
+    campos = {}
+    for pergunta in PERGUNTAS_IRS:
+        chave = pergunta["chave"]
+        resposta = respostas.get(chave)
+        if resposta is None or str(resposta).strip().lower() in RESPOSTAS_VAZIAS:
+            continue
+        if _campo_irrelevante(chave, respostas):
+            continue
+        if chave in PERGUNTAS_SO_SE_SIM and str(resposta).strip().lower().startswith("não"):
+            continue
+
+        if pergunta["tipo"] == "numero":
+            valor = valor_resposta(resposta)
+            if valor is None:
+                continue
+            if not valor and chave not in CAMPOS_ZERO_RELEVANTE:
+                continue
+            texto = f"{valor:.2f}".rstrip("0").rstrip(".")
+            campos[chave] = f"{texto}€" if chave in CAMPOS_EUROS else texto
+        else:
+            campos[chave] = " ".join(str(resposta).split())
+    return campos
+
+
+def _bloco_calculo(respostas: dict[str, Any]) -> str | None:
+    """Valores do cálculo local em chave: valor (None sem rendimento ou com valores ambíguos)"""
+    try:
+        resultado = calcular_irs(**argumentos_de_respostas(respostas))
+    except ValueError as e:
+        logger.debug(f"Sem cálculo local no prompt: {e}")
+        return None
+
+    linhas = [
+        f"rendimento_coletavel: {resultado['rendimento_coletavel']:.2f}€",
+        f"deducao_especifica: {resultado['deducao_especifica']:.2f}€",
+        f"escalao: {resultado['escalao']} "
+        f"(taxa marginal {resultado['taxa_marginal'] * 100:.1f}%)",
+        f"coleta: {resultado['coleta']:.2f}€",
+    ]
+    for chave, valor in resultado["deducoes"].items():
+        linhas.append(f"deducao_{chave}: -{valor:.2f}€")
+    linhas.append(
+        f"irs: {resultado['imposto']:.2f}€ "
+        f"(taxa efetiva {resultado['taxa_efetiva'] * 100:.1f}%)"
+    )
+    if resultado["retencoes"]:
+        saldo = resultado["saldo"]
+        estado = "reembolso" if saldo >= 0 else "a pagar"
+        linhas.append(f"saldo: {abs(saldo):.2f}€ ({estado})")
+    return "\n".join(linhas)
+
+
+def criar_prompt_analise(respostas: dict[str, Any]) -> str:
+    """
+    Prompt compacto da análise da simulação
+
+    Args:
+        respostas: Respostas do questionário (chave -> texto)
+
+    Returns:
+        str: Perfil, cálculo local e tarefa
+    """
+    perfil = "\n".join(
+        f"{chave}: {valor}" for chave, valor in campos_respondidos(respostas).items()
+    )
+    prompt = f"PERFIL:\n{perfil or 'sem respostas'}\n\n"
+
+    calculo = _bloco_calculo(respostas)
+    if calculo:
+        prompt += (
+            "CÁLCULO LOCAL (categoria A, tributação individual, sem dependentes "
+            f"nem benefícios, regras 2025):\n{calculo}\n\n"
+        )
+    else:
+        prompt += "CÁLCULO LOCAL: indisponível (rendimento em falta ou valores não interpretados)\n\n"
+
+    return prompt + TAREFA_ANALISE
+
+
+def criar_prompt_analise_completo(respostas: dict[str, Any]) -> str:
+    """
+    Prompt antigo (todas as perguntas e instruções longas)
+
+    Mantido para comparação no benchmark_prompt.py.
+    """
+    prompt = "Com base nas seguintes informações, calcula e explica o IRS:\n\n"
+
+    for i, pergunta in enumerate(PERGUNTAS_IRS):
+        chave = pergunta["chave"]
+        resposta = respostas.get(chave, "Não informado")
+        prompt += f"{i + 1}. {pergunta['pergunta']}\n   Resposta: {resposta}\n\n"
+
+    prompt += """
+Por favor, fornece:
+
+1. **💰 CÁLCULO DETALHADO DO IRS:**
+   - Rendimento coletável
+   - Escalão aplicável e taxa
+   - Valor de IRS a pagar/receber
+   - Impacto das deduções
+
+2. **📊 COMPARAÇÃO (se aplicável):**
+   - Tributação individual vs conjunta
+   - Qual compensa mais e porquê
+
+3. **💡 SUGESTÕES DE OTIMIZAÇÃO:**
+   - Como reduzir o IRS legalmente
+   - Deduções que pode aproveitar melhor
+   - Benefícios fiscais disponíveis
+
+4. **🎯 PRÓXIMOS PASSOS:**
+   - Quando e como entregar a declaração
+   - Documentos necessários
+   - Prazos importantes
+
+Formata de forma clara, com emojis e seções bem definidas. Lembra-te: és a Marinete, fala de forma natural e empática!
+"""
+
+    return prompt
@@ -74,6 +74,26 @@ Escalões IRS 2025 (Portugal Continental):
 Mínimo de existência: 10.640€ (2025)
 """
 
+# Versão curta para a análise da simulação: os números chegam já calculados
+# (prompt_builder), pelo que não são precisos os escalões nem a lista de
+# competências
+SYSTEM_PROMPT_ANALISE = """
+És a Marinete, técnica contábil sénior especialista em IRS Portugal.
+Tom: natural, caloroso e didático, com exemplos práticos e emojis com moderação.
+Usa só os valores do CÁLCULO LOCAL; nunca sugiras evasão fiscal; lembra que é
+uma simulação orientativa a confirmar no Portal das Finanças e, em casos
+complexos, com um contabilista certificado.
+"""
+
+# Resumo das mensagens antigas da conversa livre (memória por utilizador)
+SUMMARY_PROMPT = """
+Atualiza o resumo de uma conversa sobre IRS entre um utilizador e a Marinete.
+Junta ao RESUMO ATUAL o essencial das NOVAS MENSAGENS: situação fiscal do
+utilizador (valores, estado civil, dependentes, despesas), dúvidas já
+respondidas e pendentes. Máximo 6 frases curtas, em português, sem saudações.
+Responde apenas com o resumo.
+"""
+
 # ═══════════════════════════════════════════════════════════════════════
 #  MENSAGEM DE BOAS-VINDAS
 # ═══════════════════════════════════════════════════════════════════════
@@ -443,6 +463,8 @@ Olá! Aqui estão todas as formas de me usar:
    Exemplos:
    • `/calcular 30000` (apenas rendimento)
    • `/calcular 30000 saude:500 educacao:300`
+📈 `/comparar [de] [até] [passo]` - IRS e taxas para vários rendimentos
+   Exemplo: `/comparar 10000 80000 5000`
 
 📋 `/deducoes` - Lista completa de deduções fiscais
 💡 `/sugestoes` - Enviar sugestão/feedback
@@ -481,6 +503,31 @@ Sou uma assistente informativa. Para casos complexos ou dúvidas específicas so
 Quanto mais detalhes me deres, mais precisa será a simulação! Podes começar agora: qual é a tua dúvida sobre IRS? 😊
 """
 
+# ═══════════════════════════════════════════════════════════════════════
+#  RESPOSTAS LOCAIS (LLM SOBRECARREGADO)
+# ═══════════════════════════════════════════════════════════════════════
+
+# Palavras-chave -> resposta sem IA, por ordem; a primeira que bater ganha
+RESPOSTAS_LOCAIS = [
+    (
+        ("dedu", "despesa", "fatura", "saúde", "educa", "renda", "ppr"),
+        DEDUCTIONS_INFO,
+    ),
+    (
+        ("calcul", "quanto", "reembolso", "pagar", "escal", "taxa", "salário"),
+        "Estou com muitos pedidos neste momento! 😅 Para um valor rápido usa "
+        "`/calcular` seguido do teu rendimento bruto anual, por exemplo "
+        "`/calcular 30000`, que funciona sempre sem esperar.",
+    ),
+    (
+        ("simul", "jovem", "conjunta", "casad", "dependente", "filho"),
+        "Estou com muitos pedidos neste momento! 😅 A simulação completa "
+        "continua disponível: usa `/simular` e respondo a 20 perguntas sobre "
+        "a tua situação, incluindo IRS Jovem, dependentes e tributação conjunta.",
+    ),
+    (("ajuda", "comando", "help"), HELP_MESSAGE),
+]
+
 # ═══════════════════════════════════════════════════════════════════════
 #  MENSAGENS DE ERRO E FEEDBACK
 # ═══════════════════════════════════════════════════════════════════════
@@ -492,6 +539,12 @@ ERROR_MESSAGES = {
     "campo_obrigatorio": "Essa informação é importante para o cálculo. Podes responder, por favor? 🙏",
     "erro_calculo": "Ups! Tive um problema ao fazer o cálculo. 😓 Podes tentar novamente? Se o erro persistir, usa `/reset` e recomeça.",
     "sessao_expirada": "A tua sessão expirou. Usa `/start` para começar de novo! 😊",
+    "fila_cheia": "Estou com muitos pedidos neste momento! 😅 Podes tentar de novo daqui a um minuto?",
+    "posicao_fila": "⏳ Há muita gente a falar comigo agora! Estás na posição {posicao} da fila, já te respondo.",
+    "llm_indisponivel": "O meu cérebro de IA está com dificuldades neste momento. 😓 Entretanto podes usar `/calcular` (funciona sempre!) ou `/deducoes`, e tentar de novo daqui a pouco.",
+    "quota_excedida": "Já conversámos muito hoje! 😊 Atingiste o limite diário de respostas da IA. O `/calcular` e o `/deducoes` continuam disponíveis, e amanhã podemos continuar a conversa.",
+    "ocupado": "Estou com muitos pedidos neste momento! 😅 Tenta de novo daqui a um minuto; entretanto, `/calcular`, `/simular` e `/deducoes` funcionam normalmente.",
+    "analise_indisponivel": "⚠️ A análise detalhada não está disponível neste momento, mas aqui fica o cálculo feito com as tuas respostas:",
 }
 
 SUCCESS_MESSAGES = {
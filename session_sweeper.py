@@ -0,0 +1,278 @@
+"""
+Session Sweeper - Limpeza das sessões inativas e limite de utilizadores
+Quem abandona o /simular a meio deixa user_data (respostas_irs) e o estado
+do questionário em memória; sem limpeza o processo cresce com cada
+utilizador novo. Sessões sem updates há mais de idle_ttl segundos são
+esquecidas periodicamente, e acima de max_users sai a menos recente.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Iterable
+
+import telegram
+from telegram import Update
+from telegram.ext import Application, ContextTypes, ConversationHandler, TypeHandler
+
+logger = logging.getLogger(__name__)
+
+# Versão do python-telegram-bot (fixada em requirements.txt) cujo estado
+# interno _PTBState usa; rever _PTBState antes de a mudar
+PTB_VERSION = "21.4"
+
+
+def deep_size(obj: Any, _seen: set | None = None) -> int:
+    """Tamanho aproximado em bytes de um objeto e do que ele contém"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(type(obj), "__slots__"):
+        size += sum(
+            deep_size(getattr(obj, name), seen)
+            for name in type(obj).__slots__
+            if hasattr(obj, name)
+        )
+    return size
+
+
+class _Session:
+    """Último update de um utilizador e os chats onde falou"""
+
+    __slots__ = ("last_seen", "chats")
+
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.chats: set[int] = set()
+
+
+class _PTBState:
+    """
+    Único ponto de acesso ao estado privado do python-telegram-bot
+
+    O PTB não tem API pública para: apagar user_data/chat_data sem
+    persistência (drop_*_data guarda o id para apagar na persistência, e
+    sem persistência esse conjunto só cresce), nem para ler ou terminar as
+    conversas de um ConversationHandler fora de um update. Na versão
+    PTB_VERSION, as conversas de um handler persistente são um TrackingDict:
+    um pop fica registado e o update_persistence seguinte apaga a conversa
+    da base (update_conversation com None). Noutra versão isto pode deixar
+    de ser verdade, por isso a limpeza só apaga se a versão for a fixada.
+    """
+
+    def __init__(self, application: Application, conversations: list[ConversationHandler]):
+        self.application = application
+        self.conversations = conversations
+        self.supported = telegram.__version__ == PTB_VERSION
+        if not self.supported:
+            logger.error(
+                f"python-telegram-bot {telegram.__version__} (esperado {PTB_VERSION}): "
+                "limpeza das sessões desativada, rever session_sweeper._PTBState"
+            )
+
+    def drop_user(self, user_id: int):
+        """Apaga user_data e chat_data do chat privado (e da persistência)"""
+        application = self.application
+        if application.persistence is not None:
+            application.drop_user_data(user_id)
+            application.drop_chat_data(user_id)
+        else:
+            application._user_data.pop(user_id, None)
+            application._chat_data.pop(user_id, None)
+
+    def drop_conversation(self, key: tuple):
+        """Termina a conversa em todos os handlers (e na persistência)"""
+        for handler in self.conversations:
+            handler._conversations.pop(key, None)
+
+    def conversation_states(self) -> dict[tuple, object]:
+        """Estado de todas as conversas em curso, por chave"""
+        states = {}
+        for handler in self.conversations:
+            states.update(handler._conversations)
+        return states
+
+
+class SessionSweeper:
+    """
+    Esquece user_data, chat_data e estado das conversas de quem está inativo
+
+    Um TypeHandler no grupo -1 regista cada update (utilizador e chat), do
+    menos para o mais recente. Uma tarefa corre a cada interval segundos e
+    remove as sessões inativas há mais de idle_ttl (as mais antigas estão no
+    início, por isso só percorre as que saem); acima de max_users a menos
+    recente sai logo no update seguinte. Com persistência, as remoções
+    também chegam à base (drop_user_data e conversa terminada).
+
+    Faz o papel do conversation_timeout do ConversationHandler, que precisa
+    da JobQueue (extra do python-telegram-bot) e de um job por conversa.
+    O chat_data só é removido no chat privado (id igual ao do utilizador).
+    Utilizadores com trabalho em curso (busy, ex: a análise final ainda a
+    correr) nunca são esquecidos: passam para o fim, como se ativos.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = 7200,
+        max_users: int = 20000,
+        interval: float = 60,
+        busy: Callable[[tuple[int, int]], bool] | None = None,
+    ):
+        self.idle_ttl = idle_ttl
+        self.max_users = max(1, max_users)
+        self.interval = interval
+        self.busy = busy  # (chat, utilizador) -> tem uma tarefa em curso
+        self._state: _PTBState | None = None
+        # user_id -> sessão, da menos para a mais recentemente usada
+        self._sessions: OrderedDict[int, _Session] = OrderedDict()
+        self._task: asyncio.Task | None = None
+
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.skipped_busy = 0
+        self.sweeps = 0
+        self.last_sweep_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def attach(self, application: Application, conversations: Iterable[ConversationHandler]):
+        """Regista o handler que segue os updates (antes de todos os outros)"""
+        self._state = _PTBState(application, list(conversations))
+        application.add_handler(TypeHandler(Update, self._on_update), group=-1)
+
+    async def _on_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is not None:
+            chat = update.effective_chat
+            self.touch(user.id, chat.id if chat else None)
+
+    def touch(self, user_id: int, chat_id: int | None = None):
+        """Marca o utilizador como ativo (e tira o menos recente, se preciso)"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = _Session()
+            self._sessions[user_id] = session
+            # No máximo uma volta: se estiverem todos ocupados, fica acima
+            for _ in range(len(self._sessions) - 1):
+                if len(self._sessions) <= self.max_users:
+                    break
+                old_id, old = next(iter(self._sessions.items()))
+                if self._skip_if_busy(old_id, old):
+                    continue
+                del self._sessions[old_id]
+                self._forget(old_id, old)
+                self.evicted_lru += 1
+        else:
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(user_id)
+        if chat_id is not None:
+            session.chats.add(chat_id)
+
+    def _skip_if_busy(self, user_id: int, session: _Session) -> bool:
+        """Utilizador com tarefa em curso: conta como ativo agora"""
+        if self.busy is None or not any(
+            self.busy((chat_id, user_id)) for chat_id in session.chats | {user_id}
+        ):
+            return False
+        session.last_seen = time.monotonic()
+        self._sessions.move_to_end(user_id)
+        self.skipped_busy += 1
+        return True
+
+    def _forget(self, user_id: int, session: _Session):
+        state = self._state
+        if state is None or not state.supported:
+            return
+        state.drop_user(user_id)
+        for chat_id in session.chats | {user_id}:
+            state.drop_conversation((chat_id, user_id))
+
+    def sweep(self) -> int:
+        """Remove as sessões inativas há mais de idle_ttl segundos"""
+        started = time.perf_counter()
+        now = time.monotonic()
+        removed = 0
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            if self._skip_if_busy(user_id, session):
+                continue
+            del self._sessions[user_id]
+            self._forget(user_id, session)
+            removed += 1
+        self.evicted_idle += removed
+        self.sweeps += 1
+        self.last_sweep_ms = round((time.perf_counter() - started) * 1000, 2)
+        if removed:
+            logger.info(f"🧹 {removed} sessões inativas esquecidas ({len(self._sessions)} ativas)")
+        return removed
+
+    def _seed(self):
+        """Sessões carregadas da persistência contam como ativas no arranque"""
+        for user_id in list(self._state.application.user_data):
+            self.touch(user_id)
+        for key in self._state.conversation_states():
+            chat_id, user_id = key[0], key[-1]
+            self.touch(user_id, chat_id)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erro na limpeza das sessões: {e}")
+
+    def start(self):
+        """Arranca a limpeza periódica (post_init da aplicação)"""
+        if self._state is None or self._task is not None:
+            return
+        self._seed()
+        if self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    def stop(self):
+        """Para a limpeza periódica (post_stop da aplicação)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> dict[str, Any]:
+        """Sessões, remoções e memória de cada estrutura para o /stats"""
+        structures = {"sessions": (len(self._sessions), deep_size(self._sessions))}
+        if self._state is not None:
+            application = self._state.application
+            structures["user_data"] = (
+                len(application.user_data),
+                deep_size(dict(application.user_data)),
+            )
+            structures["chat_data"] = (
+                len(application.chat_data),
+                deep_size(dict(application.chat_data)),
+            )
+            conversations = self._state.conversation_states()
+            structures["conversations"] = (len(conversations), deep_size(conversations))
+        return {
+            "users": len(self._sessions),
+            "max_users": self.max_users,
+            "idle_ttl": self.idle_ttl,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "skipped_busy": self.skipped_busy,
+            "sweeps": self.sweeps,
+            "last_sweep_ms": self.last_sweep_ms,
+            "structures": {
+                name: {"entries": entries, "bytes": size}
+                for name, (entries, size) in structures.items()
+            },
+        }
@@ -0,0 +1,339 @@
+"""
+Sharding - Vários processos worker atrás de um só webhook
+Um só processo Python fica limitado a um núcleo. Neste modo, o processo da
+frente recebe os updates do Telegram e reencaminha cada um ao worker do seu
+chat (hash do chat_id); cada worker corre os handlers de
+conversation_handler.py. O estado das conversas fica numa base SQLite
+partilhada (persistence.py): um worker reiniciado retoma os questionários.
+"""
+
+import os
+import sys
+import time
+import zlib
+import asyncio
+import logging
+import secrets
+import signal
+import subprocess
+from typing import Any
+
+import httpx
+
+from webhook_server import WebhookServer, serve_webhook
+
+logger = logging.getLogger(__name__)
+
+# Limites da conta LLM: cada worker fica com a sua parte, para a soma dos
+# workers não passar do plano (a quota diária já é partilhada na base)
+LIMITES_DIVIDIDOS = ("LLM_RPM_LIMIT", "LLM_TPM_LIMIT", "LLM_MAX_CONCURRENCY", "LLM_MAX_QUEUE")
+
+
+def shard_for(chat_id: int | None, shards: int) -> int:
+    """Worker de um chat: sempre o mesmo para o mesmo chat_id"""
+    if chat_id is None or shards <= 1:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+def chat_id_of(data: dict) -> int | None:
+    """chat_id de um update em JSON (ou id do utilizador, sem chat)"""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat.get("id")
+        user = value.get("from") or value.get("user")
+        if user:
+            return user.get("id")
+    return None
+
+
+class ShardRouter(WebhookServer):
+    """
+    Webhook da frente: reencaminha cada update, tal como chegou, ao worker
+    do seu chat
+
+    Responde ao Telegram com o estado do worker; com o worker em baixo (a
+    reiniciar) responde 503 e o Telegram volta a enviar o update mais tarde.
+    """
+
+    def __init__(
+        self,
+        worker_urls: list[str],
+        path: str = "/telegram",
+        secret_token: str = "",
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        worker_secret: str = "",
+    ):
+        super().__init__(None, path, secret_token, host, port)
+        self.worker_urls = worker_urls
+        self.worker_secret = worker_secret
+        self._client: httpx.AsyncClient | None = None
+
+        self.forwarded = [0] * len(worker_urls)
+        self.unavailable = [0] * len(worker_urls)
+
+    async def start(self):
+        self._client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        )
+        await super().start()
+
+    async def stop(self):
+        await super().stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def deliver(self, data: dict, body: bytes) -> int:
+        shard = shard_for(chat_id_of(data), len(self.worker_urls))
+        try:
+            response = await self._client.post(
+                self.worker_urls[shard],
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": self.worker_secret,
+                },
+            )
+        except httpx.HTTPError as e:
+            self.unavailable[shard] += 1
+            logger.warning(f"Worker {shard} indisponível: {e!r}")
+            return 503
+        if response.status_code != 200:
+            self.unavailable[shard] += 1
+            return 503 if response.status_code >= 500 else response.status_code
+        self.received += 1
+        self.forwarded[shard] += 1
+        return 200
+
+    def get_stats(self) -> dict[str, Any]:
+        stats = super().get_stats()
+        stats["forwarded"] = list(self.forwarded)
+        stats["unavailable"] = list(self.unavailable)
+        return stats
+
+
+class WorkerPool:
+    """
+    Processos worker: arranque, vigilância e reinício
+
+    Cada worker é um processo novo (python <script> worker ...) à escuta
+    em 127.0.0.1, na porta base_port + número do worker.
+    """
+
+    def __init__(
+        self,
+        shards: int,
+        base_port: int,
+        path: str = "/telegram",
+        db_path: str = "bot_state.db",
+        script: str = None,
+        restart_delay: float = 1.0,
+    ):
+        self.shards = max(1, shards)
+        self.base_port = base_port
+        self.path = path
+        self.db_path = db_path
+        self.script = script or os.path.abspath(__file__)
+        self.restart_delay = restart_delay
+        # Segredo entre a frente e os workers (nunca sai da máquina)
+        self.secret_token = secrets.token_urlsafe(32)
+        self.processes: list[subprocess.Popen | None] = [None] * self.shards
+        self.restarts = 0
+
+    @property
+    def urls(self) -> list[str]:
+        return [f"http://127.0.0.1:{self.base_port + i}{self.path}" for i in range(self.shards)]
+
+    def _env(self) -> dict[str, str]:
+        from config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_RPM_LIMIT, LLM_TPM_LIMIT
+
+        env = dict(os.environ, SHARD_SECRET=self.secret_token)
+        limites = (LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+        for nome, valor in zip(LIMITES_DIVIDIDOS, limites):
+            if valor > 0:  # 0 = sem limite
+                env[nome] = str(max(1, valor // self.shards))
+        return env
+
+    def spawn(self, shard: int):
+        self.processes[shard] = subprocess.Popen(
+            [
+                sys.executable,
+                self.script,
+                "worker",
+                str(shard),
+                str(self.shards),
+                str(self.base_port + shard),
+                self.path,
+                self.db_path,
+            ],
+            env=self._env(),
+        )
+        logger.info(
+            f"🧩 Worker {shard} iniciado (pid {self.processes[shard].pid}, "
+            f"porta {self.base_port + shard})"
+        )
+
+    def start(self):
+        for shard in range(self.shards):
+            self.spawn(shard)
+
+    async def wait_ready(self, timeout: float = 60.0):
+        """Espera que todos os workers respondam em /health"""
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(timeout=1.0) as client:
+            for shard in range(self.shards):
+                url = f"http://127.0.0.1:{self.base_port + shard}/health"
+                while True:
+                    try:
+                        if (await client.get(url)).status_code == 200:
+                            break
+                    except httpx.HTTPError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"Worker {shard} não arrancou")
+                    await asyncio.sleep(0.1)
+
+    async def supervise(self, stop_event: asyncio.Event, interval: float = 1.0):
+        """Reinicia os workers que terminarem, até stop_event"""
+        while not stop_event.is_set():
+            for shard, process in enumerate(self.processes):
+                if stop_event.is_set():
+                    break  # os workers também recebem o Ctrl+C
+                if process is not None and process.poll() is not None:
+                    logger.warning(
+                        f"⚠️ Worker {shard} terminou (código {process.returncode}); a reiniciar"
+                    )
+                    self.restarts += 1
+                    await asyncio.sleep(self.restart_delay)
+                    self.spawn(shard)
+            try:
+                await asyncio.wait_for(stop_event.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self, timeout: float = 15.0):
+        """SIGTERM a todos (guardam o estado e saem) e SIGKILL a quem não sair"""
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if process is None:
+                continue
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def run_worker(
+    shard: int,
+    shards: int,
+    port: int,
+    path: str = "/telegram",
+    db_path: str = "bot_state.db",
+    secret_token: str = "",
+):
+    """Processo worker: a aplicação completa, com os chats do seu shard"""
+    from config import PERSISTENCE_FLUSH_INTERVAL, PERSISTENCE_INTERVAL
+    from conversation_handler import create_application
+    from main import aquecer_conexoes, fechar_conexoes
+    from persistence import SQLitePersistence
+
+    persistence = SQLitePersistence(
+        db_path,
+        owns=lambda chat_id: shard_for(chat_id, shards) == shard,
+        update_interval=PERSISTENCE_INTERVAL,
+        flush_interval=PERSISTENCE_FLUSH_INTERVAL,
+    )
+    application = create_application(
+        post_init=aquecer_conexoes,
+        post_shutdown=fechar_conexoes,
+        persistence=persistence,
+    )
+    logger.info(f"🧩 Worker {shard + 1}/{shards} à escuta em 127.0.0.1:{port}{path}")
+    asyncio.run(
+        serve_webhook(
+            application,
+            webhook_url="",
+            path=path,
+            secret_token=secret_token or os.environ["SHARD_SECRET"],
+            host="127.0.0.1",
+            port=port,
+            set_webhook=False,
+        )
+    )
+
+
+async def serve_sharded(
+    bot,
+    webhook_url: str,
+    path: str = "/telegram",
+    secret_token: str = "",
+    host: str = "0.0.0.0",
+    port: int = 8443,
+    shards: int = 2,
+    base_port: int = 8444,
+    db_path: str = "bot_state.db",
+    allowed_updates: list[str] = None,
+    drop_pending_updates: bool = True,
+    max_connections: int = 40,
+    stop_event: asyncio.Event = None,
+    set_webhook: bool = True,
+    script: str = None,
+) -> None:
+    """
+    Corre a frente e os workers até stop_event (ou SIGINT/SIGTERM)
+
+    Args:
+        bot: telegram.Bot usado para registar o webhook
+        webhook_url: URL pública base; o Telegram chama webhook_url + path
+        shards: Número de processos worker
+        base_port: Porta local do primeiro worker (os outros a seguir)
+        script: Script dos workers (por omissão este módulo)
+    """
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    stop_event = stop_event or asyncio.Event()
+    pool = WorkerPool(shards, base_port, path, db_path, script)
+    router = ShardRouter(pool.urls, path, secret_token, host, port, pool.secret_token)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows ou fora da thread principal
+
+    pool.start()
+    try:
+        await pool.wait_ready()
+        await router.start()
+        if set_webhook:
+            async with bot:
+                await bot.set_webhook(
+                    url=f"{webhook_url}{path}",
+                    secret_token=secret_token,
+                    allowed_updates=allowed_updates,
+                    drop_pending_updates=drop_pending_updates,
+                    max_connections=max_connections,
+                )
+        logger.info(f"🧩 Modo sharded: {pool.shards} workers a partir da porta {base_port}")
+        await pool.supervise(stop_event)
+    finally:
+        await router.stop()
+        await asyncio.to_thread(pool.stop)
+
+
+if __name__ == "__main__":
+    # Uso interno do WorkerPool:
+    # python sharding.py worker <shard> <shards> <porta> <caminho> <base de estado>
+    if len(sys.argv) != 7 or sys.argv[1] != "worker":
+        sys.exit("Uso: python sharding.py worker <shard> <shards> <porta> <caminho> <base>")
+    run_worker(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), sys.argv[5], sys.argv[6])
@@ -0,0 +1,73 @@
+"""
+Configuração comum dos testes
+Credenciais fictícias (os testes nunca contactam as APIs reais), os
+servidores mock do Groq e do Telegram e um relógio controlado pelo teste
+como fixtures
+"""
+
+import os
+
+import pytest
+import pytest_asyncio
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:mock-telegram-token")
+os.environ.setdefault("GROQ_API_KEY", "mock-groq-key")
+# Sem limites RPM/TPM da conta: o plano não entra nos testes
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+
+from llm_handler.http_pool import HTTPPool  # noqa: E402
+from mock_groq_server import MockGroqServer  # noqa: E402
+from mock_telegram_server import MockTelegramServer  # noqa: E402
+
+
+class Relogio:
+    """Substitui o módulo time de um módulo testado: o tempo só anda com avancar()"""
+
+    def __init__(self, agora: float = 1000.0):
+        self.agora = agora
+
+    def monotonic(self) -> float:
+        return self.agora
+
+    perf_counter = time = monotonic
+
+    def avancar(self, segundos: float):
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio():
+    return Relogio()
+
+
+@pytest.fixture
+def mock_groq():
+    """Fábrica de servidores Groq mock (latência curta), parados no fim"""
+    servers = []
+
+    def start(**kwargs) -> MockGroqServer:
+        kwargs.setdefault("latency", 0.01)
+        server = MockGroqServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def mock_telegram():
+    """Bot API mock, parada no fim"""
+    server = MockTelegramServer().start()
+    yield server
+    server.stop()
+
+
+@pytest_asyncio.fixture
+async def http_pool():
+    """Pool de conexões ligado ao event loop do teste"""
+    pool = HTTPPool()
+    yield pool
+    await pool.aclose()
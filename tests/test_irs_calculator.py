@@ -0,0 +1,307 @@
+"""
+Testes do motor de cálculo de IRS (irs_calculator.py)
+Valores esperados calculados à mão a partir de TAX_BRACKETS e DEDUCTIONS
+de config.py
+"""
+
+import numpy as np
+import pytest
+
+from config import DEDUCTIONS, SOCIAL_SECURITY_RATE
+from irs_calculator import (
+    BRACKET_BASE_TAX,
+    BRACKET_LOWER,
+    BRACKET_RATES,
+    argumentos_de_respostas,
+    calcular_irs,
+    calcular_irs_lote,
+    imposto_progressivo,
+    parse_calculo_args,
+    valor_resposta,
+)
+
+
+# Escalões
+
+
+def test_primeiro_escalao():
+    assert imposto_progressivo(1000) == (pytest.approx(145.0), 0)
+    assert imposto_progressivo(0) == (0.0, 0)
+    assert imposto_progressivo(-500) == (0.0, 0)
+
+
+@pytest.mark.parametrize("i", range(1, len(BRACKET_LOWER)))
+def test_limite_de_escalao(i):
+    limite = BRACKET_LOWER[i]
+    coleta, escalao = imposto_progressivo(limite)
+    assert escalao == i
+    assert coleta == pytest.approx(BRACKET_BASE_TAX[i])
+
+    # Contínuo no limite: logo abaixo fica no escalão anterior, mesma coleta
+    coleta_abaixo, escalao_abaixo = imposto_progressivo(limite - 0.01)
+    assert escalao_abaixo == i - 1
+    assert coleta_abaixo == pytest.approx(coleta - 0.01 * BRACKET_RATES[i - 1])
+
+
+def test_coleta_acumulada_dos_escaloes():
+    assert BRACKET_BASE_TAX[1] == pytest.approx(7703 * 0.145)
+    assert BRACKET_BASE_TAX[2] == pytest.approx(7703 * 0.145 + (11623 - 7703) * 0.23)
+
+
+def test_taxa_marginal_e_efetiva():
+    resultado = calcular_irs(30000)
+
+    # 30.000 - 4.104 (dedução específica) = 25.896, no 5.º escalão (40,3%)
+    assert resultado["rendimento_coletavel"] == pytest.approx(25896)
+    assert resultado["escalao"] == 5
+    assert resultado["taxa_marginal"] == 0.403
+    assert resultado["coleta"] == pytest.approx(5112.197 + (25896 - 21321) * 0.403)
+    assert resultado["imposto"] == pytest.approx(6955.922)
+    assert resultado["taxa_efetiva"] == pytest.approx(6955.922 / 30000)
+    assert resultado["taxa_efetiva"] < resultado["taxa_marginal"]
+
+
+# Dedução específica
+
+
+def test_deducao_especifica_minima():
+    # 11% de 20.000 = 2.200, abaixo do valor fixo
+    assert calcular_irs(20000)["deducao_especifica"] == DEDUCTIONS["deducao_especifica"]
+
+
+def test_deducao_especifica_pelas_contribuicoes():
+    resultado = calcular_irs(50000)
+    assert resultado["deducao_especifica"] == pytest.approx(5500)
+    assert calcular_irs(20000, seguranca_social=5000)["deducao_especifica"] == 5000
+
+
+def test_deducao_especifica_nao_passa_do_rendimento():
+    resultado = calcular_irs(3000)
+    assert resultado["deducao_especifica"] == 3000
+    assert resultado["rendimento_coletavel"] == 0
+    assert resultado["imposto"] == 0
+
+
+# Mínimo de existência
+
+
+def test_minimo_de_existencia_limita_o_imposto():
+    # Coleta de 11.000 seria 999,92€; o líquido não pode ficar abaixo de 10.640
+    resultado = calcular_irs(11000)
+    assert resultado["coleta"] == pytest.approx(999.92)
+    assert resultado["imposto"] == pytest.approx(360)
+    assert resultado["rendimento_bruto"] - resultado["imposto"] == pytest.approx(
+        DEDUCTIONS["minimo_existencia"]
+    )
+
+
+def test_abaixo_do_minimo_de_existencia_nao_paga():
+    assert calcular_irs(DEDUCTIONS["minimo_existencia"])["imposto"] == 0
+    assert calcular_irs(9000)["imposto"] == 0
+
+
+def test_acima_do_minimo_de_existencia_sem_limite():
+    resultado = calcular_irs(12000)
+    assert resultado["imposto"] == pytest.approx(resultado["coleta"])
+
+
+# Deduções à coleta
+
+
+def test_limites_das_deducoes():
+    resultado = calcular_irs(
+        30000, {"despesas_saude": 10000, "despesas_educacao": 1000}
+    )
+    # Saúde: 15% de 10.000 limitado a 1.000; educação: 30% de 1.000
+    assert resultado["deducoes"] == {
+        "despesas_saude": 1000,
+        "despesas_educacao": pytest.approx(300),
+    }
+    assert resultado["imposto"] == pytest.approx(6955.922 - 1300)
+
+
+def test_deducoes_nao_passam_da_coleta():
+    resultado = calcular_irs(12000, {"despesas_saude": 10000, "lares": 2000})
+    assert resultado["total_deducoes"] == pytest.approx(resultado["coleta"])
+    assert resultado["imposto"] == 0
+
+
+# Saldo
+
+
+def test_saldo_reembolso():
+    resultado = calcular_irs(30000, retencoes=8000)
+    assert resultado["saldo"] == pytest.approx(8000 - 6955.922)
+    assert resultado["saldo"] > 0
+
+
+def test_saldo_a_pagar():
+    resultado = calcular_irs(30000, retencoes=5000)
+    assert resultado["saldo"] == pytest.approx(5000 - 6955.922)
+    assert resultado["saldo"] < 0
+
+
+def test_saldo_sem_retencoes():
+    assert calcular_irs(30000)["saldo"] == pytest.approx(-6955.922)
+
+
+# Argumentos do /calcular
+
+
+def test_argumentos_completos():
+    assert parse_calculo_args("30.000€ Saúde:1.500,50 ss:3300 retencao:4000") == {
+        "rendimento_bruto": 30000,
+        "despesas": {"despesas_saude": 1500.5},
+        "seguranca_social": 3300,
+        "retencoes": 4000,
+    }
+
+
+@pytest.mark.parametrize(
+    "texto, valor",
+    [("30000", 30000), ("30.000", 30000), ("30000,50", 30000.5), ("1.234.567€", 1234567)],
+)
+def test_formatos_do_rendimento(texto, valor):
+    assert parse_calculo_args(texto)["rendimento_bruto"] == valor
+
+
+def test_despesas_repetidas_somam():
+    args = parse_calculo_args("30000 saude:200 saude:300")
+    assert args["despesas"] == {"despesas_saude": 500}
+
+
+@pytest.mark.parametrize(
+    "texto",
+    [
+        "",
+        "-30000",
+        "30000 saude:-500",
+        "abc",
+        "30k",
+        "inf",
+        "nan",
+        "30000 saude",
+        "30000 saude:abc",
+        "30000 ginasio:50",
+    ],
+)
+def test_argumentos_invalidos(texto):
+    with pytest.raises(ValueError):
+        parse_calculo_args(texto)
+
+
+# Respostas do questionário
+
+
+@pytest.mark.parametrize(
+    "resposta, valor",
+    [
+        ("30.000€", 30000),
+        ("30.000€ por ano", 30000),
+        ("30 mil", 30000),
+        ("25 mil euros", 25000),
+        ("1,5k", 1500),
+        ("30k", 30000),
+        ("1,5 milhões", 1500000),
+        (30000, 30000),
+    ],
+)
+def test_valor_resposta(resposta, valor):
+    assert valor_resposta(resposta) == valor
+
+
+@pytest.mark.parametrize(
+    "resposta", [None, "", "não sei", "entre 20 e 30 mil", "25%", "-500", "menos -500€"]
+)
+def test_valor_resposta_ambigua(resposta):
+    assert valor_resposta(resposta) is None
+
+
+def test_respostas_do_questionario():
+    args = argumentos_de_respostas(
+        {
+            "rendimento_bruto": "30 mil",
+            "despesas_saude": "500€",
+            "despesas_educacao": "não tenho",
+            "retencoes_fonte": "4.000",
+        }
+    )
+    assert args == {
+        "rendimento_bruto": 30000,
+        "despesas": {"despesas_saude": 500},
+        "seguranca_social": None,
+        "retencoes": 4000,
+    }
+
+
+@pytest.mark.parametrize(
+    "respostas",
+    [
+        {},
+        {"rendimento_bruto": "não sei"},
+        {"rendimento_bruto": "entre 20 e 30 mil"},
+        {"rendimento_bruto": "30000", "despesas_saude": "-500"},
+        {"rendimento_bruto": "30000", "retencoes_fonte": "10%"},
+    ],
+)
+def test_respostas_invalidas(respostas):
+    with pytest.raises(ValueError):
+        argumentos_de_respostas(respostas)
+
+
+# Cálculo em lote (mesmas regras, vetorizado)
+
+
+def _rendimentos_de_teste() -> np.ndarray:
+    """Gama regular, limites exatos dos escalões e abaixo do mínimo de existência"""
+    fixo = DEDUCTIONS["deducao_especifica"]
+    limites = [
+        bruto
+        for lower in BRACKET_LOWER
+        # Coletável exatamente no limite: pela dedução fixa ou pelos 11% de SS
+        for bruto in (lower + fixo, lower / (1 - SOCIAL_SECURITY_RATE))
+    ]
+    minimo = DEDUCTIONS["minimo_existencia"]
+    return np.concatenate(
+        [
+            np.linspace(0, 200000, 2001),
+            limites,
+            np.nextafter(limites, 0),
+            [0.0, 1.0, fixo, fixo + 0.01, 9000, minimo - 0.01, minimo, minimo + 0.01],
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "despesas, retencoes",
+    [
+        ({}, 0.0),
+        ({"despesas_saude": 2000, "despesas_educacao": 500}, 4000.0),
+        ({"despesas_saude": 20000, "lares": 3000, "encargos_habitacao": 900}, 12000.0),
+    ],
+)
+def test_lote_igual_ao_calculo_individual(despesas, retencoes):
+    rendimentos = _rendimentos_de_teste()
+    lote = calcular_irs_lote(rendimentos, despesas, retencoes=retencoes)
+
+    for i, bruto in enumerate(rendimentos):
+        esperado = calcular_irs(float(bruto), despesas, retencoes=retencoes)
+        assert lote["escalao"][i] == esperado["escalao"], bruto
+        assert lote["taxa_marginal"][i] == esperado["taxa_marginal"], bruto
+        assert lote["imposto"][i] == pytest.approx(esperado["imposto"], abs=1e-6), bruto
+        assert lote["taxa_efetiva"][i] == pytest.approx(esperado["taxa_efetiva"], abs=1e-9), bruto
+        assert lote["saldo"][i] == pytest.approx(esperado["saldo"], abs=1e-6), bruto
+
+
+def test_lote_com_argumentos_por_cenario():
+    rendimentos = np.array([12000.0, 30000.0, 80000.0])
+    saude = np.array([0.0, 2000.0, 10000.0])
+    retencoes = np.array([500.0, 6000.0, 20000.0])
+    lote = calcular_irs_lote(rendimentos, {"despesas_saude": saude}, retencoes=retencoes)
+
+    for i in range(len(rendimentos)):
+        esperado = calcular_irs(
+            rendimentos[i], {"despesas_saude": saude[i]}, retencoes=retencoes[i]
+        )
+        assert lote["imposto"][i] == pytest.approx(esperado["imposto"])
+        assert lote["saldo"][i] == pytest.approx(esperado["saldo"])
@@ -0,0 +1,99 @@
+"""
+Testes do agrupamento de rajadas de mensagens (message_debouncer.py)
+Todas as mensagens de um caso são enviadas antes de a janela terminar,
+por isso a ordem não depende do tempo real
+"""
+
+import asyncio
+
+import pytest
+
+from message_debouncer import MessageDebouncer
+
+JANELA = 0.01
+
+
+@pytest.fixture
+def debouncer():
+    return MessageDebouncer(min_window=JANELA, max_window=JANELA)
+
+
+async def _enviar(debouncer, *textos, chave="u"):
+    tarefas = [asyncio.create_task(debouncer.submit(chave, texto)) for texto in textos]
+    return await asyncio.gather(*tarefas)
+
+
+@pytest.mark.parametrize("carga, janela", [(0.0, 1.0), (0.5, 2.0), (1.0, 3.0), (5.0, 3.0)])
+def test_janela_cresce_com_a_carga(carga, janela):
+    debouncer = MessageDebouncer(min_window=1.0, max_window=3.0, load=lambda: carga)
+    assert debouncer.window() == pytest.approx(janela)
+
+
+@pytest.mark.asyncio
+async def test_mensagem_sozinha(debouncer):
+    (rajada,) = await _enviar(debouncer, "Olá")
+    assert rajada.text == "Olá"
+
+
+@pytest.mark.asyncio
+async def test_mensagens_seguidas_num_so_pedido(debouncer):
+    resultados = await _enviar(debouncer, "Tenho 2 filhos", "e uma casa", "quanto deduzo?")
+
+    # Só a chamada mais recente fica com a rajada
+    assert resultados[:2] == [None, None]
+    assert resultados[2].text == "Tenho 2 filhos\ne uma casa\nquanto deduzo?"
+    stats = debouncer.get_stats()
+    assert stats["messages"] == 3
+    assert stats["llm_requests"] == 1
+    assert stats["saved_requests"] == 2
+
+
+@pytest.mark.asyncio
+async def test_utilizadores_diferentes_nao_se_juntam(debouncer):
+    a, b = await asyncio.gather(
+        debouncer.submit("a", "Pergunta A"), debouncer.submit("b", "Pergunta B")
+    )
+    assert a.text == "Pergunta A"
+    assert b.text == "Pergunta B"
+
+
+@pytest.mark.asyncio
+async def test_mensagem_a_meio_da_resposta_leva_as_anteriores(debouncer):
+    (primeira,) = await _enviar(debouncer, "Pergunta")
+    assert primeira.flushed
+
+    # Sem done(): a resposta ainda está em curso quando chega outra mensagem
+    (segunda,) = await _enviar(debouncer, "e mais isto")
+    assert segunda.text == "Pergunta\ne mais isto"
+    assert debouncer.get_stats()["carried"] == 1
+
+    # A resposta antiga termina depois: não apaga a rajada nova, que continua
+    # à espera de resposta
+    debouncer.done("u", primeira)
+    (terceira,) = await _enviar(debouncer, "?")
+    assert terceira.text == "Pergunta\ne mais isto\n?"
+
+
+@pytest.mark.asyncio
+async def test_depois_de_respondida_comeca_outra_rajada(debouncer):
+    (primeira,) = await _enviar(debouncer, "Pergunta")
+    debouncer.done("u", primeira)
+
+    (segunda,) = await _enviar(debouncer, "Outra pergunta")
+    assert segunda.text == "Outra pergunta"
+    assert debouncer.get_stats()["carried"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rajada_grande_envia_sem_esperar():
+    debouncer = MessageDebouncer(min_window=60, max_window=60, max_parts=3)
+    anteriores = [asyncio.create_task(debouncer.submit("u", t)) for t in ("1", "2")]
+    await asyncio.sleep(0)
+
+    # A 3.ª mensagem enche a rajada: sai já, sem esperar pela janela de 60s
+    rajada = await asyncio.wait_for(debouncer.submit("u", "3"), timeout=1)
+    assert rajada.text == "1\n2\n3"
+
+    for tarefa in anteriores:
+        tarefa.cancel()
+    await asyncio.gather(*anteriores, return_exceptions=True)
@@ -0,0 +1,154 @@
+"""
+Testes da persistência SQLite com write-behind (persistence.py)
+Cada teste usa uma base nova em tmp_path; uma segunda instância lê o que
+ficou de facto gravado no disco
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from persistence import SQLitePersistence
+
+CONVERSA = "questionario"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "bot_state.db")
+
+
+@pytest.fixture
+def persistence(db_path):
+    # Intervalo longo: o teste decide quando há flush
+    return SQLitePersistence(db_path, flush_interval=60)
+
+
+async def _no_disco(db_path: str, **kwargs) -> tuple[dict, dict, dict]:
+    """user_data, chat_data e conversas lidos por outro processo"""
+    leitor = SQLitePersistence(db_path, **kwargs)
+    try:
+        return (
+            await leitor.get_user_data(),
+            await leitor.get_chat_data(),
+            await leitor.get_conversations(CONVERSA),
+        )
+    finally:
+        await leitor.flush()
+
+
+@pytest.mark.asyncio
+async def test_escritas_so_chegam_ao_disco_no_flush(persistence, db_path):
+    await persistence.update_user_data(1, {"pergunta_atual": 3})
+    await persistence.update_chat_data(1, {"idioma": "pt"})
+    await persistence.update_conversation(CONVERSA, (1, 1), 5)
+
+    assert await _no_disco(db_path) == ({}, {}, {})
+    assert persistence.get_stats()["pending"] == 3
+
+    await persistence.flush()
+    assert await _no_disco(db_path) == (
+        {1: {"pergunta_atual": 3}},
+        {1: {"idioma": "pt"}},
+        {(1, 1): 5},
+    )
+    assert persistence.get_stats()["flushes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_escritas_da_mesma_chave_juntam_se(persistence, db_path):
+    for pergunta in range(1, 4):
+        await persistence.update_user_data(1, {"pergunta_atual": pergunta})
+    await persistence.flush()
+
+    user_data, _, _ = await _no_disco(db_path)
+    assert user_data == {1: {"pergunta_atual": 3}}
+    stats = persistence.get_stats()
+    assert stats["writes"] == 3
+    assert stats["rows_written"] == 1
+
+
+@pytest.mark.asyncio
+async def test_conversa_terminada_e_dados_removidos_sao_apagados(persistence, db_path):
+    await persistence.update_user_data(1, {"pergunta_atual": 3})
+    await persistence.update_conversation(CONVERSA, (1, 1), 5)
+    await persistence.flush()
+
+    await persistence.update_conversation(CONVERSA, (1, 1), None)
+    await persistence.drop_user_data(1)
+    await persistence.flush()
+    assert await _no_disco(db_path) == ({}, {}, {})
+
+
+@pytest.mark.asyncio
+async def test_max_pending_grava_logo(db_path):
+    persistence = SQLitePersistence(db_path, flush_interval=60, max_pending=3)
+    for user_id in range(1, 4):
+        await persistence.update_user_data(user_id, {"n": user_id})
+
+    assert persistence.get_stats()["pending"] == 0
+    user_data, _, _ = await _no_disco(db_path)
+    assert sorted(user_data) == [1, 2, 3]
+    await persistence.flush()
+
+
+@pytest.mark.asyncio
+async def test_flush_pelo_intervalo(db_path):
+    persistence = SQLitePersistence(db_path, flush_interval=0.01)
+    await persistence.update_user_data(1, {"n": 1})
+
+    async def gravado():
+        while persistence.get_stats()["flushes"] == 0:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(gravado(), timeout=2)
+    assert (await _no_disco(db_path))[0] == {1: {"n": 1}}
+    await persistence.flush()
+
+
+@pytest.mark.asyncio
+async def test_erro_no_flush_repete_sem_tapar_escritas_novas(
+    persistence, db_path, monkeypatch
+):
+    """Um lote que falha volta a ficar pendente, mas a escrita mais recente ganha"""
+    gravar = persistence._write_batch
+    a_gravar, continuar = threading.Event(), threading.Event()
+
+    def falha_uma_vez(batch):
+        monkeypatch.setattr(persistence, "_write_batch", gravar)
+        a_gravar.set()
+        continuar.wait(timeout=5)
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(persistence, "_write_batch", falha_uma_vez)
+    await persistence.update_user_data(1, {"pergunta_atual": 3})
+    await persistence.update_user_data(2, {"pergunta_atual": 7})
+
+    # Enquanto o lote está a ser gravado (e vai falhar), chega outra resposta
+    flush = asyncio.create_task(persistence.flush())
+    await asyncio.to_thread(a_gravar.wait, 5)
+    await persistence.update_user_data(1, {"pergunta_atual": 4})
+    continuar.set()
+    await flush
+
+    stats = persistence.get_stats()
+    assert stats["errors"] == 1
+    assert stats["pending"] == 2
+
+    await persistence.flush()
+    user_data, _, _ = await _no_disco(db_path)
+    assert user_data == {1: {"pergunta_atual": 4}, 2: {"pergunta_atual": 7}}
+
+
+@pytest.mark.asyncio
+async def test_cada_processo_so_carrega_os_seus_chats(persistence, db_path):
+    for chat_id in (1, 2, 3, 4):
+        await persistence.update_user_data(chat_id, {"n": chat_id})
+        await persistence.update_conversation(CONVERSA, (chat_id, chat_id), chat_id)
+    await persistence.flush()
+
+    user_data, _, conversas = await _no_disco(db_path, owns=lambda chat_id: chat_id % 2 == 0)
+    assert sorted(user_data) == [2, 4]
+    assert sorted(conversas) == [(2, 2), (4, 4)]
@@ -0,0 +1,68 @@
+"""
+Testes da resiliência das chamadas LLM contra o servidor mock
+Um backend que falha sempre: o GroqHandler repete o pedido com backoff e,
+passadas failure_threshold falhas seguidas, o circuit breaker abre e os
+pedidos seguintes são recusados sem chegar à API
+"""
+
+import pytest
+
+from llm_handler.groq_handler import GroqHandler
+from llm_handler.resilience import (
+    CircuitOpenError,
+    LLMUnavailableError,
+    STATE_CLOSED,
+    STATE_OPEN,
+    RetryPolicy,
+)
+
+
+@pytest.fixture
+def em_falha(mock_groq):
+    return mock_groq(error_rate=1.0)
+
+
+@pytest.fixture
+def handler(em_falha, http_pool):
+    handler = GroqHandler(base_url=em_falha.base_url, http_pool=http_pool)
+    handler.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+    assert len(handler.router.backends) == 1
+    return handler
+
+
+@pytest.fixture
+def breaker(handler):
+    breaker = handler.router.health[handler.router.primary.name].breaker
+    breaker.failure_threshold = 5
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_tentativas_esgotadas(handler, em_falha, breaker):
+    with pytest.raises(LLMUnavailableError) as erro:
+        await handler.generate_response("Pergunta 1")
+
+    assert not isinstance(erro.value, CircuitOpenError)
+    assert em_falha.errors_injected == 3
+    assert handler.retries == 2
+    assert breaker.state == STATE_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuito_abre_e_recusa_sem_chamar_a_api(handler, em_falha, breaker):
+    for pergunta in ("Pergunta 1", "Pergunta 2"):
+        with pytest.raises(LLMUnavailableError):
+            await handler.generate_response(pergunta)
+
+    # A 5.ª falha seguida (2.ª tentativa da 2.ª chamada) abriu o circuito
+    assert breaker.state == STATE_OPEN
+    assert breaker.times_opened == 1
+    pedidos = em_falha.errors_injected
+
+    with pytest.raises(CircuitOpenError):
+        await handler.generate_response("Pergunta 3")
+    assert em_falha.errors_injected == pedidos
+
+    backend = handler.get_performance_stats()["providers"][0]
+    assert backend["state"] == STATE_OPEN
+    assert backend["times_opened"] == 1
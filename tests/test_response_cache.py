@@ -0,0 +1,79 @@
+"""
+Testes da cache de respostas (llm_handler/response_cache.py)
+TTL e remoção LRU com o relógio controlado pelo teste
+"""
+
+import pytest
+
+from llm_handler import response_cache
+from llm_handler.groq_handler import GroqHandler
+from llm_handler.response_cache import ResponseCache, normalize_question
+
+
+@pytest.fixture
+def cache(monkeypatch, relogio):
+    monkeypatch.setattr(response_cache, "time", relogio)
+    return ResponseCache(max_entries=2, ttl_seconds=60)
+
+
+def test_perguntas_iguais_a_menos_de_acentos_e_pontuacao():
+    assert normalize_question("O que é o IRS?") == normalize_question("o que e  o irs")
+
+
+def test_chave_depende_do_modelo_e_do_system_prompt(cache):
+    chave = cache.make_key("modelo", "prompt", "O que é o IRS?")
+    assert chave == cache.make_key("modelo", "prompt", "o que e o irs")
+    assert chave != cache.make_key("outro-modelo", "prompt", "O que é o IRS?")
+    assert chave != cache.make_key("modelo", "prompt novo", "O que é o IRS?")
+
+
+def test_acerto_e_falha(cache):
+    cache.set("a", "resposta")
+    assert cache.get("a") == "resposta"
+    assert cache.get("b") is None
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_expira_passado_o_ttl(cache, relogio):
+    cache.set("a", "resposta")
+    relogio.avancar(60)
+    assert cache.get("a") == "resposta"  # no limite ainda vale
+
+    relogio.avancar(0.001)
+    assert cache.get("a") is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_remove_a_menos_usada_recentemente(cache):
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.get("a")  # "a" passa a ser a mais recente
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_reescrever_renova_o_ttl(cache, relogio):
+    cache.set("a", "velha")
+    relogio.avancar(50)
+    cache.set("a", "nova")
+    relogio.avancar(50)
+    assert cache.get("a") == "nova"
+
+
+@pytest.mark.asyncio
+async def test_pergunta_repetida_nao_chama_a_api(mock_groq, http_pool):
+    server = mock_groq(reply_text="O IRS é o imposto sobre o rendimento.")
+    handler = GroqHandler(base_url=server.base_url, http_pool=http_pool)
+
+    primeira = await handler.generate_response("O que é o IRS?", use_cache=True)
+    segunda = await handler.generate_response("o que e o irs", use_cache=True)
+
+    assert primeira == segunda
+    assert server.requests_served == 1
+    assert handler.cache.get_stats()["hits"] == 1
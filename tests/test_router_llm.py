@@ -0,0 +1,55 @@
+"""
+Testes do router LLM (failover entre backends) contra o servidor mock
+O primeiro backend configurado falha sempre: o pedido passa para o segundo
+na mesma chamada e as seguintes já vão diretamente para o backend saudável
+"""
+
+import pytest
+
+from llm_handler.groq_handler import GroqHandler
+from llm_handler.providers import GroqBackend
+
+RESPOSTA = "Resposta do backend saudável"
+
+
+@pytest.fixture
+def em_falha(mock_groq):
+    return mock_groq(error_rate=1.0)
+
+
+@pytest.fixture
+def saudavel(mock_groq):
+    return mock_groq(reply_text=RESPOSTA)
+
+
+@pytest.fixture
+def handler(em_falha, saudavel, http_pool):
+    backends = [
+        GroqBackend("em-falha", "mock", base_url=em_falha.base_url, http_pool=http_pool),
+        GroqBackend("saudavel", "mock", base_url=saudavel.base_url, http_pool=http_pool),
+    ]
+    return GroqHandler(backends=backends, http_pool=http_pool)
+
+
+@pytest.mark.asyncio
+async def test_failover_para_o_segundo_backend(handler, em_falha, saudavel):
+    assert await handler.generate_response("Pergunta") == RESPOSTA
+
+    assert em_falha.errors_injected == 1
+    assert saudavel.requests_served == 1
+    assert handler.router.failovers == 1
+    assert handler.retries == 0  # failover imediato, sem backoff
+
+
+@pytest.mark.asyncio
+async def test_backend_em_falha_fica_para_tras(handler, em_falha, saudavel):
+    for i in range(4):
+        assert await handler.generate_response(f"Pergunta {i}") == RESPOSTA
+
+    # Só a primeira chamada passou pelo backend em falha
+    assert em_falha.errors_injected == 1
+    assert saudavel.requests_served == 4
+    providers = {p["name"]: p for p in handler.get_performance_stats()["providers"]}
+    assert providers["em-falha"]["failures"] == 1
+    assert providers["saudavel"]["failures"] == 0
+    assert providers["saudavel"]["requests"] == 4
@@ -0,0 +1,186 @@
+"""
+Testes do escalonador de pedidos ao modelo (llm_handler/scheduler.py)
+Uma só vaga (max_concurrency=1) ocupada pelo teste: os pedidos ficam na
+fila e a ordem de saída mostra prioridades e justiça entre utilizadores
+"""
+
+import asyncio
+
+import pytest
+
+from llm_handler import scheduler as scheduler_module
+from llm_handler.scheduler import (
+    PRIORITY_CALCULATION,
+    PRIORITY_CHAT,
+    PRIORITY_SIMULATION,
+    LLMQueueFullError,
+    LLMScheduler,
+    TokenBucket,
+)
+
+
+async def _por_ordem(scheduler: LLMScheduler, pedidos: list[tuple[str, dict]]) -> list[str]:
+    """Põe os pedidos na fila atrás de um que ocupa a vaga; devolve a ordem de saída"""
+    ordem = []
+
+    async def pedido(nome: str, kwargs: dict):
+        async with scheduler.slot(**kwargs):
+            ordem.append(nome)
+
+    ocupado = await scheduler.acquire()
+    tarefas = [asyncio.create_task(pedido(nome, kwargs)) for nome, kwargs in pedidos]
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == len(pedidos)
+
+    ocupado.release()
+    await asyncio.gather(*tarefas)
+    return ordem
+
+
+# Token bucket
+
+
+@pytest.fixture
+def relogio_do_scheduler(monkeypatch, relogio):
+    monkeypatch.setattr(scheduler_module, "time", relogio)
+    return relogio
+
+
+def test_bucket_repoe_ao_ritmo_por_minuto(relogio_do_scheduler):
+    bucket = TokenBucket(60)  # 1 por segundo
+    bucket.consume(60)
+    assert bucket.time_until(1) == pytest.approx(1.0)
+
+    relogio_do_scheduler.avancar(0.5)
+    assert bucket.time_until(1) == pytest.approx(0.5)
+    relogio_do_scheduler.avancar(0.5)
+    assert bucket.time_until(1) == 0.0
+
+
+def test_bucket_nunca_passa_da_capacidade(relogio_do_scheduler):
+    bucket = TokenBucket(60)
+    relogio_do_scheduler.avancar(3600)
+    bucket.refund(1000)
+    assert bucket.tokens == 60
+
+
+def test_pedido_maior_que_a_capacidade_passa_com_o_balde_cheio(relogio_do_scheduler):
+    bucket = TokenBucket(100)
+    assert bucket.time_until(500) == 0.0
+    bucket.consume(1)
+    assert bucket.time_until(500) > 0
+
+
+@pytest.mark.asyncio
+async def test_limite_rpm_segura_o_pedido_ate_repor(relogio_do_scheduler):
+    scheduler = LLMScheduler(max_concurrency=5, rpm_limit=2)
+    primeiro = await scheduler.acquire()
+    await scheduler.acquire()
+
+    terceiro = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    assert not terceiro.done()
+    assert scheduler.queue_depth == 1
+
+    # 2 por minuto: 30s repõem um pedido; a libertação volta a despachar
+    relogio_do_scheduler.avancar(30)
+    primeiro.release()
+    await asyncio.wait_for(terceiro, timeout=1)
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_limite_tpm_conta_os_tokens_estimados(relogio_do_scheduler):
+    scheduler = LLMScheduler(max_concurrency=5, tpm_limit=1000)
+    ticket = await scheduler.acquire(estimated_tokens=900)
+
+    seguinte = asyncio.create_task(scheduler.acquire(estimated_tokens=200))
+    await asyncio.sleep(0)
+    assert not seguinte.done()
+
+    # A chamada gastou só 300: os 600 devolvidos deixam passar o seguinte
+    ticket.settle(300)
+    ticket.release()
+    await asyncio.wait_for(seguinte, timeout=1)
+
+
+# Prioridades e justiça
+
+
+@pytest.mark.asyncio
+async def test_prioridade_por_comando():
+    ordem = await _por_ordem(
+        LLMScheduler(max_concurrency=1),
+        [
+            ("chat", {"priority": PRIORITY_CHAT}),
+            ("calcular", {"priority": PRIORITY_CALCULATION}),
+            ("simulacao", {"priority": PRIORITY_SIMULATION}),
+        ],
+    )
+    assert ordem == ["simulacao", "calcular", "chat"]
+
+
+@pytest.mark.asyncio
+async def test_utilizadores_servidos_a_vez():
+    ordem = await _por_ordem(
+        LLMScheduler(max_concurrency=1),
+        [
+            ("a1", {"user_id": "a"}),
+            ("a2", {"user_id": "a"}),
+            ("a3", {"user_id": "a"}),
+            ("b1", {"user_id": "b"}),
+            ("c1", {"user_id": "c"}),
+        ],
+    )
+    # Quem chega depois com um só pedido não espera pelas rajadas dos outros
+    assert ordem == ["a1", "b1", "c1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_fila_cheia():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_size=2)
+    ocupado = await scheduler.acquire()
+    tarefas = [asyncio.create_task(scheduler.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(LLMQueueFullError):
+        await scheduler.acquire()
+    assert scheduler.get_stats()["rejected"] == 1
+
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    ocupado.release()
+
+
+@pytest.mark.asyncio
+async def test_pedido_cancelado_sai_da_fila():
+    scheduler = LLMScheduler(max_concurrency=1)
+    ocupado = await scheduler.acquire()
+    cancelado = asyncio.create_task(scheduler.acquire(user_id="a"))
+    seguinte = asyncio.create_task(scheduler.acquire(user_id="b"))
+    await asyncio.sleep(0)
+
+    cancelado.cancel()
+    await asyncio.gather(cancelado, return_exceptions=True)
+    assert scheduler.queue_depth == 1
+
+    ocupado.release()
+    ticket = await asyncio.wait_for(seguinte, timeout=1)
+    assert scheduler.get_stats()["active"] == 1
+    ticket.release()
+    assert scheduler.get_stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelar_depois_de_despachado_liberta_a_vaga():
+    scheduler = LLMScheduler(max_concurrency=1)
+    ocupado = await scheduler.acquire()
+    tarefa = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+
+    # Despachado (vaga livre) mas cancelado antes de a tarefa retomar
+    ocupado.release()
+    tarefa.cancel()
+    await asyncio.gather(tarefa, return_exceptions=True)
+    assert scheduler.get_stats()["active"] == 0
@@ -0,0 +1,217 @@
+"""
+Testes da limpeza de sessões (session_sweeper.py)
+Uma aplicação PTB real (Bot API mock) com um questionário de um só estado:
+cada mensagem guarda user_data e abre a conversa. O relógio do sweeper só
+anda quando o teste o avança.
+
+test_estado_interno_do_ptb falha de propósito quando o python-telegram-bot
+muda: é o aviso para rever session_sweeper._PTBState antes de subir a versão.
+"""
+
+import os
+import itertools
+
+import pytest
+import pytest_asyncio
+import telegram
+from telegram import Update
+from telegram.ext import Application, ConversationHandler, MessageHandler, filters
+from telegram.ext._utils.trackingdict import TrackingDict
+
+import session_sweeper
+from mock_telegram_server import message_update
+from persistence import SQLitePersistence
+from session_sweeper import PTB_VERSION, SessionSweeper
+
+CONVERSA = "questionario"
+RESPONDER = 1
+IDLE_TTL = 60
+
+_ids = itertools.count(1)
+
+
+async def _responder(update, context):
+    context.user_data["resposta"] = update.message.text
+    return RESPONDER
+
+
+def _aplicacao(mock_telegram, sweeper: SessionSweeper, persistence=None) -> Application:
+    builder = Application.builder().token(os.environ["TELEGRAM_BOT_TOKEN"])
+    builder = builder.base_url(mock_telegram.base_url)
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    app = builder.build()
+    conversa = ConversationHandler(
+        entry_points=[MessageHandler(filters.TEXT, _responder)],
+        states={RESPONDER: [MessageHandler(filters.TEXT, _responder)]},
+        fallbacks=[],
+        name=CONVERSA,
+        persistent=persistence is not None,
+    )
+    app.add_handler(conversa)
+    sweeper.attach(app, [conversa])
+    return app
+
+
+async def _mensagem(app: Application, user_id: int, texto: str = "35000"):
+    await app.process_update(
+        Update.de_json(message_update(next(_ids), user_id, texto), app.bot)
+    )
+
+
+def _conversas(app: Application) -> set:
+    return set(app.handlers[0][0]._conversations)
+
+
+@pytest.fixture
+def relogio_do_sweeper(monkeypatch, relogio):
+    monkeypatch.setattr(session_sweeper, "time", relogio)
+    return relogio
+
+
+@pytest.fixture
+def ocupados():
+    return set()
+
+
+@pytest.fixture
+def sweeper(relogio_do_sweeper, ocupados):
+    return SessionSweeper(
+        idle_ttl=IDLE_TTL, max_users=3, interval=0, busy=lambda key: key in ocupados
+    )
+
+
+@pytest_asyncio.fixture
+async def app(mock_telegram, sweeper):
+    app = _aplicacao(mock_telegram, sweeper)
+    async with app:
+        yield app
+
+
+# Contrato com o estado interno do PTB
+
+
+def test_versao_fixada_do_ptb():
+    assert telegram.__version__ == PTB_VERSION, (
+        f"python-telegram-bot {telegram.__version__} instalado, session_sweeper "
+        f"validado com {PTB_VERSION}: rever _PTBState e atualizar PTB_VERSION"
+    )
+
+
+@pytest.mark.asyncio
+async def test_estado_interno_do_ptb(mock_telegram, relogio_do_sweeper, tmp_path):
+    """Os atributos privados que _PTBState usa existem e fazem o que ele espera"""
+    db_path = str(tmp_path / "bot_state.db")
+    sweeper = SessionSweeper(idle_ttl=IDLE_TTL, interval=0)
+    app = _aplicacao(mock_telegram, sweeper, SQLitePersistence(db_path, flush_interval=0))
+
+    async with app:
+        conversa = app.handlers[0][0]
+        assert isinstance(app._user_data, dict)
+        assert isinstance(app._chat_data, dict)
+        # Conversas persistentes: um pop fica registado para a persistência
+        assert isinstance(conversa._conversations, TrackingDict)
+
+        await _mensagem(app, 1)
+        await app.update_persistence()
+        assert app.user_data[1] == {"resposta": "35000"}
+        assert _conversas(app) == {(1, 1)}
+
+        relogio_do_sweeper.avancar(IDLE_TTL + 1)
+        assert sweeper.sweep() == 1
+        assert 1 not in app.user_data
+        assert _conversas(app) == set()
+
+        # O pop nas conversas (TrackingDict) e o drop_user_data chegam à base
+        await app.update_persistence()
+
+    leitor = SQLitePersistence(db_path)
+    assert await leitor.get_user_data() == {}
+    assert await leitor.get_conversations(CONVERSA) == {}
+    await leitor.flush()
+
+
+# Comportamento
+
+
+@pytest.mark.asyncio
+async def test_sessoes_inativas_sao_esquecidas(app, sweeper, relogio_do_sweeper):
+    await _mensagem(app, 1)
+    await _mensagem(app, 2)
+    relogio_do_sweeper.avancar(IDLE_TTL + 1)
+    await _mensagem(app, 3)
+
+    assert sweeper.sweep() == 2
+    assert set(app.user_data) == {3}
+    assert _conversas(app) == {(3, 3)}
+    assert sweeper.get_stats()["evicted_idle"] == 2
+
+
+@pytest.mark.asyncio
+async def test_atividade_recente_adia_a_limpeza(app, sweeper, relogio_do_sweeper):
+    await _mensagem(app, 1)
+    relogio_do_sweeper.avancar(IDLE_TTL - 1)
+    await _mensagem(app, 1, "500")
+    relogio_do_sweeper.avancar(IDLE_TTL - 1)
+
+    assert sweeper.sweep() == 0
+    assert app.user_data[1] == {"resposta": "500"}
+
+
+@pytest.mark.asyncio
+async def test_acima_de_max_users_sai_o_menos_recente(app, sweeper):
+    for user_id in (1, 2, 3):
+        await _mensagem(app, user_id)
+    await _mensagem(app, 1)  # 1 volta a ser recente: 2 é o mais antigo
+    await _mensagem(app, 4)
+
+    assert len(sweeper) == 3
+    assert set(app.user_data) == {1, 3, 4}
+    assert _conversas(app) == {(1, 1), (3, 3), (4, 4)}
+    assert sweeper.get_stats()["evicted_lru"] == 1
+
+
+@pytest.mark.asyncio
+async def test_utilizador_ocupado_nao_e_esquecido(app, sweeper, relogio_do_sweeper, ocupados):
+    await _mensagem(app, 1)
+    await _mensagem(app, 2)
+    ocupados.add((1, 1))  # análise final ainda a correr
+    relogio_do_sweeper.avancar(IDLE_TTL + 1)
+
+    assert sweeper.sweep() == 1
+    assert set(app.user_data) == {1}
+    assert sweeper.get_stats()["skipped_busy"] == 1
+
+    # Terminada a tarefa, sai na limpeza depois de outro idle_ttl
+    ocupados.clear()
+    assert sweeper.sweep() == 0
+    relogio_do_sweeper.avancar(IDLE_TTL + 1)
+    assert sweeper.sweep() == 1
+
+
+@pytest.mark.asyncio
+async def test_outra_versao_do_ptb_nao_mexe_no_estado(
+    mock_telegram, relogio_do_sweeper, monkeypatch
+):
+    monkeypatch.setattr(session_sweeper, "PTB_VERSION", "0.0")
+    sweeper = SessionSweeper(idle_ttl=IDLE_TTL, interval=0)
+    app = _aplicacao(mock_telegram, sweeper)
+
+    async with app:
+        await _mensagem(app, 1)
+        relogio_do_sweeper.avancar(IDLE_TTL + 1)
+        sweeper.sweep()
+
+        assert app.user_data[1] == {"resposta": "35000"}
+        assert _conversas(app) == {(1, 1)}
+
+
+@pytest.mark.asyncio
+async def test_estatisticas_das_estruturas(app, sweeper):
+    await _mensagem(app, 1)
+    estruturas = sweeper.get_stats()["structures"]
+
+    assert estruturas["sessions"]["entries"] == 1
+    assert estruturas["user_data"]["entries"] == 1
+    assert estruturas["conversations"]["entries"] == 1
+    assert estruturas["user_data"]["bytes"] > 0
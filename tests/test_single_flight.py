@@ -0,0 +1,115 @@
+"""
+Testes do agrupamento de pedidos idênticos (llm_handler/single_flight.py)
+A chamada partilhada só termina quando o teste abre a barreira, para
+controlar a ordem entre pedidos, cancelamentos e resultado
+"""
+
+import asyncio
+
+import pytest
+
+from llm_handler.single_flight import SingleFlight, request_key
+
+
+class ChamadaControlada:
+    """Chamada à API que espera pela barreira; conta inícios e cancelamentos"""
+
+    def __init__(self, resultado="resposta"):
+        self.resultado = resultado
+        self.barreira = asyncio.Event()
+        self.chamadas = 0
+        self.canceladas = 0
+
+    async def __call__(self):
+        self.chamadas += 1
+        try:
+            await self.barreira.wait()
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+        if isinstance(self.resultado, Exception):
+            raise self.resultado
+        return self.resultado
+
+
+async def _pedidos(sf: SingleFlight, chamada, n: int, key: str = "k") -> list[asyncio.Task]:
+    tarefas = [asyncio.create_task(sf.do(key, chamada)) for _ in range(n)]
+    await asyncio.sleep(0)  # todos registados antes de a chamada terminar
+    return tarefas
+
+
+def test_chave_nao_depende_da_ordem_dos_parametros():
+    mensagens = [{"role": "user", "content": "Olá"}]
+    assert request_key("m", mensagens, {"a": 1, "b": 2}) == request_key(
+        "m", mensagens, {"b": 2, "a": 1}
+    )
+    assert request_key("m", mensagens, {"a": 1}) != request_key("m", mensagens, {"a": 2})
+
+
+@pytest.mark.asyncio
+async def test_pedidos_identicos_fazem_uma_chamada():
+    sf, chamada = SingleFlight(), ChamadaControlada()
+    tarefas = await _pedidos(sf, chamada, 3)
+    chamada.barreira.set()
+
+    assert await asyncio.gather(*tarefas) == ["resposta"] * 3
+    assert chamada.chamadas == 1
+    assert sf.get_stats()["upstream_requests"] == 1
+    assert sf.get_stats()["coalesced_requests"] == 2
+    assert sf.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chaves_diferentes_nao_se_juntam():
+    sf, chamada = SingleFlight(), ChamadaControlada()
+    tarefas = await _pedidos(sf, chamada, 1, "a") + await _pedidos(sf, chamada, 1, "b")
+    chamada.barreira.set()
+
+    await asyncio.gather(*tarefas)
+    assert chamada.chamadas == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelar_um_pedido_nao_afeta_os_outros():
+    sf, chamada = SingleFlight(), ChamadaControlada()
+    primeiro, segundo = await _pedidos(sf, chamada, 2)
+
+    primeiro.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await primeiro
+    chamada.barreira.set()
+
+    assert await segundo == "resposta"
+    assert chamada.canceladas == 0
+    assert sf.get_stats()["abandoned"] == 0
+
+
+@pytest.mark.asyncio
+async def test_todos_cancelados_cancela_a_chamada():
+    sf, chamada = SingleFlight(), ChamadaControlada()
+    tarefas = await _pedidos(sf, chamada, 2)
+
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    await asyncio.sleep(0)  # a chamada partilhada recebe o cancelamento
+
+    assert chamada.canceladas == 1
+    assert sf.get_stats()["abandoned"] == 1
+    assert sf.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_erro_chega_a_todos_e_liberta_a_chave():
+    sf = SingleFlight()
+    chamada = ChamadaControlada(resultado=RuntimeError("API em baixo"))
+    tarefas = await _pedidos(sf, chamada, 2)
+    chamada.barreira.set()
+
+    resultados = await asyncio.gather(*tarefas, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+    # Terminada a chamada, o pedido seguinte volta à API
+    chamada.resultado = "recuperou"
+    assert await sf.do("k", chamada) == "recuperou"
+    assert chamada.chamadas == 2
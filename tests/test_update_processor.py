@@ -0,0 +1,140 @@
+"""
+Testes do processamento concorrente de updates (update_processor.py)
+Os handlers esperam por eventos abertos pelo teste: a ordem de início e de
+fim mostra o que corre em paralelo e o que espera pela vez do utilizador
+"""
+
+import asyncio
+import itertools
+
+import pytest
+from telegram import Update
+
+from mock_telegram_server import message_update
+from update_processor import PerUserUpdateProcessor
+
+_ids = itertools.count(1)
+
+
+def _update(user_id: int) -> Update:
+    return Update.de_json(message_update(next(_ids), user_id, "Olá"), None)
+
+
+class Handlers:
+    """Regista o início e o fim de cada handler; cada um espera pelo seu evento"""
+
+    def __init__(self):
+        self.log: list[str] = []
+        self.eventos: dict[str, asyncio.Event] = {}
+
+    def __call__(self, nome: str, bloquear: bool = True):
+        evento = self.eventos[nome] = asyncio.Event()
+        if not bloquear:
+            evento.set()
+
+        async def handler():
+            self.log.append(f"início {nome}")
+            await evento.wait()
+            self.log.append(f"fim {nome}")
+
+        return handler()
+
+    def libertar(self, nome: str):
+        self.eventos[nome].set()
+
+
+async def _ciclo(n: int = 5):
+    """Deixa correr as tarefas prontas"""
+    for _ in range(n):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def handlers():
+    return Handlers()
+
+
+@pytest.mark.asyncio
+async def test_mesmo_utilizador_por_ordem_de_chegada(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=8)
+    tarefas = [
+        asyncio.create_task(processor.process_update(_update(1), handlers("a1"))),
+        asyncio.create_task(processor.process_update(_update(1), handlers("a2", False))),
+    ]
+    await _ciclo()
+    # a2 não bloqueia, mas só começa depois de a1 terminar
+    assert handlers.log == ["início a1"]
+
+    handlers.libertar("a1")
+    await asyncio.gather(*tarefas)
+    assert handlers.log == ["início a1", "fim a1", "início a2", "fim a2"]
+    assert processor.get_stats()["waited_for_user"] == 1
+    assert processor.get_stats()["users_pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_utilizadores_diferentes_em_paralelo(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=8)
+    lento = asyncio.create_task(processor.process_update(_update(1), handlers("a1")))
+    await _ciclo()
+    await processor.process_update(_update(2), handlers("b1", False))
+
+    assert handlers.log == ["início a1", "início b1", "fim b1"]
+    handlers.libertar("a1")
+    await lento
+    assert processor.get_stats()["max_active"] == 2
+
+
+@pytest.mark.asyncio
+async def test_limite_de_handlers_a_correr(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=1)
+    tarefas = [
+        asyncio.create_task(processor.process_update(_update(1), handlers("a1"))),
+        asyncio.create_task(processor.process_update(_update(2), handlers("b1", False))),
+    ]
+    await _ciclo()
+    assert handlers.log == ["início a1"]
+
+    handlers.libertar("a1")
+    await asyncio.gather(*tarefas)
+    assert processor.get_stats()["max_active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_espera_pela_vez_sem_ocupar_vaga(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=2)
+    tarefas = [
+        asyncio.create_task(processor.process_update(_update(1), handlers("a1"))),
+        asyncio.create_task(processor.process_update(_update(1), handlers("a2"))),
+        asyncio.create_task(processor.process_update(_update(2), handlers("b1"))),
+    ]
+    await _ciclo()
+    # a2 espera por a1 sem ficar com a 2.ª vaga, que vai para b1
+    assert handlers.log == ["início a1", "início b1"]
+
+    for nome in ("a1", "a2", "b1"):
+        handlers.libertar(nome)
+    await asyncio.gather(*tarefas)
+
+
+@pytest.mark.asyncio
+async def test_erro_num_handler_nao_bloqueia_o_utilizador(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=8)
+
+    async def falha():
+        raise RuntimeError("handler falhou")
+
+    with pytest.raises(RuntimeError):
+        await processor.process_update(_update(1), falha())
+    await asyncio.wait_for(processor.process_update(_update(1), handlers("a2", False)), 1)
+
+    assert handlers.log == ["início a2", "fim a2"]
+    assert processor.get_stats()["processed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_updates_sem_utilizador_nao_esperam(handlers):
+    processor = PerUserUpdateProcessor(max_concurrency=8)
+    await processor.process_update(object(), handlers("job", False))
+    assert handlers.log == ["início job", "fim job"]
+    assert processor.get_stats()["waited_for_user"] == 0
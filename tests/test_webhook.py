@@ -0,0 +1,77 @@
+"""
+Testes do servidor de webhook embutido (webhook_server.py)
+Pedidos com o segredo errado ou sem segredo são recusados com 403 e não
+chegam à aplicação; com o segredo certo o update entra na update_queue
+"""
+
+import os
+import json
+import asyncio
+
+import pytest
+import pytest_asyncio
+from telegram.ext import Application
+
+from mock_telegram_server import message_update
+from webhook_server import WebhookServer
+
+SEGREDO = "segredo-do-teste"
+CORPO = json.dumps(message_update(1, 42, "Olá")).encode()
+
+
+async def post(port: int, body: bytes, secret: str | None) -> int:
+    """POST HTTP/1.1 ao webhook; devolve o estado da resposta"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = (
+        "POST /telegram HTTP/1.1\r\n"
+        "Host: 127.0.0.1\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n"
+    )
+    if secret is not None:
+        headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    writer.write(headers.encode() + b"\r\n" + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+@pytest.fixture
+def app(mock_telegram):
+    return (
+        Application.builder()
+        .token(os.environ["TELEGRAM_BOT_TOKEN"])
+        .base_url(mock_telegram.base_url)
+        .build()
+    )
+
+
+@pytest_asyncio.fixture
+async def server(app):
+    server = WebhookServer(app, "/telegram", SEGREDO, host="127.0.0.1", port=0)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("segredo", ["segredo-errado", "", None])
+async def test_segredo_invalido_responde_403(server, app, segredo):
+    assert await post(server.port, CORPO, segredo) == 403
+
+    assert app.update_queue.qsize() == 0
+    assert server.get_stats()["rejected"] == 1
+    assert server.get_stats()["received"] == 0
+
+
+@pytest.mark.asyncio
+async def test_segredo_certo_entrega_o_update(server, app):
+    assert await post(server.port, CORPO, SEGREDO) == 200
+
+    update = app.update_queue.get_nowait()
+    assert update.effective_user.id == 42
+    assert update.message.text == "Olá"
+    assert server.get_stats()["received"] == 1
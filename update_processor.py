@@ -0,0 +1,114 @@
+"""
+Update Processor - Processamento concorrente de updates com ordem por utilizador
+Utilizadores diferentes são tratados em paralelo; os updates de um mesmo
+utilizador (no mesmo chat) são tratados um de cada vez, pela ordem de
+chegada, para os estados do questionário nunca se atropelarem
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Hashable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class _UserLane:
+    """Fila de um utilizador: lock FIFO e número de updates à espera"""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Update processor com ordem por (chat, utilizador) e concorrência limitada
+
+    O semáforo do BaseUpdateProcessor é apanhado antes de do_process_update,
+    pelo que limita os updates em curso ou à espera (max_pending). O limite
+    de handlers a correr (max_concurrency) só é apanhado depois da vez do
+    utilizador: um utilizador com muitos updates seguidos não ocupa vagas
+    dos outros enquanto espera pela sua vez.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_pending: int = 1024):
+        super().__init__(max(max_pending, max_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.BoundedSemaphore(self.max_concurrency)
+        self._lanes: dict[Hashable, _UserLane] = {}
+        self._active = 0
+
+        self.processed = 0
+        self.waited_for_user = 0  # updates que esperaram pelo anterior do utilizador
+        self.max_active_seen = 0
+        self.total_wait = 0.0
+
+    @staticmethod
+    def key(update: object) -> Hashable | None:
+        """Chave de ordenação: (chat, utilizador), como o ConversationHandler"""
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        user = update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.key(update)
+        if key is None:
+            await self._run(coroutine, time.monotonic())
+            return
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _UserLane()
+        lane.pending += 1
+        if lane.lock.locked():
+            self.waited_for_user += 1
+        started = time.monotonic()
+        try:
+            # asyncio.Lock acorda quem espera por ordem de chegada
+            async with lane.lock:
+                await self._run(coroutine, started)
+        finally:
+            lane.pending -= 1
+            if not lane.pending:
+                del self._lanes[key]
+
+    async def _run(self, coroutine: Awaitable[Any], started: float):
+        async with self._slots:
+            self.total_wait += time.monotonic() - started
+            self._active += 1
+            self.max_active_seen = max(self.max_active_seen, self._active)
+            try:
+                await coroutine
+            finally:
+                self._active -= 1
+                self.processed += 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def get_stats(self) -> dict[str, Any]:
+        """Updates em curso, à espera e tempo de espera para o /stats"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "max_active": self.max_active_seen,
+            "users_pending": len(self._lanes),
+            "processed": self.processed,
+            "waited_for_user": self.waited_for_user,
+            "avg_wait_ms": (
+                round(self.total_wait / self.processed * 1000, 1) if self.processed else 0.0
+            ),
+        }
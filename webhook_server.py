@@ -0,0 +1,260 @@
+"""
+Webhook Server - Recebe os updates do Telegram num servidor HTTP embutido
+Alternativa ao polling: cada update chega assim que é enviado, sem esperar
+pelo próximo getUpdates. Só usa asyncio (não precisa do extra [webhooks]
+do python-telegram-bot).
+"""
+
+import hmac
+import json
+import time
+import asyncio
+import logging
+import secrets
+import signal
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application
+
+from llm_handler.hedging import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    503: "Service Unavailable",
+}
+
+
+class WebhookServer:
+    """
+    Servidor HTTP/1.1 mínimo para os pedidos do Telegram
+
+    Valida o cabeçalho X-Telegram-Bot-Api-Secret-Token, responde 200 logo
+    que o update está na update_queue da aplicação (o processamento fica
+    para os handlers) e mantém as ligações abertas entre pedidos. GET em
+    /health responde 200, para verificações da plataforma de deploy.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        path: str = "/telegram",
+        secret_token: str = "",
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        max_body: int = 1024 * 1024,
+        idle_timeout: float = 60.0,
+    ):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.Task] = set()
+
+        self.received = 0
+        self.rejected = 0  # segredo errado
+        self.invalid = 0
+        self.ack_latency = LatencyTracker()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Porta 0: usar a que o sistema atribuiu
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"🌐 Webhook à escuta em {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        # Ligações keep-alive abertas: terminar já, sem esperar pelo timeout
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                if request is None:
+                    break
+                started = time.perf_counter()
+                status, body, keep_alive = await self._process(*request)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if status == 200 and request[1] == self.path:
+                    self.ack_latency.record(time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # servidor a parar
+        except Exception as e:
+            logger.error(f"Erro na ligação ao webhook: {e!r}")
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Lê um pedido: (método, caminho, cabeçalhos, corpo), None se fechou"""
+        line = await reader.readline()
+        if not line:
+            return None
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+            if len(headers) > 100:
+                raise ValueError("Cabeçalhos a mais")
+
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            return method, target, headers, None
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _process(
+        self, method: str, target: str, headers: dict, body: bytes | None
+    ) -> tuple[int, bytes, bool]:
+        """Trata um pedido: (estado HTTP, corpo, manter a ligação)"""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        path = target.split("?", 1)[0]
+
+        if method == "GET" and path == "/health":
+            return 200, b"ok", keep_alive
+        if path != self.path:
+            return 404, b"", keep_alive
+        if method != "POST":
+            return 405, b"", keep_alive
+        if body is None:
+            # Corpo por ler: fechar a ligação
+            self.invalid += 1
+            return 413, b"", False
+
+        if self.secret_token and not hmac.compare_digest(
+            headers.get("x-telegram-bot-api-secret-token", "").encode(),
+            self.secret_token.encode(),
+        ):
+            self.rejected += 1
+            logger.warning("Pedido ao webhook com segredo inválido")
+            return 403, b"", keep_alive
+
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            self.invalid += 1
+            logger.warning(f"Update inválido no webhook: {e}")
+            return 400, b"", keep_alive
+        return await self.deliver(data, body), b"", keep_alive
+
+    async def deliver(self, data: dict, body: bytes) -> int:
+        """Entrega o update à aplicação; devolve o estado HTTP da resposta"""
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            self.invalid += 1
+            logger.warning(f"Update inválido no webhook: {e}")
+            return 400
+        if update is None:
+            self.invalid += 1
+            return 400
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return 200
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+            "connections": len(self._connections),
+            "ack": self.ack_latency.get_stats(),
+        }
+
+
+async def serve_webhook(
+    application: Application,
+    webhook_url: str,
+    path: str = "/telegram",
+    secret_token: str = "",
+    host: str = "0.0.0.0",
+    port: int = 8443,
+    allowed_updates: list[str] = None,
+    drop_pending_updates: bool = True,
+    max_connections: int = 40,
+    stop_event: asyncio.Event = None,
+    set_webhook: bool = True,
+) -> None:
+    """
+    Corre a aplicação em modo webhook até stop_event (ou SIGINT/SIGTERM)
+
+    Segue o ciclo de vida do run_polling(): initialize, post_init, start,
+    e no fim stop, post_stop, shutdown e post_shutdown.
+
+    Args:
+        webhook_url: URL pública base; o Telegram chama webhook_url + path
+        secret_token: Segredo dos pedidos (vazio = gerado agora)
+        set_webhook: Registar o webhook no Telegram (setWebhook)
+    """
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    server = WebhookServer(application, path, secret_token, host, port)
+    stop_event = stop_event or asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows ou fora da thread principal
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        if set_webhook:
+            await application.bot.set_webhook(
+                url=f"{webhook_url}{path}",
+                secret_token=secret_token,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=drop_pending_updates,
+                max_connections=max_connections,
+            )
+        await application.start()
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)